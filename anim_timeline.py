@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+anim_timeline.py
+
+Precomputes the tile animations of a converted map, so the client advances
+every animation once per frame instead of ticking each animated cell:
+
+- per tileset, every animated tile becomes {gid, frames (GIDs), durations,
+  period} and lists the layer cells that show it (row-major index
+  y * layer width + x, flip flags stay in the layer data)
+- per tileset, all animations share one timeline table: the sorted times
+  (ms) at which any of them changes frame over the common period (LCM of
+  their periods), with one row of current frame GIDs per time. A renderer
+  looks up one row per frame and writes it to all instances in one batch.
+- when the common period or the table gets too large (coprime durations),
+  the table is left out and each animation is stepped on its own period
+- written as <map>.anim.json next to the map
+
+Usage:
+  python anim_timeline.py client/public/assets/maps/victorian/city_map.json
+  python anim_timeline.py map.json --max-keyframes 1024 --at 1250
+
+Notes:
+- Only tile layers are scanned; animated tile objects keep ticking on their own.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import math
+import time
+from pathlib import Path
+
+import numpy as np
+
+from map_layers import GID_MASK, layer_array, tile_layers, tiles_as_dict
+from map_stream import load_map
+
+MAX_PERIOD_MS = 10 * 60 * 1000
+MAX_KEYFRAMES = 4096
+
+
+def timeline_path(map_path: Path) -> Path:
+    map_path = Path(map_path)
+    return map_path.with_name(f"{map_path.stem}.anim.json")
+
+
+def tileset_animations(ts: dict) -> list[dict]:
+    """{gid, frames, durations, period} of every animated tile of ts, by GID."""
+    animations = []
+    for tid, tile in sorted(tiles_as_dict(ts).items()):
+        frames = tile.get('animation') or []
+        durations = [max(0, int(f.get('duration', 0))) for f in frames]
+        if not frames or sum(durations) == 0:
+            continue
+        animations.append({
+            'gid': ts['firstgid'] + tid,
+            'frames': [ts['firstgid'] + int(f['tileid']) for f in frames],
+            'durations': durations,
+            'period': sum(durations),
+        })
+    return animations
+
+
+def frame_at(animation: dict, times: np.ndarray) -> np.ndarray:
+    """Frame GID of the animation at each time (ms)."""
+    starts = np.cumsum([0] + animation['durations'][:-1])
+    index = np.searchsorted(starts, np.asarray(times) % animation['period'], side='right') - 1
+    return np.asarray(animation['frames'], dtype=np.int64)[index]
+
+
+def shared_timeline(animations: list[dict], max_period: int = MAX_PERIOD_MS,
+                    max_keyframes: int = MAX_KEYFRAMES) -> dict | None:
+    """{'period', 'times', 'frames'} for the animations, or None if it would be too large."""
+    period = 1
+    for a in animations:
+        period = math.lcm(period, a['period'])
+        if period > max_period:
+            return None
+    changes = []
+    for a in animations:
+        # every frame start of this animation, repeated over the common period
+        starts = np.cumsum([0] + a['durations'][:-1])
+        changes.append(np.add.outer(np.arange(0, period, a['period']), starts).ravel())
+        if sum(len(c) for c in changes) > max_keyframes * len(animations):
+            return None
+    times = np.unique(np.concatenate(changes))
+    if len(times) > max_keyframes:
+        return None
+    frames = np.stack([frame_at(a, times) for a in animations], axis=1)
+    return {'period': period, 'times': times.tolist(), 'frames': frames.tolist()}
+
+
+def animated_cells(map_data: dict, gids: np.ndarray) -> dict[int, list[dict]]:
+    """Per animated GID, the [{'layer', 'id', 'width', 'cells'}] that show it."""
+    found: dict[int, list[dict]] = {}
+    if not len(gids):
+        return found
+    for layer in tile_layers(map_data):
+        grid = layer_array(layer, map_data)
+        bare = (grid & GID_MASK).ravel()
+        flat = np.flatnonzero(np.isin(bare, gids))
+        if not len(flat):
+            continue
+        order = np.argsort(bare[flat], kind='stable')
+        flat = flat[order]
+        uniq, first = np.unique(bare[flat], return_index=True)
+        for gid, cells in zip(uniq.tolist(), np.split(flat, first[1:])):
+            found.setdefault(gid, []).append({
+                'layer': layer.get('name'),
+                'id': layer.get('id'),
+                'width': grid.shape[1],
+                'cells': cells.tolist(),
+            })
+    return found
+
+
+def build_timelines(map_data: dict, max_period: int = MAX_PERIOD_MS, max_keyframes: int = MAX_KEYFRAMES) -> dict:
+    tilesets = []
+    for ts in map_data.get('tilesets', []):
+        animations = tileset_animations(ts)
+        if animations:
+            tilesets.append((ts, animations))
+    gids = np.array([a['gid'] for _, anims in tilesets for a in anims], dtype=np.uint32)
+    cells = animated_cells(map_data, gids)
+
+    out = {'width': map_data.get('width'), 'height': map_data.get('height'), 'tilesets': []}
+    for ts, animations in tilesets:
+        for a in animations:
+            a['instances'] = cells.get(a['gid'], [])
+        # animations nobody shows are kept out of the shared table
+        used = [a for a in animations if a['instances']]
+        entry = {'name': ts.get('name'), 'firstgid': ts['firstgid'], 'animations': animations}
+        table = shared_timeline(used, max_period, max_keyframes) if used else None
+        if table is not None:
+            # frames columns follow this order of animation GIDs
+            entry['timeline'] = {'gids': [a['gid'] for a in used], **table}
+        out['tilesets'].append(entry)
+    return out
+
+
+def write_timelines(map_path: Path, out_path: Path | None = None, max_period: int = MAX_PERIOD_MS,
+                    max_keyframes: int = MAX_KEYFRAMES) -> dict:
+    """Writes <map>.anim.json; returns a summary dict."""
+    map_path = Path(map_path)
+    data = build_timelines(load_map(map_path), max_period, max_keyframes)
+    data['map'] = map_path.name
+    out_path = Path(out_path) if out_path else timeline_path(map_path)
+    text = json.dumps(data, separators=(',', ':'))
+    out_path.write_text(text, encoding='utf-8')
+    animations = [a for ts in data['tilesets'] for a in ts['animations']]
+    return {
+        'path': str(out_path),
+        'bytes': len(text.encode('utf-8')),
+        'animations': len(animations),
+        'instances': sum(len(i['cells']) for a in animations for i in a['instances']),
+        'tables': sum(1 for ts in data['tilesets'] if 'timeline' in ts),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("map", help="Converted map JSON with embedded tilesets")
+    ap.add_argument("--out", default=None, help="Output path (default <map>.anim.json)")
+    ap.add_argument("--max-period", type=int, default=MAX_PERIOD_MS,
+                    help=f"Largest shared period in ms (default {MAX_PERIOD_MS})")
+    ap.add_argument("--max-keyframes", type=int, default=MAX_KEYFRAMES,
+                    help=f"Largest shared table (default {MAX_KEYFRAMES} rows)")
+    ap.add_argument("--at", type=int, default=None, help="Print the frame of every animation at this time (ms)")
+    args = ap.parse_args()
+
+    start = time.perf_counter()
+    info = write_timelines(Path(args.map), args.out, args.max_period, args.max_keyframes)
+    data = json.loads(Path(info['path']).read_text(encoding='utf-8'))
+    for ts in data['tilesets']:
+        table = ts.get('timeline')
+        shared = (f"shared table {len(table['times'])} keyframe(s) over {table['period']}ms"
+                  if table else "no shared table")
+        print(f"  {ts['name']}: {len(ts['animations'])} animation(s), {shared}")
+        if args.at is not None:
+            for a in ts['animations']:
+                count = sum(len(i['cells']) for i in a['instances'])
+                print(f"    gid {a['gid']} -> {int(frame_at(a, [args.at])[0])} ({count} cell(s))")
+    print(f"{info['animations']} animation(s), {info['instances']} animated cell(s), "
+          f"{info['tables']} shared table(s)")
+    print(f"Saved {info['path']} ({info['bytes']} bytes) in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
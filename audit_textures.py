@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+audit_textures.py
+
+Audits every image under the client assets as a GPU texture:
+
+- PNG, JPEG and WebP headers are read in parallel (only the first bytes of
+  each file; nothing is decoded) for dimensions, bit depth and alpha; the
+  format is taken from the magic bytes and a wrong extension is flagged
+- decoded GPU memory is estimated per texture (RGBA8, as the WebGL renderer
+  uploads it; x4/3 with --mipmaps) and per scene: every map JSON under the
+  assets is a scene made of its tileset images, --scene adds named sets of
+  glob patterns (e.g. the sprites Boot.js preloads)
+- textures over --max-size (warning) / --hard-max-size (critical) or over
+  --texture-budget, and scenes over --scene-budget, are flagged
+- results go to a manifest keyed by mtime + size (default
+  .map_cache/texture_manifest.json), so a rerun only reads changed files
+
+Usage:
+  python audit_textures.py
+  python audit_textures.py --root client/public/assets --texture-budget 64 --scene-budget 256
+  python audit_textures.py --scene boot="client/public/assets/sprites/**/*.png" --json audit.json
+
+Notes:
+- Exit code 1 when anything is flagged critical or over budget, for CI.
+"""
+
+from __future__ import annotations
+import argparse
+import fnmatch
+import json
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.webp')
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# JPEG start-of-frame markers (C4, C8 and CC are other segments)
+JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+MB = 1024 * 1024
+
+
+# ---- header readers ----
+
+def png_info(f) -> dict:
+    head = f.read(33)
+    if head[:8] != PNG_SIGNATURE or head[12:16] != b'IHDR':
+        raise ValueError('not a PNG')
+    width, height, depth, color_type = struct.unpack('>IIBB', head[16:26])
+    # colour types 4 (grey + alpha) and 6 (RGBA) carry alpha; others only via a tRNS chunk
+    alpha = color_type in (4, 6)
+    if not alpha:
+        f.seek(33)
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                break
+            length, kind = struct.unpack('>I4s', chunk)
+            if kind == b'tRNS':
+                alpha = True
+                break
+            if kind in (b'IDAT', b'IEND'):
+                break
+            f.seek(length + 4, os.SEEK_CUR)
+    return {'format': 'png', 'width': width, 'height': height, 'bit_depth': depth, 'alpha': alpha}
+
+
+def jpeg_info(f) -> dict:
+    if f.read(2) != b'\xff\xd8':
+        raise ValueError('not a JPEG')
+    while True:
+        byte = f.read(1)
+        if not byte:
+            raise ValueError('no JPEG frame header')
+        if byte != b'\xff':
+            continue
+        marker = f.read(1)
+        while marker == b'\xff':
+            marker = f.read(1)
+        if not marker:
+            raise ValueError('no JPEG frame header')
+        m = marker[0]
+        if m == 0xD8 or 0xD0 <= m <= 0xD7 or m == 0x01:
+            continue
+        length = struct.unpack('>H', f.read(2))[0]
+        if m in JPEG_SOF:
+            depth, height, width, components = struct.unpack('>BHHB', f.read(6))
+            return {'format': 'jpeg', 'width': width, 'height': height, 'bit_depth': depth,
+                    'alpha': False, 'channels': components}
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def webp_info(f) -> dict:
+    head = f.read(30)
+    if head[:4] != b'RIFF' or head[8:12] != b'WEBP':
+        raise ValueError('not a WebP')
+    kind = head[12:16]
+    if kind == b'VP8X':
+        flags = head[20]
+        width = 1 + int.from_bytes(head[24:27], 'little')
+        height = 1 + int.from_bytes(head[27:30], 'little')
+        return {'format': 'webp', 'width': width, 'height': height, 'bit_depth': 8, 'alpha': bool(flags & 0x10)}
+    if kind == b'VP8L':
+        bits = int.from_bytes(head[21:25], 'little')
+        return {'format': 'webp', 'width': (bits & 0x3FFF) + 1, 'height': ((bits >> 14) & 0x3FFF) + 1,
+                'bit_depth': 8, 'alpha': bool((bits >> 28) & 1)}
+    if kind == b'VP8 ':
+        width, height = struct.unpack('<HH', head[26:30])
+        return {'format': 'webp', 'width': width & 0x3FFF, 'height': height & 0x3FFF, 'bit_depth': 8, 'alpha': False}
+    raise ValueError(f"unknown WebP chunk {kind!r}")
+
+
+def sniff(magic: bytes):
+    """Header reader for the file's actual format (by magic bytes, not extension)."""
+    if magic.startswith(PNG_SIGNATURE):
+        return png_info
+    if magic.startswith(b'\xff\xd8'):
+        return jpeg_info
+    if magic[:4] == b'RIFF' and magic[8:12] == b'WEBP':
+        return webp_info
+    return None
+
+
+def read_header(path: str) -> dict:
+    """Image info from the file header; {'error': ...} if it can't be read."""
+    try:
+        with open(path, 'rb') as f:
+            reader = sniff(f.read(12))
+            if reader is None:
+                return {'error': 'not a PNG, JPEG or WebP file'}
+            f.seek(0)
+            info = reader(f)
+    except (OSError, ValueError, struct.error, IndexError) as e:
+        return {'error': str(e) or type(e).__name__}
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    if ext.replace('jpg', 'jpeg') != info['format']:
+        info['misnamed'] = True
+    return info
+
+
+# ---- manifest ----
+
+def load_manifest(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path: Path, manifest: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(manifest), encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def scan(root: Path, suffixes: tuple[str, ...]) -> dict[str, os.stat_result]:
+    found = {}
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            if name.lower().endswith(suffixes):
+                path = os.path.join(dirpath, name)
+                found[Path(path).relative_to(root).as_posix()] = os.stat(path)
+    return found
+
+
+def cached_or(entries: dict, rel: str, st: os.stat_result) -> dict | None:
+    entry = entries.get(rel)
+    if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+        return entry
+    return None
+
+
+def map_scene(path: Path, root: Path) -> list[str] | None:
+    """Tileset images of a Tiled map JSON, relative to root; None if it isn't a map."""
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or 'tilesets' not in data or 'layers' not in data:
+        return None
+    images = set()
+    for ts in data['tilesets']:
+        tiles = ts.get('tiles') or []
+        # image-collection tilesets have one image per tile
+        tiles = tiles.values() if isinstance(tiles, dict) else tiles
+        for src in filter(None, [ts.get('image')] + [t.get('image') for t in tiles]):
+            full = (path.parent / src).resolve()
+            try:
+                images.add(full.relative_to(root.resolve()).as_posix())
+            except ValueError:
+                images.add(full.as_posix())
+    return sorted(images)
+
+
+# ---- estimates ----
+
+def gpu_bytes(info: dict, mipmaps: bool) -> int:
+    size = info['width'] * info['height'] * 4
+    return size * 4 // 3 if mipmaps else size
+
+
+def is_pot(n: int) -> bool:
+    return n > 0 and n & (n - 1) == 0
+
+
+def audit(root: Path, manifest_path: Path | None, scenes: dict[str, list[str]], args) -> dict:
+    manifest = load_manifest(manifest_path) if manifest_path else {}
+    textures = manifest.get('textures', {})
+    maps = manifest.get('maps', {})
+
+    images = scan(root, IMAGE_SUFFIXES)
+    stale = [rel for rel, st in images.items() if cached_or(textures, rel, st) is None]
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        for rel, info in zip(stale, pool.map(read_header, [str(root / r) for r in stale])):
+            st = images[rel]
+            textures[rel] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'info': info}
+    textures = {rel: textures[rel] for rel in images}
+
+    map_files = scan(root, ('.json',))
+    for rel, st in map_files.items():
+        if cached_or(maps, rel, st) is None:
+            maps[rel] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'images': map_scene(root / rel, root)}
+    maps = {rel: maps[rel] for rel in map_files}
+
+    if manifest_path:
+        save_manifest(manifest_path, {'textures': textures, 'maps': maps})
+
+    report = {'textures': [], 'scenes': [], 'flagged': 0, 'read': len(stale), 'cached': len(images) - len(stale)}
+    for rel, entry in sorted(textures.items()):
+        info = dict(entry['info'])
+        row = {'path': rel, 'file_bytes': entry['size'], **info, 'flags': []}
+        if 'error' in info:
+            row['flags'].append(f"unreadable: {info['error']}")
+        else:
+            row['gpu_bytes'] = gpu_bytes(info, args.mipmaps)
+            longest = max(info['width'], info['height'])
+            if longest > args.hard_max_size:
+                row['flags'].append(f"CRITICAL: over {args.hard_max_size}px")
+            elif longest > args.max_size:
+                row['flags'].append(f"over {args.max_size}px")
+            if row['gpu_bytes'] > args.texture_budget * MB:
+                row['flags'].append(f"over the {args.texture_budget} MB texture budget")
+            if info.get('misnamed'):
+                row['flags'].append(f"{info['format'].upper()} data with a {Path(rel).suffix} name")
+            if args.mipmaps and not (is_pot(info['width']) and is_pot(info['height'])):
+                row['flags'].append('not power-of-two (no mipmaps on WebGL1)')
+        report['textures'].append(row)
+
+    by_path = {row['path']: row for row in report['textures']}
+    all_scenes = {f"map:{rel}": entry['images'] for rel, entry in maps.items() if entry['images']}
+    for name, patterns in scenes.items():
+        all_scenes[name] = [rel for rel in textures
+                            if any(fnmatch.fnmatch((root / rel).as_posix(), p) or fnmatch.fnmatch(rel, p)
+                                   for p in patterns)]
+    for name, members in sorted(all_scenes.items()):
+        missing = [m for m in members if m not in by_path]
+        total = sum(by_path[m].get('gpu_bytes', 0) for m in members if m in by_path)
+        scene = {'scene': name, 'textures': len(members), 'gpu_bytes': total, 'missing': missing, 'flags': []}
+        if total > args.scene_budget * MB:
+            scene['flags'].append(f"over the {args.scene_budget} MB scene budget")
+        report['scenes'].append(scene)
+
+    report['flagged'] = (sum(1 for r in report['textures'] if r['flags'])
+                         + sum(1 for s in report['scenes'] if s['flags']))
+    report['failing'] = (sum(1 for r in report['textures']
+                             if any(f.startswith(('CRITICAL', 'over the')) for f in r['flags']))
+                         + sum(1 for s in report['scenes'] if s['flags']))
+    report['gpu_bytes'] = sum(r.get('gpu_bytes', 0) for r in report['textures'])
+    return report
+
+
+def print_report(report: dict, top: int) -> None:
+    rows = sorted(report['textures'], key=lambda r: -r.get('gpu_bytes', 0))
+    print(f"{'GPU MB':>8} {'file KB':>8}  {'size':>11} {'fmt':<4} {'bits':>4} alpha  path")
+    for r in rows[:top]:
+        if 'error' in r:
+            continue
+        print(f"{r['gpu_bytes'] / MB:8.1f} {r['file_bytes'] / 1024:8.0f}  {r['width']:>5}x{r['height']:<5} "
+              f"{r['format']:<4} {r['bit_depth']:>4} {'yes' if r['alpha'] else 'no ':<5}  {r['path']}")
+    if len(rows) > top:
+        print(f"  ... {len(rows) - top} more")
+
+    flagged = [r for r in rows if r['flags']]
+    if flagged:
+        print("\nFlagged textures:")
+        for r in flagged:
+            print(f"  {r['path']}: {'; '.join(r['flags'])}")
+
+    if report['scenes']:
+        print("\nScenes:")
+        for s in report['scenes']:
+            extra = f", {len(s['missing'])} missing" if s['missing'] else ''
+            flags = f"  <- {'; '.join(s['flags'])}" if s['flags'] else ''
+            print(f"  {s['gpu_bytes'] / MB:8.1f} MB  {s['textures']:>3} texture(s){extra}  {s['scene']}{flags}")
+
+    print(f"\n{len(rows)} texture(s), {report['gpu_bytes'] / MB:.1f} MB decoded in total; "
+          f"{report['read']} header(s) read, {report['cached']} from the manifest; {report['flagged']} flagged")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default="client/public/assets", help="Folder to scan (default client/public/assets)")
+    ap.add_argument("--manifest", default=".map_cache/texture_manifest.json", help="Header cache (mtime + size)")
+    ap.add_argument("--no-manifest", action="store_true", help="Read every header again, don't save a manifest")
+    ap.add_argument("--max-size", type=int, default=4096, help="Warn above this width/height (default 4096)")
+    ap.add_argument("--hard-max-size", type=int, default=8192, help="Critical above this width/height (default 8192)")
+    ap.add_argument("--texture-budget", type=float, default=64, help="MB of GPU memory per texture (default 64)")
+    ap.add_argument("--scene-budget", type=float, default=512, help="MB of GPU memory per scene (default 512)")
+    ap.add_argument("--mipmaps", action="store_true", help="Count mipmap chains (x4/3) and flag non-power-of-two")
+    ap.add_argument("--scene", action="append", default=[], metavar="NAME=GLOB[,GLOB]",
+                    help="Extra scene made of the textures matching the glob(s) (repeatable)")
+    ap.add_argument("--jobs", type=int, default=min(32, (os.cpu_count() or 1) * 4), help="Parallel header reads")
+    ap.add_argument("--top", type=int, default=25, help="Largest textures listed (default 25)")
+    ap.add_argument("--json", default=None, help="Also write the full report as JSON here")
+    args = ap.parse_args()
+
+    scenes = {}
+    for spec in args.scene:
+        name, _, patterns = spec.partition('=')
+        if not patterns:
+            ap.error(f"--scene needs NAME=GLOB, got {spec!r}")
+        scenes[name] = patterns.split(',')
+
+    start = time.perf_counter()
+    root = Path(args.root)
+    manifest = None if args.no_manifest else Path(args.manifest)
+    report = audit(root, manifest, scenes, args)
+    print_report(report, args.top)
+    print(f"Done in {time.perf_counter() - start:.2f}s")
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding='utf-8')
+        print(f"Saved {args.json}")
+    return 1 if report['failing'] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+bake_layers.py
+
+Pre-renders the static tile layers of a converted map into PNG chunks, so the
+client blits a handful of images instead of drawing every tile of every layer:
+
+- a layer is static (bakeable) when it is visible, has no offset/parallax/
+  tint, contains no animated tiles, is not a collision layer, and only uses
+  tilesets with the map's tile size
+- consecutive static layers are merged into one "band"; a non-static layer
+  ends the band so the draw order stays exactly the same, and overhead layers
+  (Roof/Top, drawn above sprites by Game.js) get a band of their own
+- every band is composited per chunk (default 1024x1024 px) with NumPy tile
+  gathers + Pillow alpha compositing, one chunk per worker process; fully
+  transparent chunks are skipped
+- <map>.baked.json lists, in draw order, the baked bands (with their chunk
+  images) and the layers the client still has to draw itself
+
+Usage:
+  python bake_layers.py
+  python bake_layers.py client/public/assets/maps/victorian/city_map_split.json --chunk-px 1024 --jobs 8
+
+Notes:
+- Tileset images are loaded on first use in each worker process and reused
+  across chunks.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from map_layers import (
+    GID_MASK, gather_tiles, layer_array, load_tileset_image, tile_layers, tiles_as_dict, tileset_first_gids,
+    tileset_index,
+)
+from map_stream import load_map
+from nav_export import COLLISION_TILE_LAYERS
+
+MAP_JSON = 'client/public/assets/maps/victorian/city_map_split.json'
+OVERHEAD_KEYWORDS = ('Roof', 'Top')
+# layer fields a baked band can't reproduce, with the value Tiled uses when they're absent
+UNBAKEABLE_FIELDS = {'offsetx': 0, 'offsety': 0, 'parallaxx': 1, 'parallaxy': 1, 'tintcolor': None}
+
+# tileset images per worker process, keyed by path
+_images: dict[str, np.ndarray | None] = {}
+
+
+def manifest_path(map_path: Path) -> Path:
+    map_path = Path(map_path)
+    return map_path.with_name(f"{map_path.stem}.baked.json")
+
+
+def animated_gids(tilesets: list[dict]) -> np.ndarray:
+    gids = [ts['firstgid'] + tid for ts in tilesets for tid, t in tiles_as_dict(ts).items() if t.get('animation')]
+    return np.array(sorted(gids), dtype=np.uint32)
+
+
+def why_not_static(layer: dict, grid: np.ndarray, map_data: dict, animated: np.ndarray) -> str | None:
+    """Reason the layer must stay a live layer, or None if it can be baked."""
+    if not layer.get('visible', True):
+        return 'hidden'
+    if (layer.get('name') or '').lower() in COLLISION_TILE_LAYERS:
+        return 'collision layer'
+    for field, default in UNBAKEABLE_FIELDS.items():
+        if layer.get(field, default) not in (None, default):
+            return f"has {field}"
+    bare = grid & GID_MASK
+    if len(animated) and np.isin(bare, animated).any():
+        return 'animated tiles'
+    tilesets = map_data.get('tilesets', [])
+    used = np.unique(bare[bare != 0]).astype(np.int64)
+    for i in np.unique(tileset_index(used, tileset_first_gids(tilesets))).tolist():
+        ts = tilesets[i] if i >= 0 else None
+        if ts is None or (ts['tilewidth'], ts['tileheight']) != (map_data['tilewidth'], map_data['tileheight']):
+            return 'tiles larger than the map grid'
+    return None
+
+
+def plan_bands(map_data: dict) -> list[dict]:
+    """Draw-order list of {'baked': name, 'layers': [...], 'depth': n} and {'layer': name, 'reason': ...}."""
+    animated = animated_gids(map_data.get('tilesets', []))
+    plan = []
+    band = None
+    for layer in tile_layers(map_data):
+        name = layer.get('name')
+        reason = why_not_static(layer, layer_array(layer, map_data), map_data, animated)
+        if reason is not None:
+            plan.append({'layer': name, 'reason': reason})
+            band = None
+            continue
+        depth = 15 if any(k in name for k in OVERHEAD_KEYWORDS) else 0
+        if band is None or band['depth'] != depth:
+            band = {'baked': f"band_{sum(1 for p in plan if 'baked' in p)}", 'layers': [], 'depth': depth}
+            plan.append(band)
+        band['layers'].append(name)
+    return plan
+
+
+def tileset_images(tilesets: list[dict], base_dir: str, used: np.ndarray) -> list:
+    """RGBA arrays of the tilesets at indices `used` (others None), cached per process."""
+    images = [None] * len(tilesets)
+    for i in used.tolist():
+        ts = tilesets[i]
+        path = os.path.join(base_dir, ts.get('image') or '')
+        if path not in _images:
+            _images[path] = load_tileset_image(ts, base_dir) if ts.get('image') and os.path.exists(path) else None
+        images[i] = _images[path]
+    return images
+
+
+def bake_chunk(grids: list[tuple[np.ndarray, float]], tilesets: list[dict], base_dir: str,
+               tile_size: tuple[int, int], out_png: str) -> int | None:
+    """Composites the (rows, cols) GID grids bottom to top; returns PNG bytes, or None if empty."""
+    tw, th = tile_size
+    rows, cols = grids[0][0].shape
+    bare = np.unique(np.concatenate([g.ravel() for g, _ in grids]) & GID_MASK).astype(np.int64)
+    used = np.unique(tileset_index(bare[bare != 0], tileset_first_gids(tilesets)))
+    images = tileset_images(tilesets, base_dir, used[used >= 0])
+    canvas = None
+    for gids, opacity in grids:
+        if not gids.any():
+            continue
+        uniq, inverse = np.unique(gids, return_inverse=True)
+        stack = gather_tiles(uniq, tilesets, images, tile_size)
+        # (cells, th, tw, 4) -> (rows * th, cols * tw, 4)
+        pixels = stack[inverse.ravel()].reshape(rows, cols, th, tw, 4).transpose(0, 2, 1, 3, 4)
+        pixels = np.ascontiguousarray(pixels).reshape(rows * th, cols * tw, 4)
+        if opacity < 1:
+            pixels[..., 3] = (pixels[..., 3] * opacity).astype(np.uint8)
+        layer = Image.fromarray(pixels, 'RGBA')
+        canvas = layer if canvas is None else Image.alpha_composite(canvas, layer)
+    if canvas is None or canvas.getextrema()[3][1] == 0:
+        return None
+    canvas.save(out_png)
+    return os.path.getsize(out_png)
+
+
+def bake(map_path: Path, chunk_px: int, jobs: int) -> int:
+    start = time.perf_counter()
+    map_data = load_map(map_path)
+    base_dir = map_path.parent
+    tw, th = map_data['tilewidth'], map_data['tileheight']
+    width, height = map_data['width'], map_data['height']
+    # tiles per chunk side, rounded down to whole tiles
+    cw, ch = max(1, chunk_px // tw), max(1, chunk_px // th)
+
+    plan = plan_bands(map_data)
+    layers = {l.get('name'): l for l in tile_layers(map_data)}
+    # workers only need tileset geometry, not per-tile metadata
+    tilesets = [{k: v for k, v in ts.items() if k != 'tiles'} for ts in map_data.get('tilesets', [])]
+    out_dir = base_dir / f"{map_path.stem}_baked"
+    out_dir.mkdir(exist_ok=True)
+
+    jobs_list = []
+    for entry in plan:
+        if 'baked' not in entry:
+            continue
+        grids = [(layer_array(layers[n], map_data), float(layers[n].get('opacity', 1.0))) for n in entry['layers']]
+        for y in range(0, height, ch):
+            for x in range(0, width, cw):
+                sub = [(g[y:y + ch, x:x + cw], o) for g, o in grids]
+                if not any(g.any() for g, _ in sub):
+                    continue
+                png = out_dir / f"{entry['baked']}_{x // cw}_{y // ch}.png"
+                jobs_list.append((entry, x, y, sub, png))
+
+    png_sizes = []
+    with ProcessPoolExecutor(max_workers=max(1, min(jobs, len(jobs_list) or 1))) as pool:
+        futures = [pool.submit(bake_chunk, sub, tilesets, str(base_dir), (tw, th), str(png))
+                   for _, _, _, sub, png in jobs_list]
+        for (entry, x, y, sub, png), fut in zip(jobs_list, futures):
+            size = fut.result()
+            if size is None:
+                continue
+            rows, cols = sub[0][0].shape
+            entry.setdefault('chunks', []).append({
+                'x': x * tw, 'y': y * th, 'width': cols * tw, 'height': rows * th,
+                'image': png.relative_to(base_dir).as_posix(),
+            })
+            png_sizes.append(size)
+
+    manifest = {
+        'map': map_path.name,
+        'chunksize': [cw * tw, ch * th],
+        'tilewidth': tw,
+        'tileheight': th,
+        'draw': plan,
+    }
+    out = manifest_path(map_path)
+    out.write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+
+    live_cells = sum(int((layer_array(layers[e['layer']], map_data) != 0).sum()) for e in plan if 'layer' in e)
+    baked_cells = sum(int((layer_array(layers[n], map_data) != 0).sum())
+                      for e in plan if 'baked' in e for n in e['layers'])
+    chunks = sum(len(e.get('chunks', [])) for e in plan)
+    for e in plan:
+        if 'baked' in e:
+            print(f"  {e['baked']} (depth {e['depth']}): {', '.join(e['layers'])} -> {len(e.get('chunks', []))} chunk(s)")
+        else:
+            print(f"  live layer {e['layer']}: {e['reason']}")
+    print(f"Tile draws: {baked_cells + live_cells} -> {chunks} chunk blit(s) + {live_cells} live tile(s)")
+    print(f"Chunk images: {sum(png_sizes) / 1024 / 1024:.1f} MB in {out_dir}")
+    print(f"Saved {out} in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("map", nargs="?", default=MAP_JSON, help="Map JSON with embedded tilesets")
+    ap.add_argument("--chunk-px", type=int, default=1024, help="Chunk size in pixels (default 1024)")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    args = ap.parse_args()
+    return bake(Path(args.map), args.chunk_px, args.jobs)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+bench_map_pipeline.py
+
+Benchmarks the map pipeline on synthetic TMX maps and stores the results as
+JSON, so runs on different commits can be compared:
+
+- generates maps for every combination of --sizes, --layers, --tilesets and
+  --encodings (csv, base64, zlib, gzip), with external TSX tilesets and
+  generated tileset images; the same seed gives the same maps
+- runs each stage in a fresh Python process and records its wall time and
+  peak RSS (process + its worker processes):
+    parse      XML parse of the TMX
+    decode     decode_layer_data on every layer
+    serialize  tmx_to_json TMX -> JSON
+    validate   validate_tmx --deep checks
+    split      split_tileset on the JSON (tilesets split in 4 chunks)
+    inspect    map_stream load + inspect_map_json statistics
+- --compare prints the time/RSS ratio of every stage against an older result
+
+Usage:
+  python bench_map_pipeline.py --quick
+  python bench_map_pipeline.py --sizes 128 1024 4096 --layers 2 8 --encodings csv zlib --output build/bench/new.json
+  python bench_map_pipeline.py --compare build/bench/old.json --output build/bench/new.json
+
+Notes:
+- Results go to build/bench/ (ignored by git) unless --output says otherwise.
+- Generated maps live in --work-dir (a temp folder unless given) and are
+  removed afterwards unless --keep is set.
+- Peak RSS needs the resource module (Linux/macOS) or psutil (Windows).
+"""
+
+from __future__ import annotations
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from base64 import b64encode
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+STAGES = ('parse', 'decode', 'serialize', 'validate', 'split', 'inspect')
+ENCODINGS = ('csv', 'base64', 'zlib', 'gzip')
+# stages that read the JSON written by serialize
+NEEDS_JSON = ('split', 'inspect')
+TILE_PX = 32
+TILESET_COLUMNS = 16
+TILESET_TILES = 256
+OUTPUT_JSON = 'build/bench/bench_map_pipeline.json'
+
+
+def peak_rss_mb() -> float | None:
+    """Peak resident memory of this process and its finished children, in MB."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2 ** 20
+        except (ImportError, AttributeError):
+            return None
+    scale = 2 ** 20 if sys.platform == 'darwin' else 1024
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / scale
+
+
+# --- synthetic maps ----------------------------------------------------------
+
+def encode_grid(grid: np.ndarray, encoding: str) -> tuple[dict, str]:
+    """(data attributes, data text) of a (h, w) uint32 grid in a TMX encoding."""
+    if encoding == 'csv':
+        rows = [','.join(map(str, row)) for row in grid.tolist()]
+        return {'encoding': 'csv'}, '\n' + ',\n'.join(rows) + '\n'
+    raw = grid.astype('<u4').tobytes()
+    attrs = {'encoding': 'base64'}
+    if encoding == 'zlib':
+        raw = zlib.compress(raw)
+        attrs['compression'] = 'zlib'
+    elif encoding == 'gzip':
+        raw = gzip.compress(raw, mtime=0)
+        attrs['compression'] = 'gzip'
+    return attrs, b64encode(raw).decode('ascii')
+
+
+def write_tileset(folder: Path, index: int, rng: np.random.Generator) -> str:
+    """Writes tileset_<index>.tsx + .png (flat-coloured tiles); returns the TSX name."""
+    rows = TILESET_TILES // TILESET_COLUMNS
+    colors = rng.integers(0, 256, size=(rows, TILESET_COLUMNS, 1, 1, 4), dtype=np.uint8)
+    colors[..., 3] = 255
+    pixels = np.broadcast_to(colors, (rows, TILESET_COLUMNS, TILE_PX, TILE_PX, 4))
+    pixels = pixels.transpose(0, 2, 1, 3, 4).reshape(rows * TILE_PX, TILESET_COLUMNS * TILE_PX, 4)
+    Image.fromarray(np.ascontiguousarray(pixels), 'RGBA').save(folder / f"tileset_{index}.png")
+    name = f"tileset_{index}.tsx"
+    (folder / name).write_text(
+        f'<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<tileset version="1.10" name="tileset_{index}" tilewidth="{TILE_PX}" tileheight="{TILE_PX}" '
+        f'tilecount="{TILESET_TILES}" columns="{TILESET_COLUMNS}">\n'
+        f' <image source="tileset_{index}.png" width="{TILESET_COLUMNS * TILE_PX}" '
+        f'height="{rows * TILE_PX}"/>\n'
+        f'</tileset>\n', encoding='utf-8')
+    return name
+
+
+def generate_tmx(path: Path, size: int, layers: int, tilesets: int, encoding: str, seed: int = 0) -> Path:
+    """
+    Writes a size x size TMX with `layers` tile layers over `tilesets` external
+    tilesets. Layer 0 is full, the others get sparser; some tiles are flipped.
+    """
+    rng = np.random.default_rng(seed)
+    folder = path.parent
+    folder.mkdir(parents=True, exist_ok=True)
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        f'<map version="1.10" orientation="orthogonal" renderorder="right-down" width="{size}" '
+        f'height="{size}" tilewidth="{TILE_PX}" tileheight="{TILE_PX}" infinite="0" '
+        f'nextlayerid="{layers + 2}" nextobjectid="1">',
+    ]
+    for i in range(tilesets):
+        tsx = folder / f"tileset_{i}.tsx"
+        name = tsx.name if tsx.exists() else write_tileset(folder, i, rng)
+        parts.append(f' <tileset firstgid="{1 + i * TILESET_TILES}" source="{name}"/>')
+    for li in range(layers):
+        gids = rng.integers(1, tilesets * TILESET_TILES + 1, size=(size, size), dtype=np.uint32)
+        density = 1.0 if li == 0 else 0.5 / li
+        gids[rng.random((size, size)) >= density] = 0
+        flips = rng.random((size, size)) < 0.05
+        gids[flips & (gids != 0)] |= np.uint32(0x80000000)
+        attrs, text = encode_grid(gids, encoding)
+        attr_text = ''.join(f' {k}="{v}"' for k, v in attrs.items())
+        parts.append(f' <layer id="{li + 1}" name="Layer {li}" width="{size}" height="{size}">')
+        parts.append(f'  <data{attr_text}>{text}</data>')
+        parts.append(' </layer>')
+    parts.append('</map>\n')
+    path.write_text('\n'.join(parts), encoding='utf-8')
+    return path
+
+
+# --- stages (run in a child process) -----------------------------------------
+
+def run_stage(stage: str, tmx: Path, json_path: Path) -> None:
+    """Body of one stage; anything it prints is discarded by the caller."""
+    import xml.etree.ElementTree as ET
+
+    if stage == 'parse':
+        ET.parse(tmx)
+    elif stage == 'decode':
+        root = ET.parse(tmx).getroot()
+        for data in root.iter('data'):
+            decode_layer_data(data)
+    elif stage == 'serialize':
+        tmx_to_json(tmx, json_path)
+    elif stage == 'validate':
+        result = validate_one_tmx(tmx, [], deep=True)
+        if result['errors']:
+            raise RuntimeError('; '.join(result['errors'][:3]))
+    elif stage == 'split':
+        # half the tileset image, so every tileset is cut into 4 chunks
+        split_out = json_path.with_name(f"{json_path.stem}_split.json")
+        if split_map(json_path, split_out, TILESET_COLUMNS * TILE_PX // 2, jobs=1) != 0:
+            raise RuntimeError('split_tileset failed')
+    elif stage == 'inspect':
+        inspect(load_map(json_path))
+    else:
+        raise ValueError(f"Unknown stage {stage}")
+
+
+def stage_child(stage: str, tmx: Path, json_path: Path) -> int:
+    """Entry point of the child process: prints one JSON line with the measurements."""
+    # imports happen before the baseline, so only the stage itself is measured
+    global decode_layer_data, tmx_to_json, validate_one_tmx, split_map, load_map, inspect
+    from inspect_map_json import inspect
+    from map_stream import load_map
+    from split_tileset import split_map
+    from tmx_to_json import decode_layer_data, tmx_to_json
+    from validate_tmx import validate_one_tmx
+
+    baseline = peak_rss_mb()
+    out = {'stage': stage, 'ok': True, 'error': None}
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_stage(stage, tmx, json_path)
+    except Exception as e:
+        out['ok'] = False
+        out['error'] = f"{type(e).__name__}: {e}"
+    out['seconds'] = round(time.perf_counter() - start, 4)
+    out['peak_rss_mb'] = peak_rss_mb()
+    out['baseline_rss_mb'] = baseline
+    print(json.dumps(out))
+    return 0
+
+
+def measure(stage: str, tmx: Path, json_path: Path, timeout: float | None) -> dict:
+    cmd = [sys.executable, os.path.abspath(__file__), '--run-stage', stage, str(tmx), str(json_path)]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+    except subprocess.TimeoutExpired:
+        return {'stage': stage, 'ok': False, 'error': f"timed out after {timeout}s"}
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        tail = (proc.stderr.strip().splitlines() or ['no output'])[-1]
+        return {'stage': stage, 'ok': False, 'error': f"exit {proc.returncode}: {tail}"}
+    return json.loads(lines[-1])
+
+
+# --- reporting ---------------------------------------------------------------
+
+def git_commit() -> str | None:
+    try:
+        proc = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return proc.stdout.strip() or None
+
+
+def case_key(case: dict) -> tuple:
+    return case['size'], case['layers'], case['tilesets'], case['encoding']
+
+
+def compare(old: dict, new: dict) -> None:
+    before = {case_key(c): c for c in old.get('cases', [])}
+    print(f"\nCompared with {old.get('commit') or '?'} ({old.get('date', '?')}), ratio new/old:")
+    for case in new['cases']:
+        prev = before.get(case_key(case))
+        if prev is None:
+            continue
+        cells = []
+        for stage, cur in case['stages'].items():
+            ref = prev['stages'].get(stage)
+            if not ref or not ref.get('ok') or not cur.get('ok') or not ref.get('seconds'):
+                continue
+            ratio = cur['seconds'] / ref['seconds']
+            mem = ''
+            if cur.get('peak_rss_mb') and ref.get('peak_rss_mb'):
+                mem = f"/{cur['peak_rss_mb'] / ref['peak_rss_mb']:.2f}"
+            cells.append(f"{stage} {ratio:.2f}{mem}")
+        print(f"  {case['size']:>5}² x{case['layers']} ts{case['tilesets']} {case['encoding']:<6} " + '  '.join(cells))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[128, 512, 1024, 2048, 4096],
+                    help="Map widths/heights in tiles (default 128 512 1024 2048 4096)")
+    ap.add_argument("--layers", type=int, nargs="+", default=[4], help="Tile layer counts (default 4)")
+    ap.add_argument("--tilesets", type=int, nargs="+", default=[2], help="Tileset counts (default 2)")
+    ap.add_argument("--encodings", nargs="+", choices=ENCODINGS, default=list(ENCODINGS), help="Layer encodings")
+    ap.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="Stages to run")
+    ap.add_argument("--quick", action="store_true", help="Only sizes 128 and 512 (overrides --sizes)")
+    ap.add_argument("--seed", type=int, default=0, help="Random seed of the generated maps")
+    ap.add_argument("--timeout", type=float, default=None, help="Give up on a stage after this many seconds")
+    ap.add_argument("--work-dir", default=None, help="Where generated maps go (default: a temp folder)")
+    ap.add_argument("--keep", action="store_true", help="Keep the generated maps")
+    ap.add_argument("--output", default=OUTPUT_JSON, help=f"Results JSON (default {OUTPUT_JSON})")
+    ap.add_argument("--compare", default=None, help="Earlier results JSON to compare against")
+    ap.add_argument("--run-stage", nargs=3, metavar=("STAGE", "TMX", "JSON"), default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.run_stage:
+        stage, tmx, json_path = args.run_stage
+        return stage_child(stage, Path(tmx), Path(json_path))
+
+    sizes = [128, 512] if args.quick else args.sizes
+    work = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix='bench_maps_'))
+    work.mkdir(parents=True, exist_ok=True)
+    report = {
+        'commit': git_commit(),
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'seed': args.seed,
+        'cases': [],
+    }
+
+    try:
+        for size in sizes:
+            for layers in args.layers:
+                for tilesets in args.tilesets:
+                    for encoding in args.encodings:
+                        folder = work / f"ts{tilesets}"
+                        tmx = folder / f"map_{size}_{layers}_{encoding}.tmx"
+                        json_path = tmx.with_suffix('.json')
+                        generate_tmx(tmx, size, layers, tilesets, encoding, args.seed)
+                        case = {'size': size, 'layers': layers, 'tilesets': tilesets, 'encoding': encoding,
+                                'tmx_bytes': tmx.stat().st_size, 'stages': {}}
+                        if 'serialize' not in args.stages and any(s in args.stages for s in NEEDS_JSON):
+                            measure('serialize', tmx, json_path, args.timeout)
+                        line = []
+                        for stage in (s for s in STAGES if s in args.stages):
+                            if stage in NEEDS_JSON and not json_path.exists():
+                                res = {'stage': stage, 'ok': False, 'error': 'no JSON (serialize failed)'}
+                            else:
+                                res = measure(stage, tmx, json_path, args.timeout)
+                            res.pop('stage', None)
+                            case['stages'][stage] = res
+                            if res['ok']:
+                                rss = f"/{res['peak_rss_mb']:.0f}MB" if res.get('peak_rss_mb') else ''
+                                line.append(f"{stage} {res['seconds']:.3f}s{rss}")
+                            else:
+                                line.append(f"{stage} FAIL")
+                        report['cases'].append(case)
+                        print(f"{size:>5}² x{layers} ts{tilesets} {encoding:<6} "
+                              f"{case['tmx_bytes'] / 2 ** 20:7.1f} MB  " + '  '.join(line))
+                        for stage, res in case['stages'].items():
+                            if not res['ok']:
+                                print(f"       {stage}: {res['error']}")
+                        # the maps of one case are not needed by the next one
+                        if not args.keep:
+                            for p in folder.glob(f"{tmx.stem}*"):
+                                p.unlink()
+    finally:
+        if not args.keep and not args.work_dir:
+            shutil.rmtree(work, ignore_errors=True)
+
+    out = Path(args.output)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f"\nSaved {out}")
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text(encoding='utf-8')), report)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+build_cache.py
+
+Content-hash build cache for the TMX -> JSON map converter.
+
+Entries are keyed by sha256 digests of the inputs that produced them:
+- tilesets.json         TilesetRegistry store (parsed TSX, keyed by path + mtime)
+- layers/<key>.bin      decoded layer GIDs, raw little-endian uint32
+- layers/<key>.json     the same layer serialized as a JSON array fragment
+- maps/<key>.json       a complete converted map (key = TMX + every TSX + options)
+- maps/<key>.objects.json  that map's header and object layers only, so a hit
+                        can rebuild the spatial index without loading the map
+
+Fragments and maps are written and read as files, never held in memory whole,
+so the cache works for maps of any size.
+
+Nothing is ever invalidated explicitly: an edit changes the digest, so the old
+entry is simply no longer looked up. Every key also starts with
+tmx_to_json.CACHE_VERSION, which is bumped whenever the converter's output
+changes, so maps written by an older converter are never returned either.
+Delete the folder to reclaim space.
+
+Usage:
+  python tmx_to_json.py --cache-dir .map_cache
+"""
+
+from __future__ import annotations
+import hashlib
+import os
+import shutil
+import sys
+from array import array
+from pathlib import Path
+from typing import Iterable
+
+from tileset_registry import TilesetRegistry
+
+
+def digest(*parts: bytes) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        # length prefix keeps ("ab", "c") and ("a", "bc") apart
+        h.update(len(part).to_bytes(8, "little"))
+        h.update(part)
+    return h.hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    return digest(Path(path).read_bytes())
+
+
+class BuildCache:
+    def __init__(self, cache_dir: Path | str):
+        self.root = Path(cache_dir)
+        for sub in ("layers", "maps"):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+        self.tilesets = TilesetRegistry(self.root / "tilesets.json")
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, kind: str, key: str, suffix: str) -> Path:
+        return self.root / kind / f"{key}{suffix}"
+
+    def _write(self, path: Path, payload: bytes | Iterable[str]) -> None:
+        # write-then-rename so a crashed or parallel build never leaves half an entry
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        if isinstance(payload, bytes):
+            tmp.write_bytes(payload)
+        else:
+            with open(tmp, "w", encoding="ascii", newline="") as f:
+                for piece in payload:
+                    f.write(piece)
+        os.replace(tmp, path)
+
+    def _count(self, found: bool) -> None:
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    # ---- layers ----
+    def get_layer(self, key: str) -> tuple[array, Path] | None:
+        """(GIDs, path of the JSON fragment) of a cached layer."""
+        bin_path = self._path("layers", key, ".bin")
+        json_path = self._path("layers", key, ".json")
+        found = bin_path.exists() and json_path.exists()
+        self._count(found)
+        if not found:
+            return None
+        gids = array("I")
+        gids.frombytes(bin_path.read_bytes())
+        if sys.byteorder == "big":
+            gids.byteswap()
+        return gids, json_path
+
+    def put_layer(self, key: str, gids: array, fragment: str | Iterable[str]) -> Path:
+        """fragment is the layer's JSON text, as one string or as pieces; returns its path."""
+        raw = gids
+        if sys.byteorder == "big":
+            raw = array("I", gids)
+            raw.byteswap()
+        self._write(self._path("layers", key, ".bin"), raw.tobytes())
+        json_path = self._path("layers", key, ".json")
+        self._write(json_path, [fragment] if isinstance(fragment, str) else fragment)
+        return json_path
+
+    # ---- whole maps ----
+    def get_map(self, key: str) -> Path | None:
+        """Path of the cached map JSON, if any."""
+        path = self._path("maps", key, ".json")
+        self._count(path.exists())
+        return path if path.exists() else None
+
+    def get_map_objects(self, key: str) -> Path | None:
+        """Path of the cached map's object skeleton (header + object layers), if any."""
+        path = self._path("maps", key, ".objects.json")
+        return path if path.exists() else None
+
+    def put_map(self, key: str, source: Path, objects: str | None = None) -> None:
+        """Stores a copy of the converted map file at source, plus its object skeleton JSON."""
+        if objects is not None:
+            # written first, so a map entry never outlives a missing skeleton
+            self._write(self._path("maps", key, ".objects.json"), [objects])
+        path = self._path("maps", key, ".json")
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, path)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+chroma_key.py
+
+Vectorized chroma keying on RGBA NumPy arrays, shared by the sprite scripts,
+smart_clean.py and the chroma_key stage of sprite_pipeline.py.
+
+- a key is an RGB box, an RGB colour with a tolerance, or an HSV range
+  (hue wraps around, so a red key can span 340..20 degrees)
+- any number of keys; a pixel inside any of them is keyed
+- keyed pixels are replaced by one colour (transparent black by default)
+- with softness > 0, pixels just outside a key fade out instead of keeping
+  a hard edge: alpha scales with their distance to the key, 0 at the key,
+  untouched from `softness` on
+- the hard mask is plain uint8 comparisons on channel views; hue is only
+  computed for pixels that pass an HSV key's S/V bounds, and distances only
+  for the thin band of pixels inside the softness margin
+
+Key specs (JSON / dict):
+  {"min": [r, g, b], "max": [r, g, b]}             inclusive RGB box
+  {"rgb": [r, g, b], "tolerance": t | [tr, tg, tb]}  box around a colour
+  {"hsv_min": [h, s, v], "hsv_max": [h, s, v]}      h in degrees, s and v in 0..1
+
+Usage:
+  python chroma_key.py in.png out.png --preset green
+  python chroma_key.py in.png out.png --key '{"rgb": [0, 255, 0], "tolerance": 60}' --softness 24
+  python chroma_key.py in.png out.png --key '{"hsv_min": [100, 0.5, 0.4], "hsv_max": [140, 1, 1]}'
+
+Notes:
+- softness is in 0..255 channel units; for HSV keys hue is measured in
+  PIL's 0..255 hue scale (1 unit ~ 1.4 degrees).
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import time
+
+import numpy as np
+from PIL import Image
+
+# the thresholds the original one-off scripts used
+PRESETS = {
+    'green': [{'min': [0, 201, 0], 'max': [49, 255, 49]}],        # R < 50, G > 200, B < 50
+    'magenta': [{'min': [201, 0, 201], 'max': [255, 99, 255]}],   # R > 200, G < 100, B > 200
+    'checker': [{'rgb': [205, 205, 205], 'tolerance': 0},          # grey / white checkerboard
+                {'rgb': [255, 255, 255], 'tolerance': 0}],
+}
+
+
+def parse_key(spec: dict) -> tuple[str, np.ndarray, np.ndarray]:
+    """(space, lo, hi) with bounds in 0..255 units; raises ValueError on a bad spec."""
+    if 'hsv_min' in spec or 'hsv_max' in spec:
+        lo, hi = spec.get('hsv_min', [0, 0, 0]), spec.get('hsv_max', [360, 1, 1])
+        if len(lo) != 3 or len(hi) != 3:
+            raise ValueError(f"HSV key needs three values per bound: {spec}")
+        scale = np.array([255 / 360, 255, 255])
+        lo = np.rint(np.array(lo, dtype=float) * scale)
+        hi = np.rint(np.array(hi, dtype=float) * scale)
+        # hue is circular, keep it as given (lo > hi wraps); s and v are clipped
+        return 'hsv', np.clip(lo, 0, 255).astype(np.int16), np.clip(hi, 0, 255).astype(np.int16)
+    if 'rgb' in spec:
+        colour = np.array(spec['rgb'], dtype=np.int16)
+        tol = np.broadcast_to(np.array(spec.get('tolerance', 0), dtype=np.int16), (3,))
+        lo, hi = colour - tol, colour + tol
+    elif 'min' in spec or 'max' in spec:
+        lo = np.array(spec.get('min', [0, 0, 0]), dtype=np.int16)
+        hi = np.array(spec.get('max', [255, 255, 255]), dtype=np.int16)
+    else:
+        raise ValueError(f"Key needs 'min'/'max', 'rgb' or 'hsv_min'/'hsv_max': {spec}")
+    if lo.shape != (3,) or hi.shape != (3,):
+        raise ValueError(f"Key needs three values per bound: {spec}")
+    if np.any(lo > hi):
+        raise ValueError(f"Key has min > max: {spec}")
+    return 'rgb', np.clip(lo, 0, 255), np.clip(hi, 0, 255)
+
+
+def parse_keys(specs: list[dict] | str) -> list[tuple[str, np.ndarray, np.ndarray]]:
+    """Key specs (or a preset name) -> parsed keys."""
+    if isinstance(specs, str):
+        if specs not in PRESETS:
+            raise ValueError(f"Unknown preset {specs!r} (known: {', '.join(PRESETS)})")
+        specs = PRESETS[specs]
+    return [k if isinstance(k, tuple) else parse_key(k) for k in specs]
+
+
+def _hue(r: np.ndarray, g: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Hue in 0..255 (int32) of int16 channel arrays, in integer arithmetic."""
+    v = np.maximum(np.maximum(r, g), b)
+    c = v - np.minimum(np.minimum(r, g), b)
+    # position on the 6c-long hue circle, sector by sector
+    h = np.where(v == r, g - b, np.where(v == g, b - r + 2 * c, r - g + 4 * c))
+    h += 6 * c * (h < 0)
+    c = c.astype(np.int32)
+    return (h.astype(np.int32) * 255 + 3 * c) // np.maximum(6 * c, 1) % 256
+
+
+def hsv_of(pixels: np.ndarray) -> np.ndarray:
+    """(n, 3) RGB pixels -> (n, 3) int32 HSV with every channel in 0..255."""
+    r, g, b = (pixels[:, i].astype(np.int16) for i in range(3))
+    v = np.maximum(np.maximum(r, g), b).astype(np.int32)
+    c = v - np.minimum(np.minimum(r, g), b)
+    s = (c * 255 + v // 2) // np.maximum(v, 1)
+    return np.stack([_hue(r, g, b), s, v], axis=1)
+
+
+def _value_saturation(channels: dict) -> tuple[np.ndarray, np.ndarray]:
+    """Full-image V and S (uint8), computed once per image and only when an HSV key needs them."""
+    if 'v' not in channels:
+        rgb = channels['rgb']
+        v = np.maximum(np.maximum(rgb[..., 0], rgb[..., 1]), rgb[..., 2])
+        c = v - np.minimum(np.minimum(rgb[..., 0], rgb[..., 1]), rgb[..., 2])
+        channels['v'] = v
+        channels['s'] = ((c.astype(np.uint16) * 255 + v // 2) // np.maximum(v, 1)).astype(np.uint8)
+    return channels['v'], channels['s']
+
+
+def _channel_mask(values, lo: int, hi: int, grow: int) -> np.ndarray | None:
+    """Bool mask of values within [lo - grow, hi + grow]; None means every pixel (values not read)."""
+    lo, hi = max(lo - grow, 0), min(hi + grow, 255)
+    if lo == 0 and hi == 255:
+        return None
+    values = values() if callable(values) else values
+    if lo == 0:
+        return values <= hi
+    if hi == 255:
+        return values >= lo
+    return (values >= lo) & (values <= hi)
+
+
+def _hsv_mask(channels: dict, lo: np.ndarray, hi: np.ndarray, grow: int) -> np.ndarray | None:
+    """
+    HSV key test. S and V are checked on the whole image; hue (the expensive
+    part) is only computed for the pixels that pass them.
+    """
+    inside = None
+    for c in (1, 2):
+        m = _channel_mask(lambda: _value_saturation(channels)[2 - c], int(lo[c]), int(hi[c]), grow)
+        if m is not None:
+            inside = m if inside is None else inside & m
+    # hue is circular: offsets from lo wrap around 256
+    span = (int(hi[0]) - int(lo[0])) % 256 + 2 * grow
+    if span >= 255:
+        return inside
+    if inside is None:
+        inside = np.ones(channels['rgb'].shape[:2], dtype=bool)
+    idx = np.flatnonzero(inside)
+    # gather whole RGBA pixels as uint32 (cheap), then split the bytes back out
+    px = channels['img'].view(np.uint32).reshape(-1)[idx].view(np.uint8).reshape(-1, 4)
+    hue = _hue(*(px[:, i].astype(np.int16) for i in range(3)))
+    inside.ravel()[idx] = (hue - (int(lo[0]) - grow)) % 256 <= span
+    return inside
+
+
+def key_mask(channels: dict, keys: list, grow: int = 0) -> np.ndarray:
+    """Pixels inside any key, with every key's bounds widened by `grow`."""
+    keyed = None
+    for space, lo, hi in keys:
+        if space == 'hsv':
+            inside = _hsv_mask(channels, lo, hi, grow)
+        else:
+            inside = None
+            for c in range(3):
+                m = _channel_mask(channels['rgb'][..., c], int(lo[c]), int(hi[c]), grow)
+                if m is None:
+                    continue
+                if inside is None:
+                    inside = m
+                else:
+                    inside &= m
+        if inside is None:
+            return np.ones(channels['rgb'].shape[:2], dtype=bool)
+        if keyed is None:
+            keyed = inside
+        else:
+            keyed |= inside
+    return keyed if keyed is not None else np.zeros(channels['rgb'].shape[:2], dtype=bool)
+
+
+def key_distance(channels: dict, keys: list, where: np.ndarray) -> np.ndarray:
+    """Distance (0..255 units, 0 = keyed) of the pixels selected by `where` to the nearest key."""
+    best = None
+    for space, lo, hi in keys:
+        values = channels['rgb'][where]
+        values = hsv_of(values) if space == 'hsv' else values.astype(np.int32)
+        d = np.zeros(len(values), dtype=np.int32)
+        for c in range(3):
+            v = values[:, c]
+            if space == 'hsv' and c == 0:
+                outside = ((v - lo[c]) % 256) > ((hi[c] - lo[c]) % 256)
+                dc = np.where(outside, np.minimum((lo[c] - v) % 256, (v - hi[c]) % 256), 0)
+            else:
+                dc = np.maximum(np.maximum(lo[c] - v, v - hi[c]), 0)
+            np.maximum(d, dc, out=d)
+        best = d if best is None else np.minimum(best, d)
+    return best.astype(np.float32)
+
+
+def keyed_pixels(img: np.ndarray, keys: list[dict] | str, grow: int = 0) -> np.ndarray:
+    """Bool mask of the RGBA pixels inside any key (bounds widened by `grow`)."""
+    img = np.ascontiguousarray(img)
+    return key_mask({'img': img, 'rgb': img[..., :3]}, parse_keys(keys), grow)
+
+
+def apply_key(img: np.ndarray, keys: list[dict] | str, softness: float = 0,
+              replace: tuple[int, int, int, int] = (0, 0, 0, 0)) -> np.ndarray:
+    """RGBA array with keyed pixels replaced and, with softness, a faded margin. Returns img if nothing matched."""
+    keys = parse_keys(keys)
+    img = np.ascontiguousarray(img)
+    channels = {'img': img, 'rgb': img[..., :3]}
+    keyed = key_mask(channels, keys)
+    near = None
+    if softness > 0:
+        near = key_mask(channels, keys, grow=int(np.ceil(softness))) & ~keyed
+        if not near.any():
+            near = None
+    if near is None and not keyed.any():
+        return img
+    out = img.copy()
+    if near is not None:
+        factor = np.clip(key_distance(channels, keys, near) / softness, 0, 1)
+        alpha = out[..., 3]
+        alpha[near] = np.rint(alpha[near] * factor).astype(np.uint8)
+    # one uint32 per pixel: a masked copy is far cheaper than boolean row assignment
+    packed = np.array(replace, dtype=np.uint8).view(np.uint32)[0]
+    np.copyto(out.view(np.uint32)[..., 0], packed, where=keyed)
+    return out
+
+
+def key_image(img: Image.Image, keys: list[dict] | str, softness: float = 0,
+              replace: tuple[int, int, int, int] = (0, 0, 0, 0)) -> Image.Image:
+    """apply_key for a PIL image; returns an RGBA image."""
+    arr = np.array(img.convert('RGBA'))
+    return Image.fromarray(apply_key(arr, keys, softness, replace), 'RGBA')
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("input", help="Image to key")
+    ap.add_argument("output", help="Where to write the keyed PNG")
+    ap.add_argument("--preset", action="append", default=[], choices=sorted(PRESETS), help="Built-in key(s)")
+    ap.add_argument("--key", action="append", default=[], help="Key spec as JSON (repeatable)")
+    ap.add_argument("--softness", type=float, default=0, help="Alpha falloff width outside the keys (0..255 units)")
+    ap.add_argument("--replace", default="0,0,0,0", help="RGBA written into keyed pixels (default: 0,0,0,0)")
+    args = ap.parse_args()
+
+    specs = [k for p in args.preset for k in PRESETS[p]] + [json.loads(k) for k in args.key]
+    if not specs:
+        ap.error("give at least one --preset or --key")
+    try:
+        keys = parse_keys(specs)
+    except ValueError as e:
+        print(e)
+        return 1
+    replace = tuple(int(v) for v in args.replace.split(','))
+
+    with Image.open(args.input) as im:
+        img = np.array(im.convert('RGBA'))
+    start = time.perf_counter()
+    out = apply_key(img, keys, args.softness, replace)
+    elapsed = time.perf_counter() - start
+    Image.fromarray(out, 'RGBA').save(args.output)
+    cleared = int(np.count_nonzero((out[..., 3] == 0) & (img[..., 3] != 0)))
+    print(f"Keyed {img.shape[1]}x{img.shape[0]} in {elapsed * 1000:.1f} ms: {cleared} pixel(s) cleared")
+    print(f"Saved {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
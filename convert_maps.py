@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+convert_maps.py
+
+Batch TMX -> JSON conversion across a process pool (one worker per map).
+
+- accepts TMX files, folders (scanned recursively) and glob patterns
+- every worker shares the same build cache folder, so an external TSX used by
+  many maps is parsed once and reused by the others
+- prints a per-map timing/size summary and can write it as a JSON report
+- --nav also exports <name>.nav navigation data (see nav_export.py)
+- --anim also writes <name>.anim.json animation timelines (see anim_timeline.py)
+
+Usage:
+  python convert_maps.py client/public/assets/maps
+  python convert_maps.py "maps/**/*.tmx" --out-dir build/maps --jobs 8 --report convert_report.json
+
+Notes:
+- Output is <name>.json next to each TMX unless --out-dir is given; there the
+  TMX's folders below the input folder / glob prefix are mirrored, and two
+  maps that would still write the same file stop the run before converting.
+- Conversion itself is tmx_to_json.tmx_to_json, so output matches tmx_to_json.py.
+"""
+
+from __future__ import annotations
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from build_cache import BuildCache
+from tmx_to_json import LAYER_ENCODINGS, tmx_to_json
+
+
+def collect_tmx(inputs: list[str]) -> list[Path]:
+    found = []
+    for item in inputs:
+        p = Path(item).expanduser()
+        if p.is_dir():
+            found.extend(p.rglob("*.tmx"))
+        elif p.is_file():
+            found.append(p)
+        else:
+            found.extend(Path(m) for m in glob.glob(item, recursive=True) if m.endswith(".tmx"))
+
+    # de-duplicate while keeping a stable order
+    seen = set()
+    unique = []
+    for p in sorted(found):
+        key = p.resolve()
+        if key not in seen:
+            seen.add(key)
+            unique.append(p)
+    return unique
+
+
+def input_roots(inputs: list[str]) -> list[Path]:
+    """The folder each input stands for: the folder itself, a file's parent, or a glob's fixed prefix."""
+    roots = []
+    for item in inputs:
+        p = Path(item).expanduser()
+        if p.is_dir():
+            roots.append(p)
+        elif p.is_file():
+            roots.append(p.parent)
+        else:
+            fixed = []
+            for part in p.parts:
+                if glob.has_magic(part):
+                    break
+                fixed.append(part)
+            roots.append(Path(*fixed) if fixed else Path("."))
+    return roots
+
+
+def output_path(tmx: Path, out_dir: Path | None, roots: list[Path] = ()) -> Path:
+    if out_dir is None:
+        return tmx.with_suffix(".json")
+    # mirror the TMX's folders below the (deepest) input it came from, so
+    # a/town.tmx and b/town.tmx don't both become out/town.json
+    path = tmx.resolve()
+    rel = Path(tmx.name)
+    for root in sorted((r.resolve() for r in roots), key=lambda r: len(r.parts), reverse=True):
+        if path.is_relative_to(root):
+            rel = path.relative_to(root)
+            break
+    return out_dir / rel.with_suffix(".json")
+
+
+def output_collisions(outputs: dict[Path, Path]) -> dict[Path, list[Path]]:
+    """Output paths that more than one TMX would write."""
+    by_out = {}
+    for tmx, out in outputs.items():
+        by_out.setdefault(out.resolve(), []).append(tmx)
+    return {out: tmxs for out, tmxs in by_out.items() if len(tmxs) > 1}
+
+
+def convert_one(tmx: str, out: str, cache_dir: str | None, options: dict, nav: bool = False,
+                anim: bool = False) -> dict:
+    result = {
+        "tmx": tmx,
+        "json": out,
+        "ok": True,
+        "error": None,
+        "seconds": 0.0,
+        "tmx_bytes": os.path.getsize(tmx),
+        "json_bytes": 0,
+    }
+    log = io.StringIO()
+    start = time.perf_counter()
+    try:
+        cache = BuildCache(cache_dir) if cache_dir else None
+        # tmx_to_json narrates every step; keep worker output from interleaving
+        with contextlib.redirect_stdout(log):
+            tmx_to_json(Path(tmx), Path(out), cache, **options)
+        result["json_bytes"] = os.path.getsize(out)
+        if nav:
+            # NumPy is only needed for the navigation export
+            from nav_export import export_nav
+            result["nav_bytes"] = export_nav(Path(out))["bytes"]
+        if anim:
+            from anim_timeline import write_timelines
+            result["anim_bytes"] = write_timelines(Path(out))["bytes"]
+    except Exception as e:
+        result["ok"] = False
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["log"] = log.getvalue()
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def fmt_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("inputs", nargs="+", help="TMX files, folders or glob patterns")
+    ap.add_argument("--out-dir", default=None, help="Write JSON here instead of next to each TMX")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    ap.add_argument("--cache-dir", default=".map_cache", help="Shared build cache (default .map_cache)")
+    ap.add_argument("--no-cache", action="store_true", help="Disable the build cache")
+    ap.add_argument("--report", default=None, help="Write a JSON report to this path")
+    ap.add_argument("--layer-encoding", choices=LAYER_ENCODINGS, default="array", help="See tmx_to_json.py")
+    ap.add_argument("--drop-empty-layers", action="store_true", help="Omit tile layers that contain no tiles")
+    ap.add_argument("--sidecar", action="append", choices=["zstd", "brotli"], default=[],
+                    help="Also write pre-compressed <out>.zst / <out>.br (repeatable)")
+    ap.add_argument("--chunk-size", type=int, default=None, help="Chunked layer output, see tmx_to_json.py")
+    ap.add_argument("--spatial-index", type=int, nargs="?", const=0, default=None, metavar="CELL_PX",
+                    help="Also write <name>.spatial.json object grid indexes, see tmx_to_json.py")
+    ap.add_argument("--nav", action="store_true", help="Also export <name>.nav navigation data (needs NumPy)")
+    ap.add_argument("--anim", action="store_true", help="Also write <name>.anim.json animation timelines (needs NumPy)")
+    args = ap.parse_args()
+
+    tmx_files = collect_tmx(args.inputs)
+    if not tmx_files:
+        print("No TMX files found.")
+        return 1
+
+    out_dir = Path(args.out_dir) if args.out_dir else None
+    roots = input_roots(args.inputs)
+    outputs = {tmx: output_path(tmx, out_dir, roots) for tmx in tmx_files}
+    collisions = output_collisions(outputs)
+    if collisions:
+        # parallel workers would race on these files and only one map would survive
+        for out, tmxs in collisions.items():
+            print(f"Output collision: {out} <- {', '.join(str(t) for t in tmxs)}")
+        return 1
+    for out in set(outputs.values()):
+        out.parent.mkdir(parents=True, exist_ok=True)
+    cache_dir = None if args.no_cache else args.cache_dir
+    options = {
+        "layer_encoding": args.layer_encoding,
+        "drop_empty": args.drop_empty_layers,
+        "sidecars": args.sidecar,
+        "chunk_size": args.chunk_size,
+        "spatial_cell": args.spatial_index,
+    }
+
+    jobs = max(1, min(args.jobs, len(tmx_files)))
+    print(f"Converting {len(tmx_files)} map(s) with {jobs} worker(s)...\n")
+
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [
+            pool.submit(convert_one, str(tmx), str(outputs[tmx]), cache_dir, options, args.nav, args.anim)
+            for tmx in tmx_files
+        ]
+        for fut in as_completed(futures):
+            res = fut.result()
+            results.append(res)
+            status = "OK  " if res["ok"] else "FAIL"
+            print(f"{status} {res['seconds']:8.3f}s  {fmt_bytes(res['tmx_bytes']):>10} -> "
+                  f"{fmt_bytes(res['json_bytes']):>10}  {res['tmx']}")
+            if not res["ok"]:
+                print(f"       {res['error']}")
+    wall = time.perf_counter() - start
+
+    results.sort(key=lambda r: r["tmx"])
+    failed = sum(1 for r in results if not r["ok"])
+    cpu = sum(r["seconds"] for r in results)
+    print("\n" + "=" * 90)
+    print(f"Done. maps={len(results)}  failed={failed}  wall={wall:.3f}s  "
+          f"sum(per-map)={cpu:.3f}s  jobs={jobs}")
+
+    if args.report:
+        report = {
+            "jobs": jobs,
+            "wall_seconds": round(wall, 4),
+            "maps": results,
+            "failed": failed,
+        }
+        Path(args.report).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Report written to {args.report}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,9 +1,10 @@
 import xml.etree.ElementTree as ET
 import json
 import os
-import base64
-import zlib
-import struct
+
+from spatial_index import write_index
+from tileset_registry import default_registry
+from tmx_to_json import decode_layer_data, json_default
 
 TMX_FILE = 'client/public/assets/maps/victorian/victorian-preview.tmx'
 OUTPUT_FILE = 'client/public/assets/maps/victorian/city_map_fixed.json'
@@ -27,20 +28,20 @@ def parse_tileset(node, firstgid):
     if source:
         tsx_path = os.path.join(BASE_DIR, source)
         try:
-            tree = ET.parse(tsx_path)
-            root = tree.getroot()
-            info['name'] = root.get('name')
-            info['tilewidth'] = int(root.get('tilewidth'))
-            info['tileheight'] = int(root.get('tileheight'))
-            info['spacing'] = int(root.get('spacing', 0))
-            info['margin'] = int(root.get('margin', 0))
+            tsx = default_registry.get(tsx_path)
+            attrs = tsx['attrs']
+            info['name'] = attrs.get('name')
+            info['tilewidth'] = attrs['tilewidth']
+            info['tileheight'] = attrs['tileheight']
+            info['spacing'] = attrs.get('spacing', 0)
+            info['margin'] = attrs.get('margin', 0)
             
             # Find image
-            img_node = root.find('image')
-            if img_node is not None:
-                info['image'] = os.path.basename(img_node.get('source'))
-                info['imagewidth'] = int(img_node.get('width'))
-                info['imageheight'] = int(img_node.get('height'))
+            img = tsx['image']
+            if img is not None:
+                info['image'] = os.path.basename(img['source'])
+                info['imagewidth'] = img['width']
+                info['imageheight'] = img['height']
                 
                 # HOTFIX: Mismatch between TMX expectation (31488) and TSX (31104)
                 if 'terrain-map-v8' in info['image']:
@@ -105,14 +106,9 @@ def convert():
         encoding = data_node.get('encoding')
         compression = data_node.get('compression')
         
-        if encoding == 'base64' and compression == 'zlib':
-            raw_data = base64.b64decode(data_node.text.strip())
-            decompressed = zlib.decompress(raw_data)
-            # 4 bytes per tile (little endian unsigned int)
-            fmt = '<' + 'I' * (len(decompressed) // 4)
-            l_data['data'] = list(struct.unpack(fmt, decompressed))
-        elif encoding == 'csv':
-             l_data['data'] = [int(x) for x in data_node.text.strip().split(',')]
+        if encoding in ('base64', 'csv'):
+            # Typed array('I') straight over the decompressed bytes
+            l_data['data'] = decode_layer_data(data_node)
         else:
             print(f"  WARNING: Unsupported layer encoding: {encoding}/{compression}")
             
@@ -159,9 +155,13 @@ def convert():
         print(f"  Processed object group: {o_data['name']}")
 
     with open(OUTPUT_FILE, 'w') as f:
-        json.dump(map_data, f)
+        json.dump(map_data, f, default=json_default)
         
     print(f"Done! Saved to {OUTPUT_FILE}")
 
+    if any(l['type'] == 'objectgroup' for l in map_data['layers']):
+        # grid buckets so runtime trigger checks only look at nearby objects
+        print(f"Saved spatial index {write_index(OUTPUT_FILE, map_data)}")
+
 if __name__ == '__main__':
     convert()
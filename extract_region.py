@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+extract_region.py
+
+Cuts a small debug map out of a converted map: a rectangle of tiles and a
+chosen set of layers, with only the tilesets that are still referenced.
+
+- tile layers are sliced as 2D arrays (chunked/infinite layers included) and
+  written back in the layer's own encoding; flip flags are kept
+- object layers keep the objects whose bounding box overlaps the region,
+  moved so the region's top-left corner becomes (0, 0)
+- --layers picks layers by name; naming a group keeps all of its children
+- tilesets nobody references any more are dropped and the remaining ones get
+  consecutive firstgids; every layer GID and object gid is renumbered
+- image / source paths are rewritten relative to the output file
+
+Usage:
+  python extract_region.py client/public/assets/maps/victorian/city_map.json debug_map.json --region 40 40 32 24
+  python extract_region.py map.json debug_map.json --region 0 0 64 64 --layers Trn_1 Collisions
+"""
+
+from __future__ import annotations
+import argparse
+import os
+from pathlib import Path
+
+import numpy as np
+
+from map_layers import (
+    FLAG_MASK, GID_MASK, layer_array, save_map, set_layer_array, tileset_first_gids, tileset_index,
+    tileset_tilecount,
+)
+from map_stream import load_map
+from spatial_index import object_bounds
+
+
+def filter_layers(layers: list[dict], wanted: set[str] | None) -> list[dict]:
+    """Copies of the layers named in `wanted` (all if None), keeping groups that still hold any."""
+    kept = []
+    for layer in layers:
+        selected = wanted is None or layer.get('name') in wanted
+        if layer.get('type') == 'group':
+            children = filter_layers(layer.get('layers', []), None if selected else wanted)
+            if children:
+                kept.append({**layer, 'layers': children})
+        elif selected:
+            kept.append(dict(layer))
+    return kept
+
+
+def walk(layers: list[dict]):
+    for layer in layers:
+        yield layer
+        if layer.get('type') == 'group':
+            yield from walk(layer['layers'])
+
+
+def crop(layer: dict, map_data: dict, x: int, y: int, w: int, h: int) -> np.ndarray:
+    """(h, w) GIDs of the layer under the region; cells the layer doesn't cover are 0."""
+    grid = layer_array(layer, map_data)
+    # chunked layers start at startx/starty, plain layers at 0
+    ox, oy = layer.get('startx', 0), layer.get('starty', 0)
+    out = np.zeros((h, w), dtype=np.uint32)
+    gx0, gy0 = max(x - ox, 0), max(y - oy, 0)
+    gx1, gy1 = min(x + w - ox, grid.shape[1]), min(y + h - oy, grid.shape[0])
+    if gx1 > gx0 and gy1 > gy0:
+        out[gy0 + oy - y:gy1 + oy - y, gx0 + ox - x:gx1 + ox - x] = grid[gy0:gy1, gx0:gx1]
+    return out
+
+
+def renumber(tilesets: list[dict], used: np.ndarray) -> tuple[list[dict], np.ndarray, np.ndarray]:
+    """
+    Kept tilesets (new firstgids) for the bare GIDs in `used`, plus the lookup
+    (old firstgids, new firstgid per old tileset or -1 if dropped).
+    """
+    first = tileset_first_gids(tilesets)
+    bare = used[used != 0].astype(np.int64)
+    owner = tileset_index(bare, first)
+    bare, owner = bare[owner >= 0], owner[owner >= 0]
+    # highest local id each tileset is asked for; Tiled lets a tileset's GID range
+    # run past its tilecount, so the new range must cover that too
+    top = np.full(len(tilesets), -1, dtype=np.int64)
+    np.maximum.at(top, owner, bare - first[owner])
+    new_first = np.full(len(tilesets), -1, dtype=np.int64)
+    kept = []
+    next_gid = 1
+    for i in np.unique(owner).tolist():
+        entry = dict(tilesets[i])
+        entry['firstgid'] = next_gid
+        new_first[i] = next_gid
+        next_gid += max(tileset_tilecount(entry), int(top[i]) + 1)
+        kept.append(entry)
+    return kept, first, new_first
+
+
+def remap(gids: np.ndarray, first: np.ndarray, new_first: np.ndarray) -> tuple[np.ndarray, int]:
+    """GIDs moved to their tileset's new firstgid, flags kept; returns (gids, GIDs without a tileset)."""
+    gids = np.asarray(gids, dtype=np.uint32)
+    uniq, inverse = np.unique(gids, return_inverse=True)
+    bare = (uniq & GID_MASK).astype(np.int64)
+    owner = tileset_index(bare, first)
+    target = np.full(len(uniq), -1, dtype=np.int64)
+    target[owner >= 0] = new_first[owner[owner >= 0]]
+    ok = (bare != 0) & (target > 0)
+    moved = np.zeros(len(uniq), dtype=np.uint32)
+    moved[ok] = ((bare[ok] - first[owner[ok]] + target[ok]).astype(np.uint32)) | (uniq[ok] & FLAG_MASK)
+    lost = int(np.count_nonzero((bare != 0) & ~ok))
+    return moved[inverse.ravel()].reshape(gids.shape), lost
+
+
+def rebase_path(path: str, src_dir: Path, out_dir: Path) -> str:
+    if not path or os.path.isabs(path) or '://' in path:
+        return path
+    return Path(os.path.relpath(src_dir / path, out_dir)).as_posix()
+
+
+def extract(map_path: Path, out_path: Path, region: tuple[int, int, int, int] | None,
+            layer_names: list[str] | None) -> int:
+    map_data = load_map(map_path)
+    tw, th = map_data['tilewidth'], map_data['tileheight']
+    x, y, w, h = region or (0, 0, map_data['width'], map_data['height'])
+    if w <= 0 or h <= 0:
+        print(f"Empty region {w}x{h}")
+        return 1
+
+    wanted = set(layer_names) if layer_names else None
+    layers = filter_layers(map_data.get('layers', []), wanted)
+    if wanted:
+        missing = wanted - {l.get('name') for l in walk(layers)}
+        if missing:
+            print(f"Layer(s) not found: {', '.join(sorted(missing))}")
+            return 1
+
+    # slice first, so only GIDs inside the region decide which tilesets stay
+    grids = {}
+    objects = {}
+    x0, y0, x1, y1 = x * tw, y * th, (x + w) * tw, (y + h) * th
+    for layer in walk(layers):
+        if layer.get('type') == 'tilelayer':
+            grids[id(layer)] = crop(layer, map_data, x, y, w, h)
+        elif layer.get('type') == 'objectgroup':
+            inside = []
+            for obj in layer.get('objects', []) or []:
+                bx0, by0, bx1, by1 = object_bounds(obj)
+                if bx0 < x1 and x0 < bx1 and by0 < y1 and y0 < by1:
+                    inside.append({**obj, 'x': obj.get('x', 0) - x0, 'y': obj.get('y', 0) - y0})
+            objects[id(layer)] = inside
+
+    used = [np.unique(g & GID_MASK) for g in grids.values()]
+    used += [np.array([int(o['gid']) & GID_MASK for o in objs if o.get('gid')], dtype=np.uint32)
+             for objs in objects.values()]
+    used = np.unique(np.concatenate(used)) if used else np.zeros(0, dtype=np.uint32)
+    tilesets, first, new_first = renumber(map_data.get('tilesets', []), used)
+
+    lost = 0
+    for layer in walk(layers):
+        if id(layer) in grids:
+            gids, n = remap(grids[id(layer)], first, new_first)
+            lost += n
+            for key in ('chunks', 'startx', 'starty'):
+                layer.pop(key, None)
+            layer.update(width=w, height=h, x=0, y=0)
+            set_layer_array(layer, gids)
+        elif id(layer) in objects:
+            for obj in objects[id(layer)]:
+                if obj.get('gid'):
+                    gid, n = remap(np.array([int(obj['gid'])], dtype=np.uint32), first, new_first)
+                    lost += n
+                    obj['gid'] = int(gid[0])
+            layer['objects'] = objects[id(layer)]
+
+    src_dir, out_dir = map_path.parent.resolve(), out_path.parent.resolve()
+    for ts in tilesets:
+        for key in ('image', 'source'):
+            if key in ts:
+                ts[key] = rebase_path(ts[key], src_dir, out_dir)
+
+    out = {k: v for k, v in map_data.items() if k not in ('layers', 'tilesets')}
+    out.update(width=w, height=h, infinite=False, layers=layers, tilesets=tilesets)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    save_map(out, out_path)
+
+    print(f"Region {w}x{h} at ({x}, {y}); layers: {sum(1 for _ in walk(layers))}, "
+          f"tilesets: {len(map_data.get('tilesets', []))} -> {len(tilesets)}")
+    for ts in tilesets:
+        print(f"  {ts.get('name')}: firstgid {ts['firstgid']}")
+    if lost:
+        print(f"WARNING: {lost} GID(s) belong to no tileset and were cleared")
+    print(f"Saved {out_path} ({out_path.stat().st_size / 1024:.1f} KB)")
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("map", help="Converted map JSON")
+    ap.add_argument("out", help="Where to write the subset map")
+    ap.add_argument("--region", type=int, nargs=4, metavar=("X", "Y", "W", "H"), default=None,
+                    help="Tile rectangle to keep (default: the whole map)")
+    ap.add_argument("--layers", nargs="+", default=None, help="Layer/group names to keep (default: all)")
+    args = ap.parse_args()
+    return extract(Path(args.map), Path(args.out), tuple(args.region) if args.region else None, args.layers)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
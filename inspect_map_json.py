@@ -1,18 +1,178 @@
+#!/usr/bin/env python3
+"""
+inspect_map_json.py
+
+Statistics for a converted (Tiled JSON) map, to size and budget it before
+shipping:
+
+- tilesets: name, source, image, tile counts, estimated texture memory
+  (RGBA8), and how many cells / distinct tiles of each the map uses
+- tile layers: fill ratio, flipped cells, distinct GIDs, most used GIDs,
+  and the bounds of the non-empty area (empty border rows/columns)
+- object layers: object counts
+
+Loaded with map_stream.load_map, so tile data goes straight into NumPy arrays
+instead of Python lists.
+
+Usage:
+  python inspect_map_json.py
+  python inspect_map_json.py client/public/assets/maps/victorian/city_map_split.json --top 5
+  python inspect_map_json.py map.json --json > map_stats.json
+"""
+
+from __future__ import annotations
+import argparse
 import json
-import os
-
-path = 'client/public/assets/maps/victorian/city_map.json'
-
-try:
-    with open(path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-        
-    print(f"Total Tilesets: {len(data.get('tilesets', []))}")
-    for ts in data.get('tilesets', []):
-        print(f"Name: {ts.get('name')}")
-        print(f"Source: {ts.get('source', 'EMBEDDED')}")
-        print(f"Image: {ts.get('image', 'N/A')}")
+
+import numpy as np
+
+from map_layers import (
+    FLAG_MASK, GID_MASK, iter_layers, layer_array, tile_layers, tileset_first_gids, tileset_index,
+    tileset_tilecount,
+)
+from map_stream import load_map
+
+MAP_JSON = 'client/public/assets/maps/victorian/city_map.json'
+
+
+def layer_stats(grid: np.ndarray, top: int) -> dict:
+    h, w = grid.shape
+    bare = grid & GID_MASK
+    used = bare != 0
+    filled = int(used.sum())
+    gids, counts = np.unique(bare[used], return_counts=True)
+    order = np.argsort(-counts, kind='stable')[:top]
+
+    stats = {
+        'width': w,
+        'height': h,
+        'cells': w * h,
+        'filled': filled,
+        'fill_ratio': round(filled / (w * h), 4) if w * h else 0.0,
+        'flipped': int(((grid & FLAG_MASK) != 0).sum()),
+        'distinct_gids': int(len(gids)),
+        'top_gids': [[int(g), int(c)] for g, c in zip(gids[order], counts[order])],
+        'bounds': None,
+    }
+    rows = np.flatnonzero(used.any(axis=1))
+    cols = np.flatnonzero(used.any(axis=0))
+    if len(rows):
+        stats['bounds'] = {
+            'x': int(cols[0]), 'y': int(rows[0]),
+            'width': int(cols[-1] - cols[0] + 1), 'height': int(rows[-1] - rows[0] + 1),
+            'empty_rows': int(h - len(rows)), 'empty_cols': int(w - len(cols)),
+        }
+    return stats
+
+
+def inspect(map_data: dict, top: int = 10) -> dict:
+    tilesets = map_data.get('tilesets', [])
+    first = tileset_first_gids(tilesets)
+    cells_per_ts = np.zeros(len(tilesets), dtype=np.int64)
+    used_per_ts = [set() for _ in tilesets]
+
+    layers = []
+    for layer in tile_layers(map_data):
+        grid = layer_array(layer, map_data)
+        layers.append({'name': layer.get('name'), **layer_stats(grid, top)})
+        if not tilesets:
+            continue
+        gids, counts = np.unique(grid & GID_MASK, return_counts=True)
+        keep = gids != 0
+        gids, counts = gids[keep].astype(np.int64), counts[keep]
+        idx = tileset_index(gids, first)
+        valid = idx >= 0
+        np.add.at(cells_per_ts, idx[valid], counts[valid])
+        for i, g in zip(idx[valid].tolist(), gids[valid].tolist()):
+            used_per_ts[i].add(g)
+
+    ts_stats = []
+    for i, ts in enumerate(tilesets):
+        w, h = ts.get('imagewidth', 0), ts.get('imageheight', 0)
+        ts_stats.append({
+            'name': ts.get('name'),
+            'source': ts.get('source', 'EMBEDDED'),
+            'image': ts.get('image'),
+            'firstgid': ts.get('firstgid'),
+            'tilecount': tileset_tilecount(ts) if ts.get('tilewidth') else ts.get('tilecount'),
+            'cells': int(cells_per_ts[i]),
+            'distinct_tiles': len(used_per_ts[i]),
+            'texture_bytes': w * h * 4,
+        })
+
+    objects = [
+        {'name': l.get('name'), 'objects': len(l.get('objects', []) or [])}
+        for l in iter_layers(map_data.get('layers', [])) if l.get('type') == 'objectgroup'
+    ]
+    texture = sum(t['texture_bytes'] for t in ts_stats)
+    return {
+        'width': map_data.get('width'),
+        'height': map_data.get('height'),
+        'tilewidth': map_data.get('tilewidth'),
+        'tileheight': map_data.get('tileheight'),
+        'tilesets': ts_stats,
+        'tile_layers': layers,
+        'object_layers': objects,
+        'texture_bytes': texture,
+        'texture_bytes_used': sum(t['texture_bytes'] for t in ts_stats if t['cells']),
+    }
+
+
+def print_text(path: str, stats: dict) -> None:
+    mb = 1024 * 1024
+    print(f"{path}: {stats['width']}x{stats['height']} tiles of {stats['tilewidth']}x{stats['tileheight']}")
+
+    print(f"\nTotal Tilesets: {len(stats['tilesets'])}")
+    for ts in stats['tilesets']:
+        print(f"Name: {ts['name']}")
+        print(f"Source: {ts['source']}")
+        print(f"Image: {ts['image'] or 'N/A'}")
+        print(f"Tiles: {ts['tilecount']} (firstgid {ts['firstgid']}), used {ts['distinct_tiles']} distinct "
+              f"in {ts['cells']} cell(s)")
+        print(f"Texture: {ts['texture_bytes'] / mb:.1f} MB")
+        print("-" * 20)
+
+    print(f"\nTile Layers: {len(stats['tile_layers'])}")
+    for l in stats['tile_layers']:
+        print(f"Name: {l['name']}")
+        print(f"Fill: {l['filled']}/{l['cells']} ({l['fill_ratio']:.1%}), flipped {l['flipped']}, "
+              f"{l['distinct_gids']} distinct GID(s)")
+        b = l['bounds']
+        if b:
+            print(f"Bounds: x={b['x']} y={b['y']} {b['width']}x{b['height']} "
+                  f"({b['empty_rows']} empty row(s), {b['empty_cols']} empty column(s))")
+        else:
+            print("Bounds: empty layer")
+        if l['top_gids']:
+            print("Top GIDs: " + ", ".join(f"{g} x{c}" for g, c in l['top_gids']))
         print("-" * 20)
 
-except Exception as e:
-    print(f"Error: {e}")
+    for l in stats['object_layers']:
+        print(f"Object layer {l['name']}: {l['objects']} object(s)")
+
+    print(f"\nTexture memory (RGBA8): {stats['texture_bytes'] / mb:.1f} MB total, "
+          f"{stats['texture_bytes_used'] / mb:.1f} MB in tilesets the map uses")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("map", nargs="?", default=MAP_JSON, help="Map JSON to inspect")
+    ap.add_argument("--top", type=int, default=10, help="Most used GIDs listed per layer (default 10)")
+    ap.add_argument("--json", action="store_true", help="Print the statistics as JSON")
+    args = ap.parse_args()
+
+    try:
+        stats = inspect(load_map(args.map), args.top)
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        print_text(args.map, stats)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+map_chunks.py
+
+Chunked (Tiled "infinite map" style) tile layers plus a streaming chunk index.
+
+Writer side (used by tmx_to_json.py --chunk-size N):
+- split_chunks() cuts a flat layer into fixed N x N chunks, skipping empty ones
+- write_chunk_index() writes <map>.chunks.bin (raw little-endian uint32 GIDs,
+  chunk after chunk) and <map>.chunks.json (byte offset of every chunk)
+
+Reader side (for the pygame game or any Python tooling):
+- ChunkIndex loads only the index, then reads individual chunks on demand, so
+  memory tracks the area around the player instead of the whole map
+
+Usage:
+  python map_chunks.py client/public/assets/maps/victorian/city_map.chunks.json --at 64 64 --radius 1
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+from array import array
+from pathlib import Path
+
+
+def split_chunks(gids: array, width: int, height: int, size: int):
+    """Yields (x, y, chunk) for every non-empty size x size chunk; x/y are in tiles."""
+    for y0 in range(0, height, size):
+        for x0 in range(0, width, size):
+            x1 = min(x0 + size, width)
+            chunk = array('I')
+            for row in range(y0, min(y0 + size, height)):
+                start = row * width
+                chunk.extend(gids[start + x0:start + x1])
+                if x1 - x0 < size:
+                    # pad partial edge chunks so every chunk is size x size
+                    chunk.extend(array('I', bytes(4 * (size - (x1 - x0)))))
+            if not any(chunk):
+                continue
+            if len(chunk) < size * size:
+                chunk.extend(array('I', bytes(4 * (size * size - len(chunk)))))
+            yield x0, y0, chunk
+
+
+def index_paths(out_path: Path) -> tuple[Path, Path]:
+    out_path = Path(out_path)
+    return (out_path.with_name(f"{out_path.stem}.chunks.json"),
+            out_path.with_name(f"{out_path.stem}.chunks.bin"))
+
+
+def write_chunk_index(out_path: Path, map_info: dict, layers: list[tuple[dict, list]]) -> Path:
+    """
+    layers: (layer header, [(x, y, chunk), ...]) for every chunked tile layer.
+    Returns the path of the JSON index.
+    """
+    index_path, bin_path = index_paths(out_path)
+    index = {
+        'chunksize': map_info['chunksize'],
+        'width': map_info['width'],
+        'height': map_info['height'],
+        'tilewidth': map_info['tilewidth'],
+        'tileheight': map_info['tileheight'],
+        'data': bin_path.name,
+        'layers': [],
+    }
+    offset = 0
+    with open(bin_path, 'wb') as f:
+        for header, chunks in layers:
+            entries = []
+            for x, y, chunk in chunks:
+                if sys.byteorder == 'big':
+                    chunk = array('I', chunk)
+                    chunk.byteswap()
+                raw = chunk.tobytes()
+                f.write(raw)
+                entries.append({'x': x, 'y': y, 'offset': offset, 'length': len(raw)})
+                offset += len(raw)
+            index['layers'].append({'id': header.get('id'), 'name': header.get('name'), 'chunks': entries})
+    index_path.write_text(json.dumps(index, separators=(',', ':')), encoding='utf-8')
+    return index_path
+
+
+class ChunkIndex:
+    def __init__(self, index_path: Path | str):
+        self.path = Path(index_path)
+        self.index = json.loads(self.path.read_text(encoding='utf-8'))
+        self.size = self.index['chunksize']
+        self.data_path = self.path.parent / self.index['data']
+        self.layers = {}
+        for layer in self.index['layers']:
+            self.layers[layer['name']] = {(c['x'], c['y']): (c['offset'], c['length']) for c in layer['chunks']}
+
+    def chunk_origin(self, tile_x: int, tile_y: int) -> tuple[int, int]:
+        return (tile_x // self.size) * self.size, (tile_y // self.size) * self.size
+
+    def chunks_near(self, tile_x: int, tile_y: int, radius: int = 1) -> list[tuple[int, int]]:
+        """Chunk origins within `radius` chunks of the tile (missing = empty, not listed)."""
+        cx, cy = self.chunk_origin(tile_x, tile_y)
+        found = set()
+        for chunks in self.layers.values():
+            for dy in range(-radius, radius + 1):
+                for dx in range(-radius, radius + 1):
+                    key = (cx + dx * self.size, cy + dy * self.size)
+                    if key in chunks:
+                        found.add(key)
+        return sorted(found, key=lambda k: (k[1], k[0]))
+
+    def read_chunk(self, layer: str, x: int, y: int) -> array | None:
+        """GIDs of one chunk (row-major, size*size), or None if the chunk is empty."""
+        entry = self.layers[layer].get((x, y))
+        if entry is None:
+            return None
+        offset, length = entry
+        with open(self.data_path, 'rb') as f:
+            f.seek(offset)
+            raw = f.read(length)
+        gids = array('I')
+        gids.frombytes(raw)
+        if sys.byteorder == 'big':
+            gids.byteswap()
+        return gids
+
+    def read_near(self, tile_x: int, tile_y: int, radius: int = 1) -> dict:
+        """{layer name: {(x, y): gids}} for all non-empty chunks around the tile."""
+        near = self.chunks_near(tile_x, tile_y, radius)
+        out = {}
+        for name in self.layers:
+            loaded = {}
+            for x, y in near:
+                gids = self.read_chunk(name, x, y)
+                if gids is not None:
+                    loaded[(x, y)] = gids
+            out[name] = loaded
+        return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("index", help="<map>.chunks.json written by tmx_to_json.py --chunk-size")
+    ap.add_argument("--at", nargs=2, type=int, metavar=("TX", "TY"), default=None, help="Tile position to load around")
+    ap.add_argument("--radius", type=int, default=1, help="Chunks around --at to load (default 1)")
+    args = ap.parse_args()
+
+    idx = ChunkIndex(args.index)
+    total = sum(len(c) for c in idx.layers.values())
+    print(f"{args.index}: {idx.index['width']}x{idx.index['height']} tiles, "
+          f"chunk {idx.size}x{idx.size}, {total} stored chunk(s), "
+          f"{os.path.getsize(idx.data_path)} bytes of chunk data")
+    for name, chunks in idx.layers.items():
+        print(f"  {name}: {len(chunks)} chunk(s)")
+
+    if args.at:
+        loaded = idx.read_near(args.at[0], args.at[1], args.radius)
+        n = sum(len(c) for c in loaded.values())
+        print(f"Around tile {tuple(args.at)} (radius {args.radius}): {n} chunk(s) loaded")
+
+
+if __name__ == "__main__":
+    main()
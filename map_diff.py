@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+map_diff.py
+
+Structural diff of two converted (Tiled JSON) maps, e.g. city_map.json vs
+city_map_fixed.json:
+
+- map header fields and map properties
+- tilesets matched by name: added/removed, changed fields, changed per-tile
+  metadata (animations, properties)
+- tile layers matched by name: changed cell counts (placed / cleared /
+  replaced / flags only) and the changed regions as bounding boxes,
+  all computed on NumPy arrays
+- object layers: objects added/removed/changed, matched by id
+- layer fields and layer properties
+
+Both maps are loaded with map_stream.load_map, so tile data never becomes
+Python lists.
+
+Usage:
+  python map_diff.py client/public/assets/maps/victorian/city_map.json client/public/assets/maps/victorian/city_map_fixed.json
+  python map_diff.py a.json b.json --by-tile --json
+
+Notes:
+- Exit status is 0 when the maps match, 1 when they differ (like diff).
+- --by-tile compares cells by (tileset name, local tile id, flags) instead of
+  raw GIDs, so renumbered firstgids alone don't show up as changes.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from components import label
+from map_layers import (
+    FLAG_MASK, GID_MASK, iter_layers, layer_array, tiles_as_dict, tileset_first_gids, tileset_index,
+)
+from map_stream import load_map
+
+SKIP_LAYER_FIELDS = {'data', 'chunks', 'objects', 'layers', 'properties'}
+SKIP_MAP_FIELDS = {'layers', 'tilesets', 'properties'}
+SKIP_TILESET_FIELDS = {'tiles', 'properties'}
+
+
+def field_changes(a: dict, b: dict, skip: set) -> dict:
+    """{field: [old, new]} for top-level fields that differ (None = missing)."""
+    keys = [k for k in dict.fromkeys([*a, *b]) if k not in skip]
+    return {k: [a.get(k), b.get(k)] for k in keys if a.get(k) != b.get(k)}
+
+
+def property_changes(a: dict, b: dict) -> dict:
+    pa = {p['name']: p.get('value') for p in a.get('properties', []) or []}
+    pb = {p['name']: p.get('value') for p in b.get('properties', []) or []}
+    return {k: [pa.get(k), pb.get(k)] for k in dict.fromkeys([*pa, *pb]) if pa.get(k) != pb.get(k)}
+
+
+def by_name(items: list[dict]) -> dict:
+    """name -> item; repeated names get a #n suffix so nothing is dropped."""
+    out = {}
+    for item in items:
+        name = item.get('name') or ''
+        key, n = name, 1
+        while key in out:
+            n += 1
+            key = f"{name}#{n}"
+        out[key] = item
+    return out
+
+
+def diff_tilesets(a: list[dict], b: list[dict]) -> dict:
+    ta, tb = by_name(a), by_name(b)
+    changed = {}
+    for name in ta.keys() & tb.keys():
+        entry = {}
+        fields = field_changes(ta[name], tb[name], SKIP_TILESET_FIELDS)
+        if fields:
+            entry['fields'] = fields
+        props = property_changes(ta[name], tb[name])
+        if props:
+            entry['properties'] = props
+        tiles_a, tiles_b = tiles_as_dict(ta[name]), tiles_as_dict(tb[name])
+        tiles = {
+            'added': sorted(tiles_b.keys() - tiles_a.keys()),
+            'removed': sorted(tiles_a.keys() - tiles_b.keys()),
+            'changed': sorted(t for t in tiles_a.keys() & tiles_b.keys() if tiles_a[t] != tiles_b[t]),
+        }
+        if any(tiles.values()):
+            entry['tiles'] = tiles
+        if entry:
+            changed[name] = entry
+    return {
+        'added': [n for n in tb if n not in ta],
+        'removed': [n for n in ta if n not in tb],
+        'changed': {n: changed[n] for n in ta if n in changed},
+    }
+
+
+def tile_keys(grid: np.ndarray, tilesets: list[dict], names: dict) -> np.ndarray:
+    """int64 key per cell identifying (tileset name, local id, flags); 0 stays 0."""
+    bare = (grid & GID_MASK).astype(np.int64)
+    flags = (grid & FLAG_MASK).astype(np.int64) >> 28
+    if not tilesets:
+        return bare
+    first = tileset_first_gids(tilesets)
+    idx = tileset_index(bare, first)
+    name_ids = np.array([names[n] for n in by_name(tilesets)], dtype=np.int64)
+    local = bare - first[np.maximum(idx, 0)]
+    keys = ((name_ids[np.maximum(idx, 0)] + 1) << 36) | (flags << 32) | local
+    # GIDs below every firstgid can't be resolved; keep them as raw values
+    keys = np.where(idx < 0, bare | (flags << 32), keys)
+    return np.where(bare == 0, 0, keys)
+
+
+def changed_regions(mask: np.ndarray, block: int = 8) -> list[dict]:
+    """
+    Bounding boxes of groups of changed cells, largest first.
+    Changes are grouped by touching block x block cells, so scattered edits
+    within a few tiles of each other come out as one region.
+    """
+    h, w = mask.shape
+    padded = np.pad(mask, ((0, -h % block), (0, -w % block)))
+    bh, bw = padded.shape[0] // block, padded.shape[1] // block
+    blocks = padded.reshape(bh, block, bw, block).any(axis=(1, 3))
+
+    # label the block grid (8-connected), then reduce per block before per group
+    labels, n = label(blocks, connectivity=8)
+    if n == 0:
+        return []
+
+    # exact cell bounds of every changed block: first/last changed row and column inside it
+    cells = padded.reshape(bh, block, bw, block)
+    rows_any = cells.any(axis=3)                    # (bh, block, bw)
+    cols_any = cells.any(axis=1)                    # (bh, bw, block)
+    by, bx = np.nonzero(blocks)
+    lab = labels[by, bx]
+    r = rows_any[by, :, bx]                         # (k, block)
+    c = cols_any[by, bx, :]
+    y_lo = by * block + r.argmax(axis=1)
+    y_hi = by * block + block - 1 - r[:, ::-1].argmax(axis=1)
+    x_lo = bx * block + c.argmax(axis=1)
+    x_hi = bx * block + block - 1 - c[:, ::-1].argmax(axis=1)
+    count = np.bincount(lab, weights=cells.sum(axis=(1, 3))[by, bx], minlength=n + 1)
+    x_min = np.full(n + 1, w, dtype=np.int64)
+    y_min = np.full(n + 1, h, dtype=np.int64)
+    x_max = np.full(n + 1, -1, dtype=np.int64)
+    y_max = np.full(n + 1, -1, dtype=np.int64)
+    np.minimum.at(x_min, lab, x_lo)
+    np.minimum.at(y_min, lab, y_lo)
+    np.maximum.at(x_max, lab, x_hi)
+    np.maximum.at(y_max, lab, y_hi)
+    regions = [
+        {'x': int(x_min[i]), 'y': int(y_min[i]), 'width': int(x_max[i] - x_min[i] + 1),
+         'height': int(y_max[i] - y_min[i] + 1), 'cells': int(count[i])}
+        for i in range(1, n + 1)
+    ]
+    return sorted(regions, key=lambda r: -r['cells'])
+
+
+def diff_tile_layer(la: dict, lb: dict, map_a: dict, map_b: dict, keys=None) -> dict:
+    ga, gb = layer_array(la, map_a), layer_array(lb, map_b)
+    if ga.shape != gb.shape:
+        return {'shape': [list(ga.shape), list(gb.shape)]}
+    ka, kb = (ga, gb) if keys is None else (keys(ga, map_a), keys(gb, map_b))
+    mask = ka != kb
+    if not mask.any():
+        return {}
+    bare_a, bare_b = ga & GID_MASK, gb & GID_MASK
+    same_tile = (bare_a == bare_b) if keys is None else ((ka & ~(0xF << 32)) == (kb & ~(0xF << 32)))
+    return {
+        'cells': int(mask.sum()),
+        'placed': int((mask & (bare_a == 0)).sum()),
+        'cleared': int((mask & (bare_b == 0)).sum()),
+        'replaced': int((mask & (bare_a != 0) & (bare_b != 0) & ~same_tile).sum()),
+        'flags_only': int((mask & (bare_a != 0) & same_tile).sum()),
+        'regions': changed_regions(mask),
+    }
+
+
+def diff_objects(la: dict, lb: dict) -> dict:
+    oa = {o.get('id'): o for o in la.get('objects', []) or []}
+    ob = {o.get('id'): o for o in lb.get('objects', []) or []}
+    changed = {}
+    for oid in oa.keys() & ob.keys():
+        fields = field_changes(oa[oid], ob[oid], {'properties'})
+        props = property_changes(oa[oid], ob[oid])
+        if fields or props:
+            changed[oid] = {'name': ob[oid].get('name'), 'fields': fields, 'properties': props}
+    out = {
+        'added': [{'id': k, 'name': ob[k].get('name')} for k in ob if k not in oa],
+        'removed': [{'id': k, 'name': oa[k].get('name')} for k in oa if k not in ob],
+        'changed': [{'id': k, **changed[k]} for k in oa if k in changed],
+    }
+    return out if any(out.values()) else {}
+
+
+def diff_maps(map_a: dict, map_b: dict, by_tile: bool = False) -> dict:
+    keys = None
+    if by_tile:
+        names = {n: i for i, n in enumerate(dict.fromkeys([*by_name(map_a.get('tilesets', [])),
+                                                           *by_name(map_b.get('tilesets', []))]))}
+        keys = lambda grid, m: tile_keys(grid, m.get('tilesets', []), names)
+
+    la = by_name(list(iter_layers(map_a.get('layers', []))))
+    lb = by_name(list(iter_layers(map_b.get('layers', []))))
+    layers = {}
+    for name in la:
+        if name not in lb:
+            continue
+        a, b = la[name], lb[name]
+        entry = {}
+        fields = field_changes(a, b, SKIP_LAYER_FIELDS)
+        if fields:
+            entry['fields'] = fields
+        props = property_changes(a, b)
+        if props:
+            entry['properties'] = props
+        if a.get('type') == 'tilelayer' and b.get('type') == 'tilelayer':
+            tiles = diff_tile_layer(a, b, map_a, map_b, keys)
+            if tiles:
+                entry['tiles'] = tiles
+        if a.get('type') == 'objectgroup' and b.get('type') == 'objectgroup':
+            objects = diff_objects(a, b)
+            if objects:
+                entry['objects'] = objects
+        if entry:
+            layers[name] = entry
+
+    return {
+        'map': field_changes(map_a, map_b, SKIP_MAP_FIELDS),
+        'properties': property_changes(map_a, map_b),
+        'tilesets': diff_tilesets(map_a.get('tilesets', []), map_b.get('tilesets', [])),
+        'layers': {
+            'added': [n for n in lb if n not in la],
+            'removed': [n for n in la if n not in lb],
+            'changed': layers,
+        },
+    }
+
+
+def has_changes(diff) -> bool:
+    if isinstance(diff, dict):
+        return any(has_changes(v) for v in diff.values())
+    if isinstance(diff, list):
+        return bool(diff)
+    return bool(diff)
+
+
+def print_text(diff: dict, max_regions: int, out=sys.stdout) -> None:
+    def changes(label: str, items: dict, indent: str = "  ") -> None:
+        for k, (old, new) in items.items():
+            print(f"{indent}{label}{k}: {old!r} -> {new!r}", file=out)
+
+    if diff['map'] or diff['properties']:
+        print("Map:", file=out)
+        changes("", diff['map'])
+        changes("property ", diff['properties'])
+
+    ts = diff['tilesets']
+    if has_changes(ts):
+        print("Tilesets:", file=out)
+        for n in ts['added']:
+            print(f"  + {n}", file=out)
+        for n in ts['removed']:
+            print(f"  - {n}", file=out)
+        for n, entry in ts['changed'].items():
+            print(f"  ~ {n}", file=out)
+            changes("", entry.get('fields', {}), "      ")
+            changes("property ", entry.get('properties', {}), "      ")
+            tiles = entry.get('tiles')
+            if tiles:
+                print(f"      tile metadata: {len(tiles['added'])} added, {len(tiles['removed'])} removed, "
+                      f"{len(tiles['changed'])} changed", file=out)
+
+    layers = diff['layers']
+    if has_changes(layers):
+        print("Layers:", file=out)
+        for n in layers['added']:
+            print(f"  + {n}", file=out)
+        for n in layers['removed']:
+            print(f"  - {n}", file=out)
+        for n, entry in layers['changed'].items():
+            print(f"  ~ {n}", file=out)
+            changes("", entry.get('fields', {}), "      ")
+            changes("property ", entry.get('properties', {}), "      ")
+            tiles = entry.get('tiles')
+            if tiles and 'shape' in tiles:
+                print(f"      size {tiles['shape'][0]} -> {tiles['shape'][1]}", file=out)
+            elif tiles:
+                print(f"      {tiles['cells']} cell(s): {tiles['placed']} placed, {tiles['cleared']} cleared, "
+                      f"{tiles['replaced']} replaced, {tiles['flags_only']} flags only", file=out)
+                for r in tiles['regions'][:max_regions]:
+                    print(f"        region x={r['x']} y={r['y']} {r['width']}x{r['height']} "
+                          f"({r['cells']} cell(s))", file=out)
+                if len(tiles['regions']) > max_regions:
+                    print(f"        ... +{len(tiles['regions']) - max_regions} more region(s)", file=out)
+            objects = entry.get('objects')
+            if objects:
+                for o in objects['added']:
+                    print(f"      + object {o['id']} {o['name'] or ''}", file=out)
+                for o in objects['removed']:
+                    print(f"      - object {o['id']} {o['name'] or ''}", file=out)
+                for o in objects['changed']:
+                    fields = ", ".join([*o['fields'], *(f"property {p}" for p in o['properties'])])
+                    print(f"      ~ object {o['id']} {o['name'] or ''}: {fields}", file=out)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("a", help="Old map JSON")
+    ap.add_argument("b", help="New map JSON")
+    ap.add_argument("--by-tile", action="store_true",
+                    help="Compare cells by (tileset name, local id) instead of raw GIDs")
+    ap.add_argument("--json", action="store_true", help="Print the diff as JSON")
+    ap.add_argument("--max-regions", type=int, default=10, help="Regions listed per layer in text output")
+    args = ap.parse_args()
+
+    diff = diff_maps(load_map(args.a), load_map(args.b), args.by_tile)
+    if args.json:
+        print(json.dumps(diff, indent=2))
+    elif has_changes(diff):
+        print(f"--- {args.a}\n+++ {args.b}")
+        print_text(diff, args.max_regions)
+    else:
+        print("Maps are identical.")
+    return 1 if has_changes(diff) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
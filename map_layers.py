@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+map_layers.py
+
+NumPy helpers shared by the map tools that work on converted (Tiled JSON) maps:
+split_tileset.py, repack_tilesets.py and friends.
+
+- layer_array() / set_layer_array() read and write tile layer data as a
+  (height, width) uint32 array, whatever the layer's storage: plain int
+  list, base64 (optionally zlib/gzip) or chunks
+- GID flag constants and tileset lookup by GID via np.searchsorted
+- tileset geometry: grid size and the source rectangle of a tile id
+- tileset images as RGBA arrays, and tiles gathered out of them as a stack,
+  flip flags applied (for renderers: bake_layers.py, minimap.py)
+"""
+
+from __future__ import annotations
+import base64
+import gzip
+import json
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+# Tiled stores flip/rotation flags in the top bits of every GID
+FLIPPED_HORIZONTALLY = 0x80000000
+FLIPPED_VERTICALLY = 0x40000000
+FLIPPED_DIAGONALLY = 0x20000000
+ROTATED_HEXAGONAL_120 = 0x10000000
+FLAG_MASK = 0xF0000000
+GID_MASK = 0x0FFFFFFF
+
+
+def load_map(path: Path | str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_map(map_data: dict, path: Path | str) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(map_data, f, separators=(',', ':'), default=_json_default)
+
+
+def _json_default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.integer):
+        return int(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def iter_layers(layers: list[dict]):
+    """All layers depth-first, descending into group layers."""
+    for layer in layers:
+        yield layer
+        if layer.get('type') == 'group':
+            yield from iter_layers(layer.get('layers', []))
+
+
+def tile_layers(map_data: dict) -> list[dict]:
+    return [l for l in iter_layers(map_data.get('layers', [])) if l.get('type') == 'tilelayer']
+
+
+def decode_data(data, encoding: str | None = None, compression: str | None = None) -> np.ndarray:
+    """Flat uint32 GIDs from a JSON layer/chunk 'data' value."""
+    if isinstance(data, np.ndarray):
+        return data.astype(np.uint32, copy=False).ravel()
+    if isinstance(data, str) or encoding == 'base64':
+        raw = base64.b64decode(data)
+        if compression == 'zlib':
+            raw = zlib.decompress(raw)
+        elif compression == 'gzip':
+            raw = gzip.decompress(raw)
+        elif compression:
+            raise ValueError(f"Unsupported layer compression '{compression}'")
+        return np.frombuffer(raw, dtype='<u4').astype(np.uint32, copy=False)
+    return np.asarray(data, dtype=np.uint32)
+
+
+def encode_data(flat: np.ndarray, like) -> object:
+    """Flat GIDs in the same storage form as `like` (the layer/chunk dict being replaced)."""
+    if like.get('encoding') == 'base64':
+        raw = np.ascontiguousarray(flat, dtype='<u4').tobytes()
+        compression = like.get('compression')
+        if compression == 'zlib':
+            raw = zlib.compress(raw, 9)
+        elif compression == 'gzip':
+            raw = gzip.compress(raw, 9, mtime=0)
+        return base64.b64encode(raw).decode('ascii')
+    return flat.astype(np.uint32, copy=False).tolist()
+
+
+def layer_shape(layer: dict, map_data: dict) -> tuple[int, int]:
+    return int(layer.get('height', map_data['height'])), int(layer.get('width', map_data['width']))
+
+
+def layer_array(layer: dict, map_data: dict) -> np.ndarray:
+    """(height, width) uint32 GIDs of a tile layer, flags included."""
+    h, w = layer_shape(layer, map_data)
+    enc, comp = layer.get('encoding'), layer.get('compression')
+    if 'chunks' in layer:
+        x0, y0 = layer.get('startx', 0), layer.get('starty', 0)
+        grid = np.zeros((h, w), dtype=np.uint32)
+        for chunk in layer['chunks']:
+            cw, ch = chunk['width'], chunk['height']
+            data = decode_data(chunk['data'], enc, comp).reshape(ch, cw)
+            cx, cy = chunk['x'] - x0, chunk['y'] - y0
+            # chunks may be padded past the layer edge
+            vis_h, vis_w = min(ch, h - cy), min(cw, w - cx)
+            if vis_h > 0 and vis_w > 0:
+                grid[cy:cy + vis_h, cx:cx + vis_w] = data[:vis_h, :vis_w]
+        return grid
+    return decode_data(layer.get('data', []), enc, comp).reshape(h, w)
+
+
+def set_layer_array(layer: dict, grid: np.ndarray) -> None:
+    """Writes grid back into the layer, keeping its storage form (list/base64/chunks)."""
+    grid = np.asarray(grid, dtype=np.uint32)
+    if 'chunks' in layer:
+        x0, y0 = layer.get('startx', 0), layer.get('starty', 0)
+        h, w = grid.shape
+        for chunk in layer['chunks']:
+            cw, ch = chunk['width'], chunk['height']
+            block = np.zeros((ch, cw), dtype=np.uint32)
+            cx, cy = chunk['x'] - x0, chunk['y'] - y0
+            vis_h, vis_w = min(ch, h - cy), min(cw, w - cx)
+            if vis_h > 0 and vis_w > 0:
+                block[:vis_h, :vis_w] = grid[cy:cy + vis_h, cx:cx + vis_w]
+            chunk['data'] = encode_data(block.ravel(), layer)
+        return
+    layer['data'] = encode_data(grid.ravel(), layer)
+
+
+# ---- tilesets ----
+
+def tileset_first_gids(tilesets: list[dict]) -> np.ndarray:
+    return np.array([ts['firstgid'] for ts in tilesets], dtype=np.int64)
+
+
+def tileset_index(gids: np.ndarray, first_gids: np.ndarray) -> np.ndarray:
+    """Index of the owning tileset for every (flag-free, non-zero) GID; -1 below the first."""
+    return np.searchsorted(first_gids, gids, side='right') - 1
+
+
+def tileset_grid(ts: dict) -> tuple[int, int]:
+    """(columns, rows) that actually fit in the tileset image."""
+    tw, th = ts['tilewidth'], ts['tileheight']
+    margin, spacing = ts.get('margin', 0), ts.get('spacing', 0)
+    iw, ih = ts.get('imagewidth', 0), ts.get('imageheight', 0)
+    cols = max(0, (iw - 2 * margin + spacing) // (tw + spacing))
+    rows = max(0, (ih - 2 * margin + spacing) // (th + spacing))
+    return cols, rows
+
+
+def tile_origin(ts: dict, local_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Pixel (x, y) of each tile id's top-left corner inside the tileset image."""
+    cols = ts.get('columns') or tileset_grid(ts)[0]
+    tw, th = ts['tilewidth'], ts['tileheight']
+    margin, spacing = ts.get('margin', 0), ts.get('spacing', 0)
+    local_ids = np.asarray(local_ids, dtype=np.int64)
+    x = margin + (local_ids % cols) * (tw + spacing)
+    y = margin + (local_ids // cols) * (th + spacing)
+    return x, y
+
+
+def tiles_as_dict(ts: dict) -> dict[int, dict]:
+    """Per-tile metadata keyed by int id; accepts Tiled's list form and tmx_to_json's dict form."""
+    tiles = ts.get('tiles') or {}
+    if isinstance(tiles, dict):
+        return {int(k): v for k, v in tiles.items()}
+    return {int(t['id']): t for t in tiles}
+
+
+def tiles_like(ts: dict, tiles: dict[int, dict]):
+    """Inverse of tiles_as_dict, in the same form the tileset used."""
+    if isinstance(ts.get('tiles'), list):
+        return [tiles[k] for k in sorted(tiles)]
+    return {str(k): tiles[k] for k in sorted(tiles)}
+
+
+def tileset_tilecount(ts: dict) -> int:
+    if ts.get('tilecount'):
+        return int(ts['tilecount'])
+    cols, rows = tileset_grid(ts)
+    return cols * rows
+
+
+def load_tileset_image(ts: dict, base_dir: Path | str) -> np.ndarray:
+    """RGBA uint8 pixels of a tileset image, with its transparentcolor keyed out."""
+    from PIL import Image
+
+    with Image.open(Path(base_dir) / ts['image']) as img:
+        pixels = np.array(img.convert('RGBA'))
+    trans = ts.get('transparentcolor')
+    if trans:
+        rgb = np.array([int(trans.lstrip('#')[i:i + 2], 16) for i in (0, 2, 4)], dtype=np.uint8)
+        pixels[np.all(pixels[..., :3] == rgb, axis=-1)] = 0
+    return pixels
+
+
+def tile_pixels(image: np.ndarray, ts: dict, local_ids: np.ndarray) -> np.ndarray:
+    """(n, tileheight, tilewidth, 4) stack of tiles cut out of a tileset image in one gather."""
+    tw, th = ts['tilewidth'], ts['tileheight']
+    local_ids = np.asarray(local_ids, dtype=np.int64)
+    x, y = tile_origin(ts, local_ids)
+    # tiles hanging off the image edge come out transparent instead of wrapping
+    inside = (x + tw <= image.shape[1]) & (y + th <= image.shape[0])
+    x, y = np.where(inside, x, 0), np.where(inside, y, 0)
+    rows = y[:, None] + np.arange(th)
+    cols = x[:, None] + np.arange(tw)
+    tiles = image[rows[:, :, None], cols[:, None, :]]
+    tiles[~inside] = 0
+    return tiles
+
+
+def flip_tiles(tiles: np.ndarray, flags: np.ndarray) -> np.ndarray:
+    """Applies Tiled flip flags to a (n, th, tw, 4) stack: diagonal first, then horizontal, then vertical."""
+    flags = np.asarray(flags, dtype=np.uint32)
+    diagonal = (flags & FLIPPED_DIAGONALLY) != 0
+    horizontal = (flags & FLIPPED_HORIZONTALLY) != 0
+    vertical = (flags & FLIPPED_VERTICALLY) != 0
+    if not (diagonal.any() or horizontal.any() or vertical.any()):
+        return tiles
+    tiles = tiles.copy()
+    # a diagonal flip only makes sense on square tiles
+    if diagonal.any() and tiles.shape[1] == tiles.shape[2]:
+        tiles[diagonal] = tiles[diagonal].transpose(0, 2, 1, 3)
+    tiles[horizontal] = tiles[horizontal][:, :, ::-1]
+    tiles[vertical] = tiles[vertical][:, ::-1]
+    return tiles
+
+
+def gather_tiles(gids: np.ndarray, tilesets: list[dict], images: list, tile_size: tuple[int, int]) -> np.ndarray:
+    """
+    (n, th, tw, 4) pixels of every GID (flags applied). images[i] is tileset i's
+    RGBA array or None; GID 0, unknown GIDs and missing images come out transparent.
+    All tilesets are expected to use tile_size (tw, th) tiles.
+    """
+    tw, th = tile_size
+    gids = np.asarray(gids, dtype=np.uint32)
+    out = np.zeros((len(gids), th, tw, 4), dtype=np.uint8)
+    bare = (gids & GID_MASK).astype(np.int64)
+    idx = tileset_index(bare, tileset_first_gids(tilesets))
+    for i in np.unique(idx[(bare != 0) & (idx >= 0)]).tolist():
+        if images[i] is None:
+            continue
+        sel = np.flatnonzero((idx == i) & (bare != 0))
+        local = bare[sel] - tilesets[i]['firstgid']
+        valid = local < tileset_tilecount(tilesets[i])
+        sel, local = sel[valid], local[valid]
+        out[sel] = flip_tiles(tile_pixels(images[i], tilesets[i], local), gids[sel])
+    return out
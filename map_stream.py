@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+map_stream.py
+
+Fast loader for big converted (Tiled JSON) maps.
+
+json.load turns every tile layer into a Python list of ints, which is most of
+the load time and memory of a large map. load_map() instead:
+
+- memory-maps the file and finds every plain integer "data": [...] array
+  (tile layers and chunks) with one regex scan
+- parses each of those arrays straight into a uint32 NumPy array
+  (np.fromstring, no intermediate Python ints)
+- json-parses only the remaining skeleton (headers, tilesets, objects)
+
+The result is the same dict json.load would give, except tile data is an
+np.ndarray, which map_layers.layer_array() accepts as is.
+Base64 layers are plain strings and are left to map_layers.decode_data().
+
+Usage:
+  python map_stream.py client/public/assets/maps/victorian/city_map.json
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import mmap
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+
+# a "data" key holding nothing but unsigned ints; anything else is left to json
+DATA_ARRAY_RE = re.compile(rb'(?<!\\)"data"\s*:\s*\[([0-9,\s]*)\]')
+PLACEHOLDER = '\u0000array:'
+
+
+def parse_int_array(raw: bytes) -> np.ndarray:
+    if not raw.strip():
+        return np.zeros(0, dtype=np.uint32)
+    return np.fromstring(raw, dtype=np.uint32, sep=',')
+
+
+def load_map(path: Path | str) -> dict:
+    with open(path, 'rb') as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # mmap can't map an empty file; let json report it
+            buf = f.read()
+
+    arrays = []
+    skeleton = []
+    pos = 0
+    for m in DATA_ARRAY_RE.finditer(buf):
+        skeleton.append(buf[pos:m.start()])
+        skeleton.append(b'"data":"\\u0000array:%d"' % len(arrays))
+        arrays.append(parse_int_array(m.group(1)))
+        pos = m.end()
+    skeleton.append(buf[pos:])
+    if isinstance(buf, mmap.mmap):
+        buf.close()
+
+    def restore(obj: dict) -> dict:
+        data = obj.get('data')
+        if isinstance(data, str) and data.startswith(PLACEHOLDER):
+            obj['data'] = arrays[int(data[len(PLACEHOLDER):])]
+        return obj
+
+    return json.loads(b''.join(skeleton).decode('utf-8'), object_hook=restore)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("map", help="Map JSON to load")
+    args = ap.parse_args()
+
+    start = time.perf_counter()
+    map_data = load_map(args.map)
+    elapsed = time.perf_counter() - start
+
+    n_arrays = n_gids = 0
+    stack = [map_data]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, dict):
+            if isinstance(obj.get('data'), np.ndarray):
+                n_arrays += 1
+                n_gids += obj['data'].size
+            stack.extend(obj.values())
+        elif isinstance(obj, list):
+            stack.extend(obj)
+    print(f"{args.map}: {n_arrays} tile array(s), {n_gids} GIDs, loaded in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+minimap.py
+
+Pre-renders the minimap of a converted map as a mip pyramid of PNGs, so the
+client shows one texture instead of building the minimap at runtime:
+
+- every tileset's per-tile average colour (alpha-weighted) is computed once
+  with NumPy and cached by image content + tile geometry
+- visible tile layers are turned into uint8 colour rasters by GID lookup and
+  alpha-composited bottom to top as they are produced, so only one layer
+  raster is in memory at a time
+- level 0 has --pixels-per-tile pixels per tile; every further level halves
+  the size (2x2 premultiplied box filter, in row bands) down to --min-size
+- <map>.minimap.json records the levels and a hash per layer; a rerun only
+  recomputes layers whose hash changed (rasters are cached by hash) and does
+  nothing at all when no layer or tileset changed
+
+Usage:
+  python minimap.py
+  python minimap.py client/public/assets/maps/victorian/city_map_split.json --pixels-per-tile 2 --cache-dir .map_cache
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from build_cache import digest, file_digest
+from map_layers import GID_MASK, layer_array, load_tileset_image, tile_layers, tile_pixels, tileset_tilecount
+from map_stream import load_map
+
+MAP_JSON = 'client/public/assets/maps/victorian/city_map_split.json'
+GEOMETRY_KEYS = ('tilewidth', 'tileheight', 'margin', 'spacing', 'columns', 'tilecount', 'transparentcolor')
+# rows per float working band when compositing / downsampling
+BAND_ROWS = 256
+
+
+def metadata_path(map_path: Path) -> Path:
+    map_path = Path(map_path)
+    return map_path.with_name(f"{map_path.stem}.minimap.json")
+
+
+def load_cached(path: Path) -> np.ndarray | None:
+    try:
+        return np.load(path)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached(path: Path, array: np.ndarray) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+def tileset_key(ts: dict, base_dir: Path) -> str | None:
+    """Content key of a tileset's colours, or None if its image is missing."""
+    image = base_dir / ts['image'] if ts.get('image') else None
+    if image is None or not image.exists():
+        return None
+    geometry = json.dumps({k: ts.get(k) for k in GEOMETRY_KEYS}, sort_keys=True).encode()
+    return digest(file_digest(image).encode(), geometry)
+
+
+def tile_colors(ts: dict, base_dir: Path) -> np.ndarray:
+    """(tilecount, 4) float32 average colour per tile: alpha-weighted RGB, mean alpha, 0..1."""
+    image = load_tileset_image(ts, base_dir)
+    count = tileset_tilecount(ts)
+    colors = np.zeros((count, 4), dtype=np.float32)
+    # in slices, so huge tilesets never need a full (count, th, tw, 4) float copy
+    for start in range(0, count, 1024):
+        ids = np.arange(start, min(start + 1024, count))
+        tiles = tile_pixels(image, ts, ids).reshape(len(ids), -1, 4).astype(np.float32) / 255
+        alpha = tiles[..., 3]
+        weight = alpha.sum(axis=1)
+        rgb = (tiles[..., :3] * alpha[..., None]).sum(axis=1) / np.maximum(weight, 1e-6)[:, None]
+        colors[ids, :3] = rgb
+        colors[ids, 3] = alpha.mean(axis=1)
+    return colors
+
+
+def gid_palette(tilesets: list[dict], base_dir: Path, cache_dir: Path | None) -> tuple[np.ndarray, list]:
+    """(max GID + 1, 4) colour per bare GID, and the per-tileset keys it was built from."""
+    top = max((ts['firstgid'] + tileset_tilecount(ts) for ts in tilesets), default=1)
+    palette = np.zeros((top, 4), dtype=np.float32)
+    keys = []
+    for ts in tilesets:
+        key = tileset_key(ts, base_dir)
+        keys.append(key)
+        if key is None:
+            print(f"  Tileset image not found for {ts.get('name')}, drawn transparent")
+            continue
+        cached = cache_dir / 'tile_colors' / f"{key}.npy" if cache_dir else None
+        colors = load_cached(cached) if cached else None
+        if colors is None:
+            colors = tile_colors(ts, base_dir)
+            if cached:
+                save_cached(cached, colors)
+        palette[ts['firstgid']:ts['firstgid'] + len(colors)] = colors
+    return palette, keys
+
+
+def layer_hash(layer: dict, grid: np.ndarray, palette_keys: list) -> str:
+    header = json.dumps({'opacity': layer.get('opacity', 1), 'visible': layer.get('visible', True),
+                         'tilesets': palette_keys}, sort_keys=True).encode()
+    return digest(np.ascontiguousarray(grid, dtype='<u4').tobytes(), header)
+
+
+def to_uint8(raster: np.ndarray) -> np.ndarray:
+    return (np.clip(raster, 0, 1) * 255 + 0.5).astype(np.uint8)
+
+
+def layer_raster(grid: np.ndarray, palette: np.ndarray, opacity: float) -> np.ndarray:
+    """(h, w, 4) uint8 colour of every cell of a layer."""
+    bare = (grid & GID_MASK).astype(np.int64)
+    bare[bare >= len(palette)] = 0
+    colors = palette.copy()
+    colors[:, 3] *= opacity
+    # look up in a uint8 palette so the raster is never float
+    return to_uint8(colors)[bare]
+
+
+def composite_into(out: np.ndarray, src: np.ndarray) -> None:
+    """Straight-alpha 'over' of a uint8 raster onto the float accumulator out, band by band."""
+    for y in range(0, out.shape[0], BAND_ROWS):
+        dst = out[y:y + BAND_ROWS]
+        s = src[y:y + BAND_ROWS].astype(np.float32) / 255
+        sa = s[..., 3:4]
+        da = dst[..., 3:4] * (1 - sa)
+        alpha = sa + da
+        dst[..., :3] = (s[..., :3] * sa + dst[..., :3] * da) / np.maximum(alpha, 1e-6)
+        dst[..., 3:4] = alpha
+
+
+def downsample(image: np.ndarray) -> np.ndarray:
+    """Half size (uint8 in and out) with a 2x2 box filter on premultiplied colour (odd edges are padded)."""
+    h, w = image.shape[:2]
+    if h % 2 or w % 2:
+        image = np.pad(image, ((0, h % 2), (0, w % 2), (0, 0)), mode='edge')
+    out = np.empty((image.shape[0] // 2, image.shape[1] // 2, 4), dtype=np.uint8)
+    for y in range(0, out.shape[0], BAND_ROWS):
+        band = image[2 * y:2 * (y + BAND_ROWS)].astype(np.float32) / 255
+        band[..., :3] *= band[..., 3:4]
+        pre = band.reshape(band.shape[0] // 2, 2, band.shape[1] // 2, 2, 4).mean(axis=(1, 3))
+        pre[..., :3] /= np.maximum(pre[..., 3:4], 1e-6)
+        out[y:y + BAND_ROWS] = to_uint8(pre)
+    return out
+
+
+def build_minimap(map_path: Path, pixels_per_tile: int, min_size: int, cache_dir: Path | None,
+                  force: bool = False) -> int:
+    start = time.perf_counter()
+    map_data = load_map(map_path)
+    base_dir = map_path.parent
+    tilesets = map_data.get('tilesets', [])
+    meta_path = metadata_path(map_path)
+    out_dir = base_dir / f"{map_path.stem}_minimap"
+
+    palette, palette_keys = gid_palette(tilesets, base_dir, cache_dir)
+    layers = []
+    for layer in tile_layers(map_data):
+        grid = layer_array(layer, map_data)
+        layers.append((layer, grid, layer_hash(layer, grid, palette_keys)))
+
+    previous = {}
+    if meta_path.exists():
+        try:
+            previous = json.loads(meta_path.read_text(encoding='utf-8'))
+        except ValueError:
+            previous = {}
+    settings = {'pixels_per_tile': pixels_per_tile, 'min_size': min_size}
+    hashes = [{'name': l.get('name'), 'hash': h} for l, _, h in layers]
+    images_exist = all((base_dir / lv['image']).exists() for lv in previous.get('levels', []))
+    if not force and previous.get('layers') == hashes and previous.get('settings') == settings and images_exist:
+        print(f"Minimap up to date: {meta_path}")
+        return 0
+
+    old = {entry['hash'] for entry in previous.get('layers', [])}
+    base = None
+    drawn = 0
+    rebuilt = 0
+    for layer, grid, h in layers:
+        if not layer.get('visible', True):
+            continue
+        cached = cache_dir / 'minimap_layers' / f"{h}.npy" if cache_dir else None
+        raster = load_cached(cached) if cached else None
+        if raster is None or raster.dtype != np.uint8:
+            raster = layer_raster(grid, palette, float(layer.get('opacity', 1.0)))
+            if cached:
+                save_cached(cached, raster)
+        if h not in old:
+            rebuilt += 1
+        if base is None:
+            base = np.zeros(raster.shape, dtype=np.float32)
+        composite_into(base, raster)
+        drawn += 1
+        del raster
+
+    if base is None:
+        print("No visible tile layers.")
+        return 1
+
+    base = to_uint8(base)
+    if pixels_per_tile > 1:
+        base = base.repeat(pixels_per_tile, axis=0).repeat(pixels_per_tile, axis=1)
+
+    out_dir.mkdir(exist_ok=True)
+    levels = []
+    level = base
+    while True:
+        name = out_dir / f"minimap_{len(levels)}.png"
+        Image.fromarray(level, 'RGBA').save(name)
+        h, w = level.shape[:2]
+        levels.append({
+            'level': len(levels),
+            'image': name.relative_to(base_dir).as_posix(),
+            'width': w,
+            'height': h,
+            'pixels_per_tile': w / map_data['width'],
+        })
+        if max(h, w) // 2 < min_size:
+            break
+        level = downsample(level)
+
+    meta = {
+        'map': map_path.name,
+        'width': map_data['width'],
+        'height': map_data['height'],
+        'tilewidth': map_data['tilewidth'],
+        'tileheight': map_data['tileheight'],
+        'settings': settings,
+        'levels': levels,
+        'layers': hashes,
+    }
+    meta_path.write_text(json.dumps(meta, indent=2), encoding='utf-8')
+    print(f"{drawn} layer(s), {rebuilt} changed since the last run")
+    print("Levels: " + ", ".join(f"{lv['width']}x{lv['height']}" for lv in levels))
+    print(f"Saved {meta_path} in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("map", nargs="?", default=MAP_JSON, help="Map JSON with embedded tilesets")
+    ap.add_argument("--pixels-per-tile", type=int, default=2, help="Level 0 resolution (default 2 px per tile)")
+    ap.add_argument("--min-size", type=int, default=16, help="Stop halving below this many pixels (default 16)")
+    ap.add_argument("--cache-dir", default=".map_cache", help="Tile colour / layer raster cache (default .map_cache)")
+    ap.add_argument("--no-cache", action="store_true", help="Disable the cache")
+    ap.add_argument("--force", action="store_true", help="Regenerate even if nothing changed")
+    args = ap.parse_args()
+    cache_dir = None if args.no_cache else Path(args.cache_dir)
+    return build_minimap(Path(args.map), args.pixels_per_tile, args.min_size, cache_dir, args.force)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+nav_export.py
+
+Build-time navigation data for a converted (Tiled JSON) map, written to one
+compact binary file (<map>.nav) so runtime pathfinding is mostly lookups:
+
+- walkability grid, one bit per tile, derived from the collision object layer
+  (rectangles, polygon/ellipse bounding boxes) and/or the collision tile layer
+  (tiles with collides=true if the tileset marks any, else every non-empty
+  tile; stair/step tiles stay walkable), same sources as the client's Game.js
+- connected-component label per tile (4-connected), so "is B reachable
+  from A" is two array reads
+- HPA*-style abstract graph: the map is cut into clusters (default 16x16),
+  entrances are placed on every walkable stretch of a cluster border, and
+  the walking distance between every pair of entrances inside a cluster is
+  precomputed (vectorized BFS)
+
+NavGrid loads the file back and answers walkable/reachable queries and
+approximate path costs (local BFS to the entrances of the start and goal
+clusters, then A* over the abstract graph).
+
+File layout (little-endian):
+  header        HEADER struct below
+  walk bits     height rows of ceil(width / 8) bytes, bit x % 8 = tile x
+  labels        width * height uint16 (label_bytes = 2) or uint32, 0 = blocked
+  cluster index (clusters_x * clusters_y + 1) uint32, nodes of cluster c are
+                cluster_start[c]:cluster_start[c + 1]
+  nodes         (x uint16, y uint16) entrance tiles, grouped by cluster
+  edges         (a uint32, b uint32, cost uint32), undirected; cost 1 between
+                the two sides of an entrance, BFS steps inside a cluster
+
+Usage:
+  python nav_export.py client/public/assets/maps/victorian/city_map.json
+  python nav_export.py map.json --cluster-size 16 --blocking-layer Bldg_1 Bldg_2
+  python nav_export.py map.json --query 10 10 100 90
+"""
+
+from __future__ import annotations
+import argparse
+import heapq
+import math
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from components import find_runs, label
+from map_layers import GID_MASK, iter_layers, layer_array, tile_layers, tiles_as_dict
+from map_stream import load_map
+
+MAGIC = b'NAV1'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHHHHHHBBIII')
+NODE_DTYPE = np.dtype([('x', '<u2'), ('y', '<u2')])
+EDGE_DTYPE = np.dtype([('a', '<u4'), ('b', '<u4'), ('cost', '<u4')])
+
+# the names Game.js looks for, in its priority order
+COLLISION_OBJECT_LAYERS = ['collisions', 'collision', 'walls', 'obstacles']
+COLLISION_TILE_LAYERS = ['collision', 'collide', 'blocked', 'collisions']
+STAIR_PROPERTIES = {'stair', 'stairs', 'step', 'steps'}
+
+# HPA*: border stretches at least this long get an entrance at each end
+WIDE_ENTRANCE = 6
+
+
+def nav_path(map_path: Path) -> Path:
+    return Path(map_path).with_suffix('.nav')
+
+
+def tile_gid_sets(map_data: dict) -> tuple[np.ndarray, np.ndarray]:
+    """Sorted GIDs marked collides=true, and GIDs marked as stairs/steps."""
+    collides, stairs = [], []
+    for ts in map_data.get('tilesets', []):
+        for tid, tile in tiles_as_dict(ts).items():
+            props = {p.get('name'): p.get('value') for p in tile.get('properties', []) or []}
+            gid = ts['firstgid'] + tid
+            if props.get('collides') is True:
+                collides.append(gid)
+            if any(props.get(name) is True for name in STAIR_PROPERTIES):
+                stairs.append(gid)
+    return np.array(sorted(collides), dtype=np.uint32), np.array(sorted(stairs), dtype=np.uint32)
+
+
+def blocked_by_objects(layer: dict, shape: tuple[int, int], tw: int, th: int) -> np.ndarray:
+    """Tiles overlapped by collision objects (bounding boxes, like Game.js)."""
+    h, w = shape
+    blocked = np.zeros(shape, dtype=bool)
+    for obj in layer.get('objects', []) or []:
+        if obj.get('point'):
+            continue
+        x, y = float(obj.get('x', 0)), float(obj.get('y', 0))
+        points = obj.get('polygon') or obj.get('polyline')
+        if points:
+            xs = [x + p['x'] for p in points]
+            ys = [y + p['y'] for p in points]
+            x0, y0, x1, y1 = min(xs), min(ys), max(xs), max(ys)
+        elif obj.get('width') and obj.get('height'):
+            x0, y0, x1, y1 = x, y, x + obj['width'], y + obj['height']
+        else:
+            continue
+        # any overlap blocks the tile; touching an edge doesn't
+        c0, r0 = max(int(x0 // tw), 0), max(int(y0 // th), 0)
+        c1, r1 = min(math.ceil(x1 / tw), w), min(math.ceil(y1 / th), h)
+        blocked[r0:r1, c0:c1] = True
+    return blocked
+
+
+def walkable_grid(map_data: dict, blocking_layers: list[str] | None = None) -> tuple[np.ndarray, list[str]]:
+    """(height, width) bool walkability, and the names of the layers it came from."""
+    h, w = map_data['height'], map_data['width']
+    tw, th = map_data['tilewidth'], map_data['tileheight']
+    blocked = np.zeros((h, w), dtype=bool)
+    sources = []
+
+    layers = list(iter_layers(map_data.get('layers', [])))
+    for layer in layers:
+        if layer.get('type') == 'objectgroup' and (layer.get('name') or '').lower() in COLLISION_OBJECT_LAYERS:
+            blocked |= blocked_by_objects(layer, (h, w), tw, th)
+            sources.append(layer['name'])
+
+    wanted = {n.lower() for n in blocking_layers} if blocking_layers else set(COLLISION_TILE_LAYERS)
+    collides, stairs = tile_gid_sets(map_data)
+    for layer in tile_layers(map_data):
+        if (layer.get('name') or '').lower() not in wanted:
+            continue
+        bare = layer_array(layer, map_data) & GID_MASK
+        solid = bare != 0
+        by_property = np.isin(bare, collides)
+        if by_property.any():
+            solid = by_property
+        blocked |= solid & ~np.isin(bare, stairs)
+        sources.append(layer['name'])
+
+    return ~blocked, sources
+
+
+def border_entrances(walk: np.ndarray, size: int) -> list[tuple[int, int, int, int]]:
+    """((x, y) inside one cluster, (x, y) across the border) for every entrance, vertical borders only."""
+    h, w = walk.shape
+    xs = np.arange(size - 1, w - 1, size)
+    if len(xs) == 0:
+        return []
+    open_ = walk[:, xs] & walk[:, xs + 1]
+    # cut the border columns at cluster rows, so every run stays inside one cluster pair
+    rows_per = -(-h // size)
+    padded = np.pad(open_.T, ((0, 0), (0, rows_per * size - h)))
+    rows, starts, ends = find_runs(padded.reshape(len(xs) * rows_per, size))
+    border, cluster_row = rows // rows_per, rows % rows_per
+    entrances = []
+    for b, cr, s, e in zip(border.tolist(), cluster_row.tolist(), starts.tolist(), ends.tolist()):
+        y0 = cr * size
+        picks = (s, e - 1) if e - s >= WIDE_ENTRANCE else ((s + e - 1) // 2,)
+        for y in picks:
+            entrances.append((int(xs[b]), y0 + y, int(xs[b]) + 1, y0 + y))
+    return entrances
+
+
+def bfs_steps(walk: np.ndarray, sources_yx: np.ndarray) -> np.ndarray:
+    """(k, h, w) BFS step counts from each of k source tiles over walk (-1 = unreachable)."""
+    k = len(sources_yx)
+    dist = np.full((k,) + walk.shape, -1, dtype=np.int32)
+    frontier = np.zeros(dist.shape, dtype=bool)
+    frontier[np.arange(k), sources_yx[:, 0], sources_yx[:, 1]] = True
+    frontier &= walk
+    step = 0
+    # all k searches advance together, one 4-neighbour dilation per step
+    while frontier.any():
+        dist[frontier] = step
+        step += 1
+        grown = np.zeros_like(frontier)
+        grown[:, 1:, :] |= frontier[:, :-1, :]
+        grown[:, :-1, :] |= frontier[:, 1:, :]
+        grown[:, :, 1:] |= frontier[:, :, :-1]
+        grown[:, :, :-1] |= frontier[:, :, 1:]
+        frontier = grown & walk & (dist < 0)
+    return dist
+
+
+def cluster_distances(walk: np.ndarray, nodes_yx: np.ndarray) -> np.ndarray:
+    """(k, k) BFS step counts between k entrance tiles of one cluster (-1 = unreachable)."""
+    return bfs_steps(walk, nodes_yx)[:, nodes_yx[:, 0], nodes_yx[:, 1]]
+
+
+def build_graph(walk: np.ndarray, size: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, tuple[int, int]]:
+    """(cluster_start, nodes, edges, (clusters_x, clusters_y)) of the abstract graph."""
+    h, w = walk.shape
+    ncx, ncy = -(-w // size), -(-h // size)
+
+    # vertical borders directly, horizontal ones on the transposed grid
+    pairs = border_entrances(walk, size)
+    pairs += [(y0, x0, y1, x1) for x0, y0, x1, y1 in border_entrances(walk.T, size)]
+
+    cells = np.array([(y0 * w + x0, y1 * w + x1) for x0, y0, x1, y1 in pairs], dtype=np.int64).reshape(-1, 2)
+    node_cells = np.unique(cells)
+    ny, nx = node_cells // w, node_cells % w
+    cluster = (ny // size) * ncx + nx // size
+    order = np.lexsort((node_cells, cluster))
+    # node index of every entrance side: position in node_cells, then in cluster order
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    index_of = rank[np.searchsorted(node_cells, cells)]
+    node_cells, ny, nx, cluster = node_cells[order], ny[order], nx[order], cluster[order]
+    cluster_start = np.searchsorted(cluster, np.arange(ncx * ncy + 1)).astype('<u4')
+
+    nodes = np.zeros(len(node_cells), dtype=NODE_DTYPE)
+    nodes['x'], nodes['y'] = nx, ny
+
+    # inter-cluster edges: the two sides of each entrance, one step apart
+    edge_a, edge_b, edge_cost = [index_of[:, 0]], [index_of[:, 1]], [np.ones(len(cells), dtype=np.int64)]
+
+    # intra-cluster edges: BFS distance between entrances of the same cluster
+    for c in range(ncx * ncy):
+        lo, hi = int(cluster_start[c]), int(cluster_start[c + 1])
+        if hi - lo < 2:
+            continue
+        cy, cx = divmod(c, ncx)
+        y0, x0 = cy * size, cx * size
+        sub = walk[y0:y0 + size, x0:x0 + size]
+        local = np.stack([ny[lo:hi] - y0, nx[lo:hi] - x0], axis=1)
+        dist = cluster_distances(sub, local)
+        a, b = np.nonzero(np.triu(dist > 0))
+        edge_a.append(a + lo)
+        edge_b.append(b + lo)
+        edge_cost.append(dist[a, b])
+
+    edges = np.zeros(sum(len(a) for a in edge_a), dtype=EDGE_DTYPE)
+    edges['a'], edges['b'], edges['cost'] = np.concatenate(edge_a), np.concatenate(edge_b), np.concatenate(edge_cost)
+    return cluster_start, nodes, edges, (ncx, ncy)
+
+
+def export_nav(map_path: Path, out_path: Path | None = None, cluster_size: int = 16,
+               blocking_layers: list[str] | None = None) -> dict:
+    map_data = load_map(map_path)
+    out_path = Path(out_path) if out_path else nav_path(map_path)
+
+    walk, sources = walkable_grid(map_data, blocking_layers)
+    labels, components = label(walk)
+    cluster_start, nodes, edges, (ncx, ncy) = build_graph(walk, cluster_size)
+
+    h, w = walk.shape
+    label_dtype = '<u2' if components < 0xFFFF else '<u4'
+    header = HEADER.pack(MAGIC, VERSION, w, h, map_data['tilewidth'], map_data['tileheight'],
+                         cluster_size, ncx, ncy, np.dtype(label_dtype).itemsize, 0,
+                         components, len(nodes), len(edges))
+    with open(out_path, 'wb') as f:
+        f.write(header)
+        f.write(np.packbits(walk, axis=1, bitorder='little').tobytes())
+        f.write(labels.astype(label_dtype).tobytes())
+        f.write(cluster_start.astype('<u4').tobytes())
+        f.write(nodes.tobytes())
+        f.write(edges.tobytes())
+
+    return {
+        'nav': str(out_path),
+        'sources': sources,
+        'walkable': int(walk.sum()),
+        'tiles': w * h,
+        'components': components,
+        'clusters': ncx * ncy,
+        'nodes': len(nodes),
+        'edges': len(edges),
+        'bytes': out_path.stat().st_size,
+    }
+
+
+class NavGrid:
+    def __init__(self, path: Path | str):
+        raw = Path(path).read_bytes()
+        (magic, version, self.width, self.height, self.tilewidth, self.tileheight, self.cluster_size,
+         self.clusters_x, self.clusters_y, label_bytes, _, self.components, n_nodes, n_edges) = HEADER.unpack_from(raw)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path}: not a version {VERSION} nav file")
+
+        offset = HEADER.size
+        row_bytes = -(-self.width // 8)
+        bits = np.frombuffer(raw, np.uint8, self.height * row_bytes, offset).reshape(self.height, row_bytes)
+        self.walk = np.unpackbits(bits, axis=1, count=self.width, bitorder='little').astype(bool)
+        offset += bits.nbytes
+        label_dtype = '<u2' if label_bytes == 2 else '<u4'
+        self.labels = np.frombuffer(raw, label_dtype, self.width * self.height, offset).reshape(self.height, self.width)
+        offset += self.labels.nbytes
+        self.cluster_start = np.frombuffer(raw, '<u4', self.clusters_x * self.clusters_y + 1, offset)
+        offset += self.cluster_start.nbytes
+        self.nodes = np.frombuffer(raw, NODE_DTYPE, n_nodes, offset)
+        offset += self.nodes.nbytes
+        self.edges = np.frombuffer(raw, EDGE_DTYPE, n_edges, offset)
+
+        self.adjacency = [[] for _ in range(n_nodes)]
+        for a, b, cost in zip(self.edges['a'].tolist(), self.edges['b'].tolist(), self.edges['cost'].tolist()):
+            self.adjacency[a].append((b, cost))
+            self.adjacency[b].append((a, cost))
+
+    def walkable(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height and bool(self.walk[y, x])
+
+    def component(self, x: int, y: int) -> int:
+        return int(self.labels[y, x])
+
+    def reachable(self, start: tuple[int, int], goal: tuple[int, int]) -> bool:
+        return self.walkable(*start) and self.walkable(*goal) and self.component(*start) == self.component(*goal)
+
+    def cluster_of(self, x: int, y: int) -> int:
+        return (y // self.cluster_size) * self.clusters_x + x // self.cluster_size
+
+    def cluster_bounds(self, c: int) -> tuple[int, int, int, int]:
+        cy, cx = divmod(c, self.clusters_x)
+        x0, y0 = cx * self.cluster_size, cy * self.cluster_size
+        return x0, y0, min(x0 + self.cluster_size, self.width), min(y0 + self.cluster_size, self.height)
+
+    def local_distances(self, x: int, y: int) -> np.ndarray:
+        """BFS steps from (x, y) to every tile of its own cluster (-1 = unreachable)."""
+        x0, y0, x1, y1 = self.cluster_bounds(self.cluster_of(x, y))
+        return bfs_steps(self.walk[y0:y1, x0:x1], np.array([[y - y0, x - x0]]))[0]
+
+    def path_cost(self, start: tuple[int, int], goal: tuple[int, int]) -> tuple[int, list[tuple[int, int]]] | None:
+        """
+        (approximate walking distance in tiles, entrance waypoints) from start to
+        goal, or None if goal can't be reached. HPA* costs are near-optimal:
+        paths are forced through entrance tiles.
+        """
+        if not self.reachable(start, goal):
+            return None
+        if start == goal:
+            return 0, []
+
+        best = None
+        if self.cluster_of(*start) == self.cluster_of(*goal):
+            x0, y0, _, _ = self.cluster_bounds(self.cluster_of(*start))
+            d = int(self.local_distances(*start)[goal[1] - y0, goal[0] - x0])
+            if d >= 0:
+                best = (d, [])
+
+        def attach(point):
+            c = self.cluster_of(*point)
+            x0, y0, _, _ = self.cluster_bounds(c)
+            lo, hi = int(self.cluster_start[c]), int(self.cluster_start[c + 1])
+            dist = self.local_distances(*point)
+            out = {}
+            for n in range(lo, hi):
+                d = int(dist[int(self.nodes['y'][n]) - y0, int(self.nodes['x'][n]) - x0])
+                if d >= 0:
+                    out[n] = d
+            return out
+
+        from_start, to_goal = attach(start), attach(goal)
+        gx, gy = goal
+
+        def h(n: int) -> int:
+            return abs(int(self.nodes['x'][n]) - gx) + abs(int(self.nodes['y'][n]) - gy)
+
+        # A* over the abstract graph, Manhattan heuristic
+        g = dict(from_start)
+        came = {}
+        heap = [(d + h(n), d, n) for n, d in from_start.items()]
+        heapq.heapify(heap)
+        while heap:
+            f, d, n = heapq.heappop(heap)
+            if d > g.get(n, math.inf):
+                continue
+            if best is not None and f >= best[0]:
+                break
+            if n in to_goal and (best is None or d + to_goal[n] < best[0]):
+                path = [n]
+                while path[-1] in came:
+                    path.append(came[path[-1]])
+                waypoints = [(int(self.nodes['x'][p]), int(self.nodes['y'][p])) for p in reversed(path)]
+                best = (d + to_goal[n], waypoints)
+            for m, cost in self.adjacency[n]:
+                nd = d + cost
+                if nd < g.get(m, math.inf):
+                    g[m] = nd
+                    came[m] = n
+                    heapq.heappush(heap, (nd + h(m), nd, m))
+        return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("map", help="Converted map JSON")
+    ap.add_argument("--out", default=None, help="Output .nav (default: next to the map)")
+    ap.add_argument("--cluster-size", type=int, default=16, help="HPA* cluster size in tiles (default 16)")
+    ap.add_argument("--blocking-layer", nargs="+", default=None,
+                    help="Tile layers whose tiles block movement (default: Collision/Collide/Blocked/Collisions)")
+    ap.add_argument("--query", nargs=4, type=int, metavar=("X0", "Y0", "X1", "Y1"), default=None,
+                    help="Load the .nav and print the path cost between two tiles")
+    args = ap.parse_args()
+
+    out = Path(args.out) if args.out else nav_path(Path(args.map))
+    if args.query:
+        nav = NavGrid(out)
+        start, goal = tuple(args.query[:2]), tuple(args.query[2:])
+        result = nav.path_cost(start, goal)
+        if result is None:
+            print(f"{start} -> {goal}: unreachable")
+        else:
+            print(f"{start} -> {goal}: ~{result[0]} tile(s) via {len(result[1])} entrance(s) {result[1]}")
+        return 0
+
+    info = export_nav(Path(args.map), out, args.cluster_size, args.blocking_layer)
+    if not info['sources']:
+        print("⚠️  No collision layer found; every tile is walkable.")
+    else:
+        print(f"Collision from: {', '.join(info['sources'])}")
+    print(f"Walkable: {info['walkable']}/{info['tiles']} tiles, {info['components']} region(s)")
+    print(f"HPA*: {info['clusters']} cluster(s), {info['nodes']} entrance node(s), {info['edges']} edge(s)")
+    print(f"Saved {info['nav']} ({info['bytes']} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,8 @@
 from PIL import Image
 import os
 
+from chroma_key import key_image
+
 INPUT = r"C:/Users/warde/.gemini/antigravity/brain/ef011ad0-b8c4-4199-9e25-69e86d55dd30/detective_noir_final_1768339548303.png"
 OUTPUT_DIR = "client/public/assets/sprites/characters"
 OUTPUT = os.path.join(OUTPUT_DIR, "detective.png")
@@ -39,16 +41,9 @@ new_img.paste(idle_up, (96, 4 * FRAME))
 
 
 # 4. Remove Background (Magenta Chroma Key)
-datas = new_img.getdata()
-newData = []
-for item in datas:
-    # Check for Magenta (R=255, G=0, B=255)
-    # Using small tolerance for compression artifacts
-    if item[0] > 200 and item[1] < 100 and item[2] > 200:
-        newData.append((0, 0, 0, 0))
-    else:
-        newData.append(item)
-new_img.putdata(newData)
+# Check for Magenta (R=255, G=0, B=255)
+# Using small tolerance for compression artifacts (R > 200, G < 100, B > 200)
+new_img = key_image(new_img, "magenta")
 
 # 5. Clean Grid (1px border) to remove any anti-aliased edges
 pixels = new_img.load()
@@ -1,6 +1,8 @@
 from PIL import Image
 import os
 
+from chroma_key import key_image
+
 INPUT = r"C:/Users/warde/.gemini/antigravity/brain/ef011ad0-b8c4-4199-9e25-69e86d55dd30/npc_townspeople_1768342945993.png"
 OUTPUT = "client/public/assets/sprites/characters/npcs.png"
 
@@ -14,15 +16,8 @@ if img.size != (256, 256):
     print(f"Resizing from {img.size} to (256, 256)...")
     img = img.resize((256, 256), Image.NEAREST)
 
-# Remove Magenta background
-datas = img.getdata()
-newData = []
-for item in datas:
-    if item[0] > 200 and item[1] < 100 and item[2] > 200:
-        newData.append((0, 0, 0, 0))
-    else:
-        newData.append(item)
-img.putdata(newData)
+# Remove Magenta background (R > 200, G < 100, B > 200)
+img = key_image(img, "magenta")
 
 img.save(OUTPUT)
 print(f"Saved {OUTPUT}")
@@ -1,6 +1,8 @@
 from PIL import Image
 import os
 
+from chroma_key import key_image
+
 INPUT = r"C:/Users/warde/.gemini/antigravity/brain/ef011ad0-b8c4-4199-9e25-69e86d55dd30/detective_wide_pixel_1768339196495.png"
 OUTPUT = "client/public/assets/detective_big.png"
 TARGET_SIZE = (256, 256)
@@ -14,18 +16,9 @@ if img.size != TARGET_SIZE:
     img = img.resize(TARGET_SIZE, Image.NEAREST)
 
 # 2. Chroma Key Removal (Green Screen)
-datas = img.getdata()
-newData = []
-
-for item in datas:
-    # Check for Green (R < 50, G > 200, B < 50)
-    # The generated green is usually roughly (0, 255, 0)
-    if item[0] < 50 and item[1] > 200 and item[2] < 50:
-        newData.append((0, 0, 0, 0)) # Transparent
-    else:
-        newData.append(item)
-
-img.putdata(newData)
+# Check for Green (R < 50, G > 200, B < 50)
+# The generated green is usually roughly (0, 255, 0)
+img = key_image(img, "green")  # Transparent
 
 # 3. Clean Grid Lines (1px border of every 64x64 cell)
 # Just in case model added them.
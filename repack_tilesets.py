@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+repack_tilesets.py
+
+Strips unused tiles out of a map's tilesets:
+
+- scans every tile layer (and tile objects) for the GIDs actually used, with
+  flip flags masked off, in one vectorized pass per layer
+- keeps animation frames of used animated tiles, even if never placed
+- copies the used tiles of each tileset into a compact atlas PNG
+  (<image>_packed.png, no margin/spacing) and drops tilesets nothing uses
+- rewrites tileset entries (consecutive firstgids, per-tile metadata) and
+  every layer GID, keeping flip flags
+- prints tiles/texture memory/file size before and after
+
+Usage:
+  python repack_tilesets.py
+  python repack_tilesets.py map.json map_packed.json --max-texture 4096
+
+Notes:
+- One atlas per tileset keeps per-tileset properties and transparent colours intact.
+- Atlases stay within --max-texture on both sides; a tileset whose used tiles
+  don't fit is an error (nothing is written) rather than an oversized atlas.
+"""
+
+from __future__ import annotations
+import argparse
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from map_layers import (
+    FLAG_MASK, GID_MASK, iter_layers, layer_array, load_map, load_tileset_image, save_map,
+    set_layer_array, tile_layers, tile_pixels, tiles_as_dict, tiles_like, tileset_first_gids,
+    tileset_index, tileset_tilecount,
+)
+
+MAP_JSON = 'client/public/assets/maps/victorian/city_map_split.json'
+OUTPUT_JSON = 'client/public/assets/maps/victorian/city_map_packed.json'
+
+
+def used_gids(map_data: dict) -> np.ndarray:
+    """Sorted unique flag-free GIDs referenced anywhere in the map (0 excluded)."""
+    found = [np.unique(layer_array(layer, map_data) & GID_MASK) for layer in tile_layers(map_data)]
+    for layer in iter_layers(map_data.get('layers', [])):
+        for obj in layer.get('objects', []) or []:
+            if obj.get('gid'):
+                found.append(np.array([int(obj['gid']) & GID_MASK], dtype=np.uint32))
+    if not found:
+        return np.zeros(0, dtype=np.uint32)
+    gids = np.unique(np.concatenate(found))
+    return gids[gids != 0]
+
+
+def used_per_tileset(map_data: dict, gids: np.ndarray) -> list[np.ndarray]:
+    """Used local tile ids of every tileset, closed over animation frames."""
+    tilesets = map_data['tilesets']
+    idx = tileset_index(gids.astype(np.int64), tileset_first_gids(tilesets))
+    per_ts = []
+    for i, ts in enumerate(tilesets):
+        local = set((gids[idx == i].astype(np.int64) - ts['firstgid']).tolist())
+        local = {t for t in local if t < tileset_tilecount(ts)}
+        tiles = tiles_as_dict(ts)
+        pending = [t for t in local if 'animation' in tiles.get(t, {})]
+        while pending:
+            tid = pending.pop()
+            for frame in tiles[tid]['animation']:
+                f = frame['tileid']
+                if f not in local:
+                    local.add(f)
+                    if 'animation' in tiles.get(f, {}):
+                        pending.append(f)
+        per_ts.append(np.array(sorted(local), dtype=np.int64))
+    return per_ts
+
+
+def pack_tileset(ts: dict, local_ids: np.ndarray, base_dir: Path, max_texture: int) -> tuple[dict, str, np.ndarray]:
+    """Builds the compact atlas; returns (new tileset entry without firstgid, image name, atlas RGBA array)."""
+    tw, th = ts['tilewidth'], ts['tileheight']
+    n = len(local_ids)
+    max_cols, max_rows = max_texture // tw, max_texture // th
+    if n > max_cols * max_rows:
+        raise ValueError(f"{ts.get('name')}: {n} used {tw}x{th} tiles don't fit a {max_texture}x{max_texture} "
+                         f"atlas (at most {max_cols * max_rows}); raise --max-texture")
+    # roughly square, then widened as far as needed to stay within max_rows
+    cols = max(1, min(math.ceil(math.sqrt(n * th / tw)), max_cols, n))
+    cols = max(cols, math.ceil(n / max_rows))
+    rows = math.ceil(n / cols)
+
+    image = load_tileset_image(ts, base_dir)
+    tiles = tile_pixels(image, ts, local_ids)
+    # pad the last row, then lay the (rows, cols) grid of tiles out as one image
+    if rows * cols > n:
+        tiles = np.concatenate([tiles, np.zeros((rows * cols - n, th, tw, 4), dtype=tiles.dtype)])
+    atlas = tiles.reshape(rows, cols, th, tw, 4).transpose(0, 2, 1, 3, 4).reshape(rows * th, cols * tw, 4)
+
+    stem, _ = os.path.splitext(ts['image'])
+    name = f"{stem}_packed.png"
+
+    entry = dict(ts)
+    entry.pop('transparentcolor', None)  # already keyed out into alpha by load_tileset_image
+    entry.update({
+        'image': name,
+        'imagewidth': cols * tw,
+        'imageheight': rows * th,
+        'columns': cols,
+        'tilecount': n,
+        'margin': 0,
+        'spacing': 0,
+    })
+
+    old_tiles = tiles_as_dict(ts)
+    new_id = {int(old): new for new, old in enumerate(local_ids.tolist())}
+    kept = {}
+    for old, tdata in old_tiles.items():
+        if old not in new_id:
+            continue
+        tdata = dict(tdata)
+        tdata['id'] = new_id[old]
+        if 'animation' in tdata:
+            tdata['animation'] = [{**f, 'tileid': new_id[f['tileid']]} for f in tdata['animation']]
+        kept[new_id[old]] = tdata
+    entry.pop('tiles', None)
+    if kept:
+        entry['tiles'] = tiles_like(ts, kept)
+    return entry, name, atlas
+
+
+def repack(map_path: Path, out_path: Path, max_texture: int) -> int:
+    print(f"Loading map {map_path}...")
+    map_data = load_map(map_path)
+    base_dir = map_path.parent
+    tilesets = map_data['tilesets']
+
+    gids = used_gids(map_data)
+    per_ts = used_per_tileset(map_data, gids)
+    print(f"{len(gids)} distinct tile(s) used across {len(tile_layers(map_data))} tile layer(s)")
+
+    new_tilesets = []
+    # old bare GID -> new bare GID, as two sorted arrays for searchsorted lookups
+    old_keys, new_vals = [], []
+    next_gid = 1
+    atlases = []
+    mem_before = mem_after = bytes_before = bytes_after = 0
+
+    for ts, local in zip(tilesets, per_ts):
+        total = tileset_tilecount(ts)
+        src = base_dir / ts['image'] if ts.get('image') else None
+        mem_before += ts.get('imagewidth', 0) * ts.get('imageheight', 0) * 4
+        bytes_before += src.stat().st_size if src and src.exists() else 0
+        if len(local) == 0:
+            print(f"  {ts.get('name')}: 0/{total} used, dropped")
+            continue
+        if src is None or not src.exists():
+            print(f"Tileset image not found for {ts.get('name')}: {src}")
+            return 1
+
+        try:
+            entry, name, atlas = pack_tileset(ts, local, base_dir, max_texture)
+        except ValueError as e:
+            print(f"Cannot pack tileset: {e}")
+            return 1
+        entry['firstgid'] = next_gid
+        new_tilesets.append(entry)
+        old_keys.append(local + ts['firstgid'])
+        new_vals.append(np.arange(len(local), dtype=np.int64) + next_gid)
+        next_gid += len(local)
+        atlases.append((name, atlas))
+
+        h, w = atlas.shape[:2]
+        mem_after += w * h * 4
+        print(f"  {ts.get('name')}: {len(local)}/{total} used -> {name} ({w}x{h})")
+
+    # every tileset packed: only now touch the disk, so a failure leaves nothing behind
+    for name, atlas in atlases:
+        Image.fromarray(atlas, 'RGBA').save(base_dir / name, optimize=True)
+        bytes_after += (base_dir / name).stat().st_size
+
+    old_keys = np.concatenate(old_keys) if old_keys else np.zeros(0, dtype=np.int64)
+    new_vals = np.concatenate(new_vals) if new_vals else np.zeros(0, dtype=np.int64)
+    order = np.argsort(old_keys)
+    old_keys, new_vals = old_keys[order], new_vals[order]
+
+    def remap(grid: np.ndarray) -> np.ndarray:
+        bare = (grid & GID_MASK).astype(np.int64)
+        pos = np.clip(np.searchsorted(old_keys, bare), 0, max(len(old_keys) - 1, 0))
+        hit = (bare != 0) & (old_keys[pos] == bare) if len(old_keys) else np.zeros(bare.shape, bool)
+        return np.where(hit, new_vals[pos].astype(np.uint32) | (grid & FLAG_MASK), 0).astype(np.uint32)
+
+    for layer in tile_layers(map_data):
+        set_layer_array(layer, remap(layer_array(layer, map_data)))
+    for layer in iter_layers(map_data.get('layers', [])):
+        for obj in layer.get('objects', []) or []:
+            if obj.get('gid'):
+                obj['gid'] = type(obj['gid'])(int(remap(np.array([int(obj['gid'])], dtype=np.uint32))[0]))
+
+    map_data['tilesets'] = new_tilesets
+    save_map(map_data, out_path)
+
+    mb = 1024 * 1024
+    print(f"Tilesets: {len(tilesets)} -> {len(new_tilesets)}")
+    print(f"Texture memory (RGBA8): {mem_before / mb:.1f} MB -> {mem_after / mb:.1f} MB")
+    print(f"Image files: {bytes_before / mb:.1f} MB -> {bytes_after / mb:.1f} MB")
+    print(f"Saved {out_path}")
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("map", nargs="?", default=MAP_JSON, help="Map JSON with embedded tilesets")
+    ap.add_argument("out", nargs="?", default=OUTPUT_JSON, help="Where to write the repacked map")
+    ap.add_argument("--max-texture", type=int, default=4096, help="Max atlas width and height (default 4096)")
+    args = ap.parse_args()
+    return repack(Path(args.map), Path(args.out), args.max_texture)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,77 +1,132 @@
+#!/usr/bin/env python3
+"""
+smart_clean.py
+
+Removes the background around a sprite without touching same-coloured pixels
+inside it: only background regions connected to the image border are cleared.
+
+- the background mask (grey 205 / white 255 checkerboard within TOLERANCE by
+  default, or any chroma_key.py key specs) is computed vectorized
+- the mask is cut into horizontal runs, runs are labelled into connected
+  regions (components.run_labels, 4-connected by default) and the runs of
+  every region touching a seed edge are painted back as cleared (0, 0, 0, 0);
+  no per-pixel label image, stack or visited set is built
+- with --frame W H each frame of a sprite sheet is seeded from its own edges
+  and regions never cross frame boundaries, so background enclosed between
+  frames is removed while holes inside a character stay
+- also available as the smart_clean stage of sprite_pipeline.py
+
+Usage:
+  python smart_clean.py
+  python smart_clean.py client/public/assets/sprites/characters/npcs.png --frame 64 64
+  python smart_clean.py sheet.png --out clean.png --key '{"rgb": [255, 0, 255], "tolerance": 40}'
+"""
+
+from __future__ import annotations
+import argparse
+import json
+
+import numpy as np
 from PIL import Image
-import sys
 
-# Increase recursion depth for flood fill just in case, though we use iterative stack
-sys.setrecursionlimit(100000)
+from chroma_key import keyed_pixels
+from components import find_runs, run_labels
 
 FILE = "client/public/assets/detective_big.png"
-TOLERANCE = 10 # Tolerance for color matching
-
-def is_bg_color(pixel):
-    # Check for Grey (205) or White (255) with tolerance
-    # Alpha must be checked? Input is likely RGB or RGBA with full alpha
-    r, g, b = pixel[:3]
-    
-    # Target 1: 205, 205, 205
-    if abs(r - 205) < TOLERANCE and abs(g - 205) < TOLERANCE and abs(b - 205) < TOLERANCE:
-        return True
-    
-    # Target 2: 255, 255, 255
-    if abs(r - 255) < TOLERANCE and abs(g - 255) < TOLERANCE and abs(b - 255) < TOLERANCE:
-        return True
-        
-    return False
-
-def smart_clean():
-    print(f"Opening {FILE}...")
-    img = Image.open(FILE).convert("RGBA")
-    width, height = img.size
-    pixels = img.load()
-    
-    # Stack for flood fill ((x, y))
-    # Start with all border pixels if they match BG color
-    stack = []
-    visited = set()
-    
-    # Check borders to initialize flood
-    for x in range(width):
-        if is_bg_color(pixels[x, 0]):
-            stack.append((x, 0))
-        if is_bg_color(pixels[x, height-1]):
-            stack.append((x, height-1))
-            
-    for y in range(height):
-        if is_bg_color(pixels[0, y]):
-            stack.append((0, y))
-        if is_bg_color(pixels[width-1, y]):
-            stack.append((width-1, y))
-            
-    print(f"Starting flood fill with {len(stack)} seed points...")
-    
-    count = 0
-    while stack:
-        x, y = stack.pop()
-        
-        if (x, y) in visited:
-            continue
-        visited.add((x, y))
-        
-        # Turn transparent
-        pixels[x, y] = (0, 0, 0, 0)
-        count += 1
-        
-        # Check neighbors
-        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            nx, ny = x + dx, y + dy
-            
-            if 0 <= nx < width and 0 <= ny < height:
-                if (nx, ny) not in visited:
-                    if is_bg_color(pixels[nx, ny]):
-                        stack.append((nx, ny))
+TOLERANCE = 10  # Tolerance for color matching (per channel, exclusive)
+
+
+def background_keys(tolerance: int = TOLERANCE) -> list[dict]:
+    """Grey (205) and white (255) checkerboard, |channel - target| < tolerance."""
+    return [{'rgb': [205, 205, 205], 'tolerance': tolerance - 1},
+            {'rgb': [255, 255, 255], 'tolerance': tolerance - 1}]
+
+
+def cut_frames(mask: np.ndarray, fw: int, fh: int) -> np.ndarray:
+    """mask with a False row/column after every frame, so components can't cross frames."""
+    h, w = mask.shape
+    rows, cols = -(-h // fh), -(-w // fw)
+    padded = np.zeros((rows * fh, cols * fw), dtype=bool)
+    padded[:h, :w] = mask
+    cut = np.zeros((rows, fh + 1, cols, fw + 1), dtype=bool)
+    cut[:, :fh, :, :fw] = padded.reshape(rows, fh, cols, fw)
+    return cut.reshape(rows * (fh + 1), cols * (fw + 1))
+
 
+def uncut_frames(cut: np.ndarray, shape: tuple[int, int], fw: int, fh: int) -> np.ndarray:
+    """Inverse of cut_frames."""
+    h, w = shape
+    rows, cols = -(-h // fh), -(-w // fw)
+    grid = cut.reshape(rows, fh + 1, cols, fw + 1)[:, :fh, :, :fw]
+    return grid.reshape(rows * fh, cols * fw)[:h, :w]
+
+
+def border_background(img: np.ndarray, keys: list[dict] | str | None = None,
+                      frame: tuple[int, int] | None = None, connectivity: int = 4) -> np.ndarray:
+    """Bool mask of the background pixels connected to the image (or each frame's) edge."""
+    mask = keyed_pixels(img, keys if keys is not None else background_keys())
+    h, w = mask.shape
+    fw, fh = frame or (w, h)
+    # a whole image is just one frame; the cut keeps components inside their frame
+    cut = cut_frames(mask, fw, fh)
+    rows, starts, ends = find_runs(cut)
+    if len(rows) == 0:
+        return np.zeros((h, w), dtype=bool)
+    run_label = run_labels(rows, starts, ends, cut.shape[1], connectivity)
+
+    # seed runs: on a frame's top/bottom row, or reaching its left/right column
+    # (the sheet's last row/column count too, for partial frames)
+    y = rows - rows // (fh + 1)
+    x0 = starts - starts // (fw + 1)
+    x1 = (ends - 1) - (ends - 1) // (fw + 1)
+    seeded = ((y % fh == 0) | (y % fh == fh - 1) | (y == h - 1)
+              | (x0 % fw == 0) | (x1 % fw == fw - 1) | (x1 == w - 1))
+    clear = np.zeros(int(run_label.max()) + 1, dtype=bool)
+    clear[run_label[seeded]] = True
+    keep = clear[run_label]
+
+    # paint the cleared runs: +1 at each start, -1 past each end, prefix sum per row
+    delta = np.zeros((cut.shape[0], cut.shape[1] + 1), dtype=np.int8)
+    delta[rows[keep], starts[keep]] = 1
+    delta[rows[keep], ends[keep]] = -1
+    painted = np.cumsum(delta, axis=1, dtype=np.int8)[:, :-1].view(bool)
+    return uncut_frames(painted, (h, w), fw, fh)
+
+
+def smart_clean(img: np.ndarray, keys: list[dict] | str | None = None,
+                frame: tuple[int, int] | None = None, connectivity: int = 4) -> tuple[np.ndarray, int]:
+    """(RGBA array with the border-connected background cleared, cleared pixel count)."""
+    bg = border_background(img, keys, frame, connectivity)
+    count = int(np.count_nonzero(bg))
+    if count == 0:
+        return img, 0
+    out = np.array(img, order='C')
+    # one uint32 per pixel: a masked copy is far cheaper than boolean row assignment
+    np.copyto(out.view(np.uint32)[..., 0], np.uint32(0), where=bg)
+    return out, count
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("file", nargs="?", default=FILE, help=f"Image to clean (default: {FILE})")
+    ap.add_argument("--out", default=None, help="Where to save (default: overwrite the input)")
+    ap.add_argument("--tolerance", type=int, default=TOLERANCE, help="Checkerboard colour tolerance")
+    ap.add_argument("--key", action="append", default=[], help="Background key spec as JSON (replaces the checkerboard)")
+    ap.add_argument("--frame", type=int, nargs=2, metavar=("W", "H"), default=None,
+                    help="Seed every W x H frame of a sprite sheet separately")
+    ap.add_argument("--connectivity", type=int, choices=[4, 8], default=4)
+    args = ap.parse_args()
+
+    print(f"Opening {args.file}...")
+    with Image.open(args.file) as im:
+        img = np.array(im.convert("RGBA"))
+    keys = [json.loads(k) for k in args.key] or background_keys(args.tolerance)
+    out, count = smart_clean(img, keys, tuple(args.frame) if args.frame else None, args.connectivity)
     print(f"Removed {count} background pixels.")
-    img.save(FILE)
+    Image.fromarray(out, "RGBA").save(args.out or args.file)
     print("Done.")
+    return 0
+
 
 if __name__ == '__main__':
-    smart_clean()
+    raise SystemExit(main())
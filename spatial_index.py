@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+spatial_index.py
+
+Grid-bucketed spatial index for the object layers of a converted map, so
+trigger / interaction checks only look at objects near the player instead of
+scanning every object.
+
+- every object gets a pixel bounding box (rectangles, ellipses, points,
+  polygons/polylines and tile objects, with rotation)
+- the map is cut into square cells (default 8 tiles); each cell lists the ids
+  of the objects whose box overlaps it
+- written as <map>.spatial.json next to the map:
+    {"cellsize": px, "columns": n, "rows": n,
+     "layers": [{"id", "name",
+                 "bounds": {"<object id>": [x0, y0, x1, y1]},
+                 "cells": {"<cx>,<cy>": [object ids]}}]}
+  cells outside the map (negative or past columns/rows) are kept as well
+
+Written by tmx_to_json.py --spatial-index and convert_tmx.py; SpatialIndex
+reads it back (the client can do the same lookup on the plain JSON).
+
+Usage:
+  python spatial_index.py client/public/assets/maps/victorian/city_map.json
+  python spatial_index.py map.json --cell-size 128 --at 1100 1100 --radius 80
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import math
+from pathlib import Path
+
+DEFAULT_CELL_TILES = 8
+
+
+def spatial_path(map_path: Path) -> Path:
+    map_path = Path(map_path)
+    return map_path.with_name(f"{map_path.stem}.spatial.json")
+
+
+def object_id(obj: dict, fallback: int) -> int:
+    oid = obj.get('id', fallback)
+    return int(oid) if float(oid).is_integer() else oid
+
+
+def object_bounds(obj: dict) -> tuple[float, float, float, float]:
+    """Pixel (x0, y0, x1, y1) box of a Tiled object, rotation included."""
+    x, y = float(obj.get('x', 0)), float(obj.get('y', 0))
+    w, h = float(obj.get('width', 0) or 0), float(obj.get('height', 0) or 0)
+    points = obj.get('polygon') or obj.get('polyline')
+    if points:
+        corners = [(float(p['x']), float(p['y'])) for p in points]
+    elif obj.get('gid'):
+        # tile objects are anchored at their bottom-left corner
+        corners = [(0, -h), (w, -h), (w, 0), (0, 0)]
+    else:
+        corners = [(0, 0), (w, 0), (w, h), (0, h)]
+
+    rotation = float(obj.get('rotation', 0) or 0)
+    if rotation:
+        # Tiled rotates clockwise around (x, y)
+        a = math.radians(rotation)
+        cos, sin = math.cos(a), math.sin(a)
+        corners = [(cx * cos - cy * sin, cx * sin + cy * cos) for cx, cy in corners]
+    xs = [x + cx for cx, _ in corners]
+    ys = [y + cy for _, cy in corners]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def cell_range(x0: float, y0: float, x1: float, y1: float, cell: int) -> tuple[range, range]:
+    """Cell columns and rows a box touches (a zero-size box still gets its cell)."""
+    return (range(math.floor(x0 / cell), max(math.ceil(x1 / cell), math.floor(x0 / cell) + 1)),
+            range(math.floor(y0 / cell), max(math.ceil(y1 / cell), math.floor(y0 / cell) + 1)))
+
+
+def iter_object_layers(layers: list[dict]):
+    for layer in layers:
+        if layer.get('type') == 'objectgroup':
+            yield layer
+        elif layer.get('type') == 'group':
+            yield from iter_object_layers(layer.get('layers', []))
+
+
+def build_index(map_data: dict, cell_size: int | None = None) -> dict:
+    cell = int(cell_size or map_data.get('tilewidth', 32) * DEFAULT_CELL_TILES)
+    index = {
+        'cellsize': cell,
+        'columns': -(-map_data.get('width', 0) * map_data.get('tilewidth', 0) // cell),
+        'rows': -(-map_data.get('height', 0) * map_data.get('tileheight', 0) // cell),
+        'layers': [],
+    }
+    for layer in iter_object_layers(map_data.get('layers', [])):
+        bounds = {}
+        cells = {}
+        for i, obj in enumerate(layer.get('objects', []) or []):
+            oid = object_id(obj, i)
+            box = object_bounds(obj)
+            bounds[str(oid)] = [round(v, 3) for v in box]
+            cols, rows = cell_range(*box, cell)
+            for cy in rows:
+                for cx in cols:
+                    cells.setdefault(f"{cx},{cy}", []).append(oid)
+        index['layers'].append({'id': layer.get('id'), 'name': layer.get('name'), 'bounds': bounds, 'cells': cells})
+    return index
+
+
+def write_index(out_path: Path, map_data: dict, cell_size: int | None = None) -> Path:
+    """Writes <out>.spatial.json for map_data's object layers; returns its path."""
+    path = spatial_path(out_path)
+    path.write_text(json.dumps(build_index(map_data, cell_size), separators=(',', ':')), encoding='utf-8')
+    return path
+
+
+class SpatialIndex:
+    def __init__(self, index: dict | Path | str):
+        if not isinstance(index, dict):
+            index = json.loads(Path(index).read_text(encoding='utf-8'))
+        self.cell = index['cellsize']
+        self.layers = {}
+        for layer in index['layers']:
+            cells = {}
+            for key, ids in layer['cells'].items():
+                cx, cy = key.split(',')
+                cells[(int(cx), int(cy))] = ids
+            self.layers[layer['name']] = (cells, layer['bounds'])
+
+    def query_rect(self, layer: str, x0: float, y0: float, x1: float, y1: float) -> list:
+        """Ids of the objects in `layer` whose box overlaps the pixel rect."""
+        cells, bounds = self.layers[layer]
+        found = set()
+        cols, rows = cell_range(x0, y0, x1, y1, self.cell)
+        for cy in rows:
+            for cx in cols:
+                for oid in cells.get((cx, cy), ()):
+                    if oid in found:
+                        continue
+                    bx0, by0, bx1, by1 = bounds[str(oid)]
+                    if bx0 <= x1 and x0 <= bx1 and by0 <= y1 and y0 <= by1:
+                        found.add(oid)
+        return sorted(found, key=str)
+
+    def query_point(self, layer: str, x: float, y: float, radius: float = 0) -> list:
+        """Ids of the objects within `radius` pixels (box distance) of (x, y)."""
+        return self.query_rect(layer, x - radius, y - radius, x + radius, y + radius)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("map", help="Converted map JSON")
+    ap.add_argument("--cell-size", type=int, default=None,
+                    help=f"Cell size in pixels (default {DEFAULT_CELL_TILES} tiles)")
+    ap.add_argument("--at", nargs=2, type=float, metavar=("X", "Y"), default=None,
+                    help="Query objects around this pixel position")
+    ap.add_argument("--radius", type=float, default=0, help="Query radius in pixels")
+    args = ap.parse_args()
+
+    map_data = json.loads(Path(args.map).read_text(encoding='utf-8'))
+    path = write_index(Path(args.map), map_data, args.cell_size)
+    index = SpatialIndex(path)
+    print(f"Saved {path} (cell {index.cell}px)")
+    for name, (cells, bounds) in index.layers.items():
+        busiest = max((len(ids) for ids in cells.values()), default=0)
+        print(f"  {name}: {len(bounds)} object(s) in {len(cells)} cell(s), at most {busiest} per cell")
+        if args.at:
+            hits = index.query_point(name, args.at[0], args.at[1], args.radius)
+            print(f"    near {tuple(args.at)} r={args.radius}: {hits}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,93 +1,309 @@
-import json
+#!/usr/bin/env python3
+"""
+split_tileset.py
+
+Splits every tileset whose image exceeds a max texture size (default 4096)
+into tile-aligned chunk images, and remaps the map to match:
+
+- chunks are cut on tile boundaries (rows, and columns for very wide images)
+- chunk PNGs are cropped and encoded in parallel (one process per chunk)
+- all tilesets get fresh consecutive firstgids, so the chunks no longer
+  collide with the next tileset's firstgid
+- every layer GID (flip flags kept), object gid and per-tile metadata
+  (properties, animations) is remapped
+- a verification pass resolves every used GID before and after the split
+  to (image, pixel rect, flags) and fails if anything would render differently
+
+Usage:
+  python split_tileset.py
+  python split_tileset.py map.json map_split.json --max-texture 4096 --jobs 8
+
+Notes:
+- Tiles the declared tilecount promises but the image doesn't contain can't
+  render either way; they are reported and mapped to 0 (empty).
+"""
+
+from __future__ import annotations
+import argparse
 import os
-import math
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
 from PIL import Image
 
+from map_layers import (
+    FLAG_MASK, GID_MASK, load_map, save_map, set_layer_array, layer_array, tile_layers,
+    iter_layers, tileset_first_gids, tileset_grid, tileset_index, tile_origin,
+    tiles_as_dict, tiles_like,
+)
+
 MAP_JSON = 'client/public/assets/maps/victorian/city_map_fixed.json'
 OUTPUT_JSON = 'client/public/assets/maps/victorian/city_map_split.json'
-IMG_PATH = 'client/public/assets/maps/victorian/terrain-map-v8.png'
-CHUNK_HEIGHT = 4096
-
-def split_and_update():
-    print(f"Loading map {MAP_JSON}...")
-    with open(MAP_JSON, 'r') as f:
-        map_data = json.load(f)
-
-    # Find the corrupted tileset
-    target_ts_index = -1
-    target_ts = None
-    for i, ts in enumerate(map_data['tilesets']):
-        if 'terrain-map-v8' in ts['image']:
-            target_ts_index = i
-            target_ts = ts
-            break
-            
-    if target_ts is None:
-        print("Target tileset not found!")
-        return
-
-    print(f"splitting tileset: {target_ts['name']}")
-    
-    # Open Image
-    print(f"Opening image {IMG_PATH}...")
-    try:
-        img = Image.open(IMG_PATH)
-    except Exception as e:
-        print(f"Failed to open image: {e}")
-        return
-
-    width, height = img.size
-    print(f"Original Size: {width}x{height}")
-    
-    num_chunks = math.ceil(height / CHUNK_HEIGHT)
-    print(f"Splitting into {num_chunks} chunks of height {CHUNK_HEIGHT}...")
 
+
+def plan_split(ts: dict, max_texture: int) -> dict | None:
+    """Chunk layout for one tileset, or None if it already fits."""
+    iw, ih = ts.get('imagewidth', 0), ts.get('imageheight', 0)
+    if iw <= max_texture and ih <= max_texture:
+        return None
+
+    tw, th = ts['tilewidth'], ts['tileheight']
+    margin, spacing = ts.get('margin', 0), ts.get('spacing', 0)
+    cols, rows = tileset_grid(ts)
+    cols = ts.get('columns') or cols
+
+    # how many tiles fit in one max_texture sized chunk (chunks keep the margin)
+    cols_per = max(1, (max_texture - 2 * margin + spacing) // (tw + spacing))
+    rows_per = max(1, (max_texture - 2 * margin + spacing) // (th + spacing))
+    cols_per = min(cols_per, cols)
+    rows_per = min(rows_per, rows)
+
+    chunks = []
+    for r0 in range(0, rows, rows_per):
+        for c0 in range(0, cols, cols_per):
+            nr, nc = min(rows_per, rows - r0), min(cols_per, cols - c0)
+            x0 = c0 * (tw + spacing)
+            y0 = r0 * (th + spacing)
+            w = 2 * margin + nc * (tw + spacing) - spacing
+            h = 2 * margin + nr * (th + spacing) - spacing
+            chunks.append({'row': r0, 'col': c0, 'rows': nr, 'cols': nc, 'box': (x0, y0, x0 + w, y0 + h)})
+
+    return {
+        'cols': cols,
+        'rows': rows,
+        'rows_per': rows_per,
+        'cols_per': cols_per,
+        'chunk_cols': -(-cols // cols_per),
+        'chunks': chunks,
+    }
+
+
+def crop_chunk(src: str, box: tuple, dst: str) -> tuple[str, tuple[int, int]]:
+    with Image.open(src) as img:
+        chunk = img.crop(box)
+        chunk.load()
+    chunk.save(dst, optimize=False)
+    return dst, chunk.size
+
+
+def local_to_chunk(plan: dict, local: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(chunk index, local id inside the chunk) for original tile ids."""
+    r, c = local // plan['cols'], local % plan['cols']
+    ci = (r // plan['rows_per']) * plan['chunk_cols'] + (c // plan['cols_per'])
+    chunk_cols = np.array([ch['cols'] for ch in plan['chunks']], dtype=np.int64)
+    new_local = (r % plan['rows_per']) * chunk_cols[np.minimum(ci, len(chunk_cols) - 1)] + (c % plan['cols_per'])
+    return ci, new_local
+
+
+def build_tilesets(tilesets: list[dict], plans: list, image_names: dict) -> tuple[list[dict], list]:
+    """New tileset list with consecutive firstgids; also, per old tileset, its new firstgid(s)."""
     new_tilesets = []
-    current_gid = target_ts['firstgid']
-    tile_width = target_ts['tilewidth']
-    tile_height = target_ts['tileheight']
-    cols = width // tile_width
-
-    for i in range(num_chunks):
-        # Crop
-        y1 = i * CHUNK_HEIGHT
-        y2 = min((i + 1) * CHUNK_HEIGHT, height)
-        chunk_h = y2 - y1
-        
-        chunk_name = f"terrain-map-v8_{i}.png"
-        chunk_path = os.path.join(os.path.dirname(IMG_PATH), chunk_name)
-        
-        chunk_img = img.crop((0, y1, width, y2))
-        chunk_img.save(chunk_path)
-        print(f"  Saved {chunk_name} ({width}x{chunk_h})")
-        
-        # Create Tileset Entry
-        rows = chunk_h // tile_height
-        tile_count = cols * rows
-        
-        ts_entry = target_ts.copy()
-        ts_entry['name'] = f"terrain-map-v8_{i}"
-        ts_entry['image'] = chunk_name
-        ts_entry['imageheight'] = chunk_h
-        ts_entry['imagewidth'] = width
-        ts_entry['firstgid'] = current_gid
-        ts_entry['tilecount'] = tile_count # Important for Phaser
-        
-        # Phaser/Tiled needs 'margin' and 'spacing' correctly if they exist
-        
-        new_tilesets.append(ts_entry)
-        
-        current_gid += tile_count
-
-    # Replace the old tileset with the new list
-    # We slice the list to replace the single entry with multiple
-    map_data['tilesets'][target_ts_index:target_ts_index+1] = new_tilesets
-    
-    print(f"Warning: Next tileset starts at GID {map_data['tilesets'][target_ts_index+num_chunks]['firstgid']}. My calc ended at {current_gid}.")
-    
-    with open(OUTPUT_JSON, 'w') as f:
-        json.dump(map_data, f)
-    print(f"Saved optimized map to {OUTPUT_JSON}")
+    new_first = []
+    next_gid = 1
+    for i, ts in enumerate(tilesets):
+        plan = plans[i]
+        if plan is None:
+            entry = dict(ts)
+            entry['firstgid'] = next_gid
+            new_first.append([next_gid])
+            cols, rows = tileset_grid(ts)
+            next_gid += ts.get('tilecount') or cols * rows
+            new_tilesets.append(entry)
+            continue
+
+        firsts = []
+        old_tiles = tiles_as_dict(ts)
+        chunk_tiles = [dict() for _ in plan['chunks']]
+        if old_tiles:
+            ids = np.array(sorted(old_tiles), dtype=np.int64)
+            ci, nl = local_to_chunk(plan, ids)
+            for tid, c, n in zip(ids.tolist(), ci.tolist(), nl.tolist()):
+                if c >= len(plan['chunks']):
+                    continue
+                tdata = dict(old_tiles[tid])
+                tdata['id'] = n
+                if 'animation' in tdata:
+                    frames = np.array([f['tileid'] for f in tdata['animation']], dtype=np.int64)
+                    fci, fnl = local_to_chunk(plan, frames)
+                    if np.any(fci != c):
+                        print(f"  WARNING: animation on {ts.get('name')} tile {tid} crosses chunks; "
+                              f"dropping frames from other chunks")
+                    tdata['animation'] = [
+                        {**f, 'tileid': int(l)}
+                        for f, fc, l in zip(tdata['animation'], fci.tolist(), fnl.tolist()) if fc == c
+                    ]
+                chunk_tiles[c][n] = tdata
+
+        for ci, chunk in enumerate(plan['chunks']):
+            x0, y0, x1, y1 = chunk['box']
+            entry = dict(ts)
+            entry.pop('tiles', None)
+            entry['name'] = f"{ts.get('name')}_{ci}"
+            entry['image'] = image_names[(i, ci)]
+            entry['imagewidth'] = x1 - x0
+            entry['imageheight'] = y1 - y0
+            entry['columns'] = chunk['cols']
+            entry['tilecount'] = chunk['cols'] * chunk['rows']
+            entry['firstgid'] = next_gid
+            if chunk_tiles[ci]:
+                entry['tiles'] = tiles_like(ts, chunk_tiles[ci])
+            firsts.append(next_gid)
+            next_gid += entry['tilecount']
+            new_tilesets.append(entry)
+        new_first.append(firsts)
+    return new_tilesets, new_first
+
+
+def remap_gids(gids: np.ndarray, tilesets: list[dict], plans: list, new_first: list) -> tuple[np.ndarray, int]:
+    """Vectorized over the unique GIDs; returns (remapped, number of unrenderable GIDs zeroed)."""
+    u, inv = np.unique(gids, return_inverse=True)
+    flags = u & FLAG_MASK
+    bare = (u & GID_MASK).astype(np.int64)
+    out = np.zeros_like(u)
+    dropped = 0
+
+    first_gids = tileset_first_gids(tilesets)
+    idx = tileset_index(bare, first_gids)
+    for i, ts in enumerate(tilesets):
+        sel = (idx == i) & (bare != 0)
+        if not np.any(sel):
+            continue
+        local = bare[sel] - ts['firstgid']
+        plan = plans[i]
+        if plan is None:
+            out[sel] = (new_first[i][0] + local).astype(np.uint32) | flags[sel]
+            continue
+        ci, nl = local_to_chunk(plan, local)
+        valid = (local // plan['cols']) < plan['rows']
+        firsts = np.array(new_first[i], dtype=np.int64)
+        mapped = np.zeros(local.shape, dtype=np.uint32)
+        mapped[valid] = (firsts[ci[valid]] + nl[valid]).astype(np.uint32) | flags[sel][valid]
+        dropped_ids = int(np.count_nonzero(~valid))
+        if dropped_ids:
+            print(f"  WARNING: {dropped_ids} GID(s) of {ts.get('name')} point past the end of its image; mapped to 0")
+            dropped += dropped_ids
+        out[sel] = mapped
+    return out[inv].reshape(gids.shape), dropped
+
+
+def resolve(gids: np.ndarray, tilesets: list[dict], plans: list | None = None) -> tuple:
+    """(image name, x, y, flags) per GID, in original-image pixel space when plans/offsets are given."""
+    flags = gids & FLAG_MASK
+    bare = (gids & GID_MASK).astype(np.int64)
+    first_gids = tileset_first_gids(tilesets)
+    idx = tileset_index(bare, first_gids)
+    names = np.full(gids.shape, '', dtype=object)
+    xs = np.zeros(gids.shape, dtype=np.int64)
+    ys = np.zeros(gids.shape, dtype=np.int64)
+    for i, ts in enumerate(tilesets):
+        sel = (idx == i) & (bare != 0)
+        if not np.any(sel):
+            continue
+        x, y = tile_origin(ts, bare[sel] - ts['firstgid'])
+        origin = ts.get('_split_origin', (ts.get('image'), 0, 0))
+        names[sel] = origin[0]
+        xs[sel] = x + origin[1]
+        ys[sel] = y + origin[2]
+    return names, xs, ys, flags
+
+
+def verify(old_gids: np.ndarray, new_gids: np.ndarray, old_tilesets: list[dict], new_tilesets: list[dict]) -> int:
+    """Count of cells that would render differently after the split."""
+    keep = new_gids != 0  # zeroed cells were unrenderable before, reported separately
+    a = resolve(old_gids[keep], old_tilesets)
+    b = resolve(new_gids[keep], new_tilesets)
+    bad = (a[0] != b[0]) | (a[1] != b[1]) | (a[2] != b[2]) | (a[3] != b[3])
+    return int(np.count_nonzero(bad))
+
+
+def split_map(map_path: Path, out_path: Path, max_texture: int, jobs: int) -> int:
+    print(f"Loading map {map_path}...")
+    map_data = load_map(map_path)
+    base_dir = map_path.parent
+    tilesets = map_data['tilesets']
+
+    plans = [plan_split(ts, max_texture) if ts.get('image') else None for ts in tilesets]
+    if not any(plans):
+        print(f"No tileset image exceeds {max_texture}px; nothing to split.")
+        return 0
+
+    # crop + encode every chunk in parallel
+    image_names = {}
+    tasks = []
+    for i, (ts, plan) in enumerate(zip(tilesets, plans)):
+        if plan is None:
+            continue
+        src = base_dir / ts['image']
+        if not src.exists():
+            print(f"Tileset image not found: {src}")
+            return 1
+        stem, suffix = os.path.splitext(ts['image'])
+        print(f"Splitting {ts.get('name')}: {ts['imagewidth']}x{ts['imageheight']} -> "
+              f"{len(plan['chunks'])} chunk(s) of at most {max_texture}px")
+        for ci, chunk in enumerate(plan['chunks']):
+            name = f"{stem}_{ci}{suffix or '.png'}"
+            image_names[(i, ci)] = name
+            tasks.append((str(src), chunk['box'], str(base_dir / name)))
+
+    with ProcessPoolExecutor(max_workers=max(1, jobs)) as pool:
+        for dst, size in pool.map(crop_chunk, *zip(*tasks)):
+            print(f"  Saved {Path(dst).name} ({size[0]}x{size[1]})")
+
+    new_tilesets, new_first = build_tilesets(tilesets, plans, image_names)
+
+    # remember where each chunk sits in its source image, for verification only
+    check_tilesets = [dict(ts) for ts in new_tilesets]
+    pos = 0
+    for i, plan in enumerate(plans):
+        if plan is None:
+            pos += 1
+            continue
+        for ci, chunk in enumerate(plan['chunks']):
+            check_tilesets[pos]['_split_origin'] = (tilesets[i]['image'], chunk['box'][0], chunk['box'][1])
+            pos += 1
+
+    failures = 0
+    dropped = 0
+    for layer in tile_layers(map_data):
+        old = layer_array(layer, map_data)
+        new, d = remap_gids(old, tilesets, plans, new_first)
+        dropped += d
+        bad = verify(old, new, tilesets, check_tilesets)
+        if bad:
+            print(f"  VERIFY FAILED: layer {layer.get('name')}: {bad} cell(s) would render differently")
+        failures += bad
+        set_layer_array(layer, new)
+
+    for layer in iter_layers(map_data.get('layers', [])):
+        for obj in layer.get('objects', []) or []:
+            if obj.get('gid'):
+                old = np.array([int(obj['gid'])], dtype=np.uint32)
+                new, _ = remap_gids(old, tilesets, plans, new_first)
+                bad = verify(old, new, tilesets, check_tilesets)
+                failures += bad
+                obj['gid'] = type(obj['gid'])(int(new[0]))
+
+    map_data['tilesets'] = new_tilesets
+    save_map(map_data, out_path)
+
+    print(f"Tilesets: {len(tilesets)} -> {len(new_tilesets)}; unrenderable GIDs zeroed: {dropped}")
+    if failures:
+        print(f"FAIL: {failures} remapped GID(s) resolve to a different image/rect than before")
+        return 1
+    print(f"Verified: every remapped GID resolves to the same pixels and flags. Saved {out_path}")
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("map", nargs="?", default=MAP_JSON, help="Map JSON with embedded tilesets")
+    ap.add_argument("out", nargs="?", default=OUTPUT_JSON, help="Where to write the remapped map")
+    ap.add_argument("--max-texture", type=int, default=4096, help="Max tileset image width/height (default 4096)")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Parallel crop/encode workers")
+    args = ap.parse_args()
+    return split_map(Path(args.map), Path(args.out), args.max_texture, args.jobs)
+
 
 if __name__ == '__main__':
-    split_and_update()
+    raise SystemExit(main())
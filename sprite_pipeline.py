@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+sprite_pipeline.py
+
+Runs a configurable chain of sprite stages over a set of images, replacing
+the one-off resize / chroma-key / grid-clean / validate scripts
+(force_resize.py, normalize_all_npcs.py, remove_green.py, clean_grid.py,
+process_*_sprite.py, ...):
+
+- the config (JSON) lists the inputs (files, folders, glob patterns), an
+  optional output folder, and the stages to apply in order
+- every image is loaded once, converted to an RGBA NumPy array, passed
+  through all stages in memory and saved once (only if a stage changed it)
+- images are processed across a process pool, in batches
+- validate stages don't change pixels; their failures are reported and make
+  the exit code 1
+
+Stages:
+  resize      {"size": [w, h]} or {"scale": f}, "resample": nearest|bilinear|bicubic|lanczos
+  chroma_key  {"preset": "green"} or {"keys": [key spec, ...]}, "softness": 0, "replace": [0, 0, 0, 0]
+              (key specs and presets as in chroma_key.py)
+  clean_grid  {"cell": [w, h], "border": 1}  clears the border pixels of every frame cell
+  smart_clean {"frame": [w, h], "keys": [...] | "preset": ..., "connectivity": 4}
+              clears background connected to the image / frame edges (see smart_clean.py)
+  validate    {"size": [w, h], "transparent_corners": true, "not_empty": true}
+
+Usage:
+  python sprite_pipeline.py sprite_pipeline.example.json --dry-run
+  python sprite_pipeline.py sprite_pipeline.example.json
+  python sprite_pipeline.py sprite_pipeline.example.json client/public/assets/sprites/characters/npc_7.png --out-dir build/npc_7
+
+Notes:
+- Inputs given on the command line replace the config's "inputs".
+- Without "output_dir" (and --out-dir) images are rewritten in place; the
+  example config writes to build/sprites so the shipped sprites stay untouched.
+"""
+
+from __future__ import annotations
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from chroma_key import apply_key, parse_keys
+from smart_clean import smart_clean
+
+IMAGE_SUFFIXES = ('.png', '.webp', '.gif', '.bmp', '.tga')
+RESAMPLE = {
+    'nearest': Image.NEAREST,
+    'bilinear': Image.BILINEAR,
+    'bicubic': Image.BICUBIC,
+    'lanczos': Image.LANCZOS,
+}
+
+
+# ---- stages: (rgba array, options, issues) -> rgba array ----
+
+def stage_resize(img: np.ndarray, opts: dict, issues: list) -> np.ndarray:
+    h, w = img.shape[:2]
+    if 'size' in opts:
+        size = tuple(opts['size'])
+    else:
+        scale = float(opts['scale'])
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    if size == (w, h):
+        return img
+    resample = RESAMPLE[opts.get('resample', 'nearest')]
+    return np.array(Image.fromarray(img, 'RGBA').resize(size, resample))
+
+
+def stage_chroma_key(img: np.ndarray, opts: dict, issues: list) -> np.ndarray:
+    keys = opts['keys'] if 'keys' in opts else opts['preset']
+    return apply_key(img, keys, opts.get('softness', 0), tuple(opts.get('replace', (0, 0, 0, 0))))
+
+
+def stage_clean_grid(img: np.ndarray, opts: dict, issues: list) -> np.ndarray:
+    cw, ch = opts['cell']
+    border = int(opts.get('border', 1))
+    h, w = img.shape[:2]
+    xs, ys = np.arange(w) % cw, np.arange(h) % ch
+    cols = (xs < border) | (xs >= cw - border)
+    rows = (ys < border) | (ys >= ch - border)
+    edge = rows[:, None] | cols[None, :]
+    if not img[..., 3][edge].any():
+        return img
+    img = img.copy()
+    img[edge] = 0
+    return img
+
+
+def stage_smart_clean(img: np.ndarray, opts: dict, issues: list) -> np.ndarray:
+    keys = opts.get('keys', opts.get('preset'))
+    frame = tuple(opts['frame']) if opts.get('frame') else None
+    return smart_clean(img, keys, frame, int(opts.get('connectivity', 4)))[0]
+
+
+def stage_validate(img: np.ndarray, opts: dict, issues: list) -> np.ndarray:
+    h, w = img.shape[:2]
+    if 'size' in opts and (w, h) != tuple(opts['size']):
+        issues.append(f"size {w}x{h}, expected {opts['size'][0]}x{opts['size'][1]}")
+    if opts.get('transparent_corners'):
+        corners = [int(a) for a in img[[0, 0, -1, -1], [0, -1, 0, -1], 3]]
+        if any(corners):
+            issues.append(f"corners not transparent (alpha {corners})")
+    if opts.get('not_empty') and not img[..., 3].any():
+        issues.append("fully transparent")
+    return img
+
+
+STAGES = {
+    'resize': stage_resize,
+    'chroma_key': stage_chroma_key,
+    'clean_grid': stage_clean_grid,
+    'smart_clean': stage_smart_clean,
+    'validate': stage_validate,
+}
+REQUIRED = {'clean_grid': ('cell',)}
+
+
+def check_config(config: dict) -> list[str]:
+    """Config errors, before any image is touched."""
+    errors = []
+    for i, stage in enumerate(config.get('stages', [])):
+        name = stage.get('stage')
+        if name not in STAGES:
+            errors.append(f"stage {i}: unknown stage {name!r} (known: {', '.join(STAGES)})")
+            continue
+        for key in REQUIRED.get(name, ()):
+            if key not in stage:
+                errors.append(f"stage {i} ({name}): missing {key!r}")
+        if name == 'resize' and not ('size' in stage or 'scale' in stage):
+            errors.append(f"stage {i} (resize): needs 'size' or 'scale'")
+        if name == 'resize' and stage.get('resample', 'nearest') not in RESAMPLE:
+            errors.append(f"stage {i} (resize): unknown resample {stage['resample']!r}")
+        if name == 'chroma_key' and not ('keys' in stage or 'preset' in stage):
+            errors.append(f"stage {i} (chroma_key): needs 'keys' or 'preset'")
+        elif name in ('chroma_key', 'smart_clean') and ('keys' in stage or 'preset' in stage):
+            try:
+                parse_keys(stage['keys'] if 'keys' in stage else stage['preset'])
+            except (ValueError, TypeError) as e:
+                errors.append(f"stage {i} ({name}): {e}")
+        if name == 'smart_clean' and stage.get('connectivity', 4) not in (4, 8):
+            errors.append(f"stage {i} (smart_clean): connectivity must be 4 or 8")
+    if not config.get('stages'):
+        errors.append("no stages")
+    return errors
+
+
+def collect_images(inputs: list[str], output_dir: str | None) -> list[tuple[str, str]]:
+    """(source, destination) pairs; destinations keep the path below each input folder."""
+    pairs = {}
+    for item in inputs:
+        p = Path(item).expanduser()
+        if p.is_dir():
+            found = [(f, p) for f in sorted(p.rglob('*')) if f.suffix.lower() in IMAGE_SUFFIXES]
+        elif p.is_file():
+            found = [(p, p.parent)]
+        else:
+            found = [(Path(m), Path(m).parent) for m in sorted(glob.glob(item, recursive=True))
+                     if m.lower().endswith(IMAGE_SUFFIXES)]
+        for src, base in found:
+            dst = Path(output_dir) / src.relative_to(base) if output_dir else src
+            pairs.setdefault(str(src), str(dst))
+    return list(pairs.items())
+
+
+def process_image(src: str, dst: str, stages: list[dict], dry_run: bool = False) -> dict:
+    result = {'src': src, 'dst': dst, 'ok': True, 'changed': [], 'issues': [], 'error': None}
+    try:
+        with Image.open(src) as im:
+            result['before'] = im.size
+            img = np.array(im.convert('RGBA'))
+        for opts in stages:
+            before = img
+            img = STAGES[opts['stage']](img, opts, result['issues'])
+            if img is not before and not np.array_equal(img, before):
+                result['changed'].append(opts['stage'])
+        result['after'] = (img.shape[1], img.shape[0])
+        if (result['changed'] or dst != src) and not dry_run:
+            os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+            Image.fromarray(img, 'RGBA').save(dst)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    result['ok'] = result['error'] is None and not result['issues']
+    return result
+
+
+def process_batch(batch: list[tuple[str, str]], stages: list[dict], dry_run: bool) -> list[dict]:
+    return [process_image(src, dst, stages, dry_run) for src, dst in batch]
+
+
+def run(config: dict, jobs: int, dry_run: bool) -> int:
+    errors = check_config(config)
+    if errors:
+        for e in errors:
+            print(f"Config error: {e}")
+        return 2
+    stages = config['stages']
+    pairs = collect_images(config.get('inputs', []), config.get('output_dir'))
+    if not pairs:
+        print("No images found.")
+        return 1
+
+    start = time.perf_counter()
+    jobs = max(1, min(jobs, len(pairs)))
+    # a few batches per worker keeps the pool busy without one task per tiny sprite
+    size = max(1, len(pairs) // (jobs * 4))
+    batches = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+    print(f"{len(pairs)} image(s), stages: {' -> '.join(s['stage'] for s in stages)}, {jobs} worker(s)"
+          + (" (dry run)" if dry_run else ""))
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for batch in pool.map(process_batch, batches, [stages] * len(batches), [dry_run] * len(batches)):
+            results.extend(batch)
+
+    for r in results:
+        status = 'OK  ' if r['ok'] else 'FAIL'
+        size_note = ''
+        if r.get('before') and r.get('after') and tuple(r['before']) != tuple(r['after']):
+            size_note = f" {r['before'][0]}x{r['before'][1]} -> {r['after'][0]}x{r['after'][1]}"
+        changed = ', '.join(r['changed']) or 'unchanged'
+        print(f"{status} {r['src']}: {changed}{size_note}")
+        if r['error']:
+            print(f"       {r['error']}")
+        for issue in r['issues']:
+            print(f"       {issue}")
+    failed = sum(1 for r in results if not r['ok'])
+    written = sum(1 for r in results if r['error'] is None and (r['changed'] or r['dst'] != r['src']))
+    print(f"\n{len(results)} image(s), {written} {'would be ' if dry_run else ''}written, {failed} failed "
+          f"in {time.perf_counter() - start:.2f}s")
+    return 1 if failed else 0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("config", help="Pipeline config JSON (see sprite_pipeline.example.json)")
+    ap.add_argument("inputs", nargs="*", help="Images, folders or globs (default: the config's inputs)")
+    ap.add_argument("--out-dir", default=None, help="Write here instead of the config's output_dir / in place")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    ap.add_argument("--dry-run", action="store_true", help="Run every stage but write nothing")
+    args = ap.parse_args()
+
+    config = json.loads(Path(args.config).read_text(encoding='utf-8'))
+    if args.inputs:
+        config['inputs'] = args.inputs
+    if args.out_dir:
+        config['output_dir'] = args.out_dir
+    return run(config, args.jobs, args.dry_run)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
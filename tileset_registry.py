@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+tileset_registry.py
+
+Parse-once registry for external Tiled tilesets (TSX).
+
+Each TSX is parsed a single time into a compact, JSON-friendly entry:
+- attrs        root <tileset> attributes (numeric ones as ints)
+- image        tileset image metadata (source/width/height/trans) or None
+- tiles        per-tile animation frames and properties, keyed by tile id
+- tile_images  per-tile images for image-collection tilesets, keyed by tile id
+
+Entries are memoized by resolved path + mtime + size, and optionally persisted
+to a JSON file (call save() when done) so later runs and other tools skip XML
+parsing entirely.
+Used by tmx_to_json.py, convert_tmx.py and validate_tmx.py.
+
+Usage:
+  python tileset_registry.py client/public/assets/maps/victorian/terrain-map-v8.tsx
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+INT_ATTRS = ['firstgid', 'tilewidth', 'tileheight', 'spacing', 'margin', 'tilecount', 'columns']
+
+
+def parse_properties(node):
+    props = []
+    properties_node = node.find('properties')
+    if properties_node is not None:
+        for p in properties_node.findall('property'):
+            prop = p.attrib.copy()
+
+            # Handle types
+            if 'value' in prop:
+                val = prop['value']
+                ptype = prop.get('type', 'string')
+                if ptype == 'int':
+                    try:
+                        prop['value'] = int(val)
+                    except:
+                        prop['value'] = 0
+                elif ptype == 'float':
+                    try:
+                        prop['value'] = float(val)
+                    except:
+                        prop['value'] = 0.0
+                elif ptype == 'bool':
+                    prop['value'] = (val.lower() == 'true')
+            props.append(prop)
+    return props
+
+
+def image_info(img: ET.Element) -> dict:
+    info = {
+        'source': img.attrib.get('source'),
+        'width': int(img.attrib.get('width', 0)),
+        'height': int(img.attrib.get('height', 0)),
+    }
+    if 'trans' in img.attrib:
+        info['trans'] = img.attrib['trans']
+    return info
+
+
+def parse_tsx(tsx_path: Path) -> dict:
+    root = ET.parse(tsx_path).getroot()
+
+    attrs = {}
+    for k, v in root.attrib.items():
+        attrs[k] = int(v) if k in INT_ATTRS else v
+
+    img = root.find('image')
+
+    tiles = {}
+    tile_images = {}
+    for tile in root.findall('tile'):
+        tid = tile.attrib['id']
+        tdata = {'id': int(tid)}
+
+        anim = tile.find('animation')
+        if anim is not None:
+            tdata['animation'] = [
+                {'tileid': int(f.attrib['tileid']), 'duration': int(f.attrib['duration'])}
+                for f in anim.findall('frame')
+            ]
+
+        props = parse_properties(tile)
+        if props:
+            tdata['properties'] = props
+
+        tiles[tid] = tdata
+
+        timg = tile.find('image')
+        if timg is not None:
+            tile_images[tid] = image_info(timg)
+
+    return {
+        'attrs': attrs,
+        'image': image_info(img) if img is not None else None,
+        'tiles': tiles,
+        'tile_images': tile_images,
+    }
+
+
+class TilesetRegistry:
+    def __init__(self, store: Path | str | None = None):
+        self.store = Path(store) if store else None
+        self.entries: dict[str, dict] = {}
+        self.parsed = 0
+        self.dirty = False
+        if self.store is not None and self.store.exists():
+            try:
+                self.entries = json.loads(self.store.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                # a corrupt store only costs a re-parse
+                self.entries = {}
+
+    def get(self, tsx_path: Path | str) -> dict:
+        """Parsed entry for tsx_path; raises OSError/ParseError like ET.parse would."""
+        path = Path(tsx_path).resolve()
+        st = path.stat()
+        key = str(path)
+
+        entry = self.entries.get(key)
+        if entry is not None and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            return entry['tileset']
+
+        tileset = parse_tsx(path)
+        self.entries[key] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'tileset': tileset}
+        self.parsed += 1
+        self.dirty = True
+        return tileset
+
+    def forget(self, tsx_path: Path | str) -> None:
+        self.entries.pop(str(Path(tsx_path).resolve()), None)
+
+    def save(self) -> None:
+        if self.store is None or not self.dirty:
+            return
+        self.store.parent.mkdir(parents=True, exist_ok=True)
+        # another process may have added entries since we loaded; keep theirs too
+        merged = {}
+        if self.store.exists():
+            try:
+                merged = json.loads(self.store.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                merged = {}
+        merged.update(self.entries)
+        tmp = self.store.with_name(f"{self.store.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(merged), encoding='utf-8')
+        os.replace(tmp, self.store)
+        self.dirty = False
+
+
+# In-process registry for callers that don't manage their own
+default_registry = TilesetRegistry()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("tsx", nargs="+", help="TSX files to parse")
+    ap.add_argument("--store", default=None, help="Persist entries to this JSON file (e.g. .map_cache/tilesets.json)")
+    args = ap.parse_args()
+
+    registry = TilesetRegistry(args.store)
+    for tsx in args.tsx:
+        ts = registry.get(tsx)
+        attrs = ts['attrs']
+        image = ts['image'] or {}
+        animated = sum(1 for t in ts['tiles'].values() if 'animation' in t)
+        with_props = sum(1 for t in ts['tiles'].values() if 'properties' in t)
+        print(f"{tsx}: {attrs.get('name')} {attrs.get('tilecount')} tiles, "
+              f"image={image.get('source')} {image.get('width')}x{image.get('height')}, "
+              f"animated={animated}, with properties={with_props}")
+    registry.save()
+    print(f"Parsed {registry.parsed} of {len(args.tsx)} (rest served from the store)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,25 @@
 #!/usr/bin/env python3
+import argparse
 import json
 import os
+import re
+import shutil
 import xml.etree.ElementTree as ET
 from pathlib import Path
 import base64
+import gzip
+import sys
 import zlib
-import struct
-
-def parse_properties(node):
-    props = []
-    properties_node = node.find('properties')
-    if properties_node is not None:
-        for p in properties_node.findall('property'):
-            prop = p.attrib.copy()
-            # Handle key rename
-            if 'name' in prop:
-                prop['name'] = prop['name']
-            
-            # Handle types
-            if 'value' in prop:
-                val = prop['value']
-                ptype = prop.get('type', 'string')
-                if ptype == 'int':
-                    try:
-                        prop['value'] = int(val)
-                    except:
-                        prop['value'] = 0
-                elif ptype == 'float':
-                    try:
-                        prop['value'] = float(val)
-                    except:
-                        prop['value'] = 0.0
-                elif ptype == 'bool':
-                    prop['value'] = (val.lower() == 'true')
-            props.append(prop)
-    return props
-
-def parse_tileset(tileset_node, current_dir):
+from array import array
+
+from build_cache import BuildCache, digest
+from map_chunks import split_chunks, write_chunk_index
+from spatial_index import iter_object_layers, write_index
+from tileset_registry import default_registry, parse_properties
+
+def parse_tileset(tileset_node, current_dir, registry=None):
     data = tileset_node.attrib.copy()
+    registry = registry or default_registry
     
     # Int conversions
     for k in ['firstgid', 'tilewidth', 'tileheight', 'spacing', 'margin', 'tilecount', 'columns']:
@@ -50,7 +32,8 @@ def parse_tileset(tileset_node, current_dir):
         if source_path.exists():
             print(f"  Embedding external tileset: {data['source']}")
             try:
-                tsx_root = ET.parse(source_path).getroot()
+                # Parsed once per path+mtime, shared with the other map tools
+                tsx = registry.get(source_path)
                 
                 # We rename the 'source' to '_source' so Phaser treats it as embedded
                 # Phaser looks for 'source' to load external JSON/TSX. If it's missing, it uses the embedded data.
@@ -58,52 +41,26 @@ def parse_tileset(tileset_node, current_dir):
                 del data['source'] # CRITICAL: Removing 'source' makes it embedded
                 
                 # Merge TSX attributes (keeping firstgid from TMX node)
-                for k, v in tsx_root.attrib.items():
+                for k, v in tsx['attrs'].items():
                     if k not in ['firstgid', 'source', 'name']: 
-                        if k in ['tilewidth', 'tileheight', 'spacing', 'margin', 'tilecount', 'columns']:
-                             data[k] = int(v)
-                        else:
-                             data[k] = v
+                        data[k] = v
                 
                 # If name is missing in TMX node, use TSX name
-                if 'name' not in data and 'name' in tsx_root.attrib:
-                    data['name'] = tsx_root.attrib['name']
+                if 'name' not in data and 'name' in tsx['attrs']:
+                    data['name'] = tsx['attrs']['name']
 
                 # Process children of TSX (image, tile, etc)
-                img = tsx_root.find('image')
+                img = tsx['image']
                 if img is not None:
-                    data['image'] = img.attrib.get('source')
-                    data['imagewidth'] = int(img.attrib.get('width', 0))
-                    data['imageheight'] = int(img.attrib.get('height', 0))
-                    if 'trans' in img.attrib:
-                        data['transparentcolor'] = "#" + img.attrib['trans']
+                    data['image'] = img['source']
+                    data['imagewidth'] = img['width']
+                    data['imageheight'] = img['height']
+                    if 'trans' in img:
+                        data['transparentcolor'] = "#" + img['trans']
                 
                 # Tiles (animations, properties)
-                tiles_map = {}
-                for tile in tsx_root.findall('tile'):
-                    tid = tile.attrib['id']
-                    tdata = {'id': int(tid)}
-                    
-                    # Animation
-                    anim = tile.find('animation')
-                    if anim is not None:
-                        frames = []
-                        for f in anim.findall('frame'):
-                            frames.append({
-                                'tileid': int(f.attrib['tileid']),
-                                'duration': int(f.attrib['duration'])
-                            })
-                        tdata['animation'] = frames
-                    
-                    # Properties
-                    props = parse_properties(tile)
-                    if props:
-                        tdata['properties'] = props
-                        
-                    tiles_map[tid] = tdata
-                
-                if tiles_map:
-                    data['tiles'] = tiles_map
+                if tsx['tiles']:
+                    data['tiles'] = {tid: dict(tdata) for tid, tdata in tsx['tiles'].items()}
 
             except Exception as e:
                 print(f"Error parsing TSX {source_path}: {e}")
@@ -124,12 +81,13 @@ def parse_tileset(tileset_node, current_dir):
 
 def decode_layer_data(data_node):
     """
-    Decodes base64 + zlib/gzip data into a flat list of GIDs (integers).
-    Returns list of ints.
+    Decodes base64 + zlib/gzip (or csv) data into a flat array('I') of GIDs.
+    The array is filled straight from the decompressed bytes, so no Python int
+    is created per tile.
     """
     encoding = data_node.attrib.get('encoding')
     compression = data_node.attrib.get('compression')
-    text = data_node.text.strip()
+    text = (data_node.text or '').strip()
     
     if encoding == 'base64':
         decoded = base64.b64decode(text)
@@ -141,24 +99,217 @@ def decode_layer_data(data_node):
             pass
         else:
             print(f"Warning: Unknown compression '{compression}'")
-            return []
+            return array('I')
         
-        # Unpack as little-endian unsigned ints (4 bytes per tile)
-        # Format string: '<' = little-endian, 'I' = unsigned int
-        # Count = len / 4
-        count = len(decoded) // 4
-        gids = struct.unpack(f'<{count}I', decoded)
-        return list(gids)
+        # TMX stores little-endian unsigned ints (4 bytes per tile)
+        return gids_from_bytes(decoded)
     
     elif encoding == 'csv':
-        return [int(x) for x in text.replace('\n','').split(',') if x]
+        return gids_from_csv(text)
         
-    return []
+    return array('I')
+
+def gids_from_bytes(raw):
+    gids = array('I')
+    assert gids.itemsize == 4, "array('I') must be 32-bit on this platform"
+    gids.frombytes(raw[:len(raw) - len(raw) % 4])
+    if sys.byteorder == 'big':
+        gids.byteswap()
+    return gids
+
+def gids_from_csv(text):
+    # split() + map(int) runs in C; ints are consumed by the array as they go
+    return array('I', map(int, filter(None, text.replace('\n', '').split(','))))
+
+def json_default(obj):
+    # Typed layer buffers only become JSON numbers at write time
+    if isinstance(obj, array):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def encode_layer_data(gids, compression=None):
+    """
+    Inverse of decode_layer_data: base64 of little-endian uint32 GIDs,
+    optionally zlib/gzip compressed first (Tiled's JSON layer encoding).
+    """
+    if sys.byteorder == 'big':
+        gids = array('I', gids)
+        gids.byteswap()
+    raw = gids.tobytes()
+    if compression == 'zlib':
+        raw = zlib.compress(raw, 9)
+    elif compression == 'gzip':
+        # mtime=0 keeps the output (and build cache entries) reproducible
+        raw = gzip.compress(raw, 9, mtime=0)
+    elif compression is not None:
+        raise ValueError(f"Unknown compression '{compression}'")
+    return base64.b64encode(raw).decode('ascii')
+
+def write_sidecars(out_path, sidecars):
+    """
+    Writes <out>.zst / <out>.br next to the JSON for servers that can serve them
+    pre-compressed. Both are compressed from the file in blocks.
+    """
+    size = os.path.getsize(out_path)
+    for kind in sidecars:
+        if kind == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise RuntimeError("zstd sidecar needs the 'zstandard' package (pip install zstandard)")
+            side_path = Path(f"{out_path}.zst")
+            with open(out_path, 'rb') as src, open(side_path, 'wb') as dst:
+                zstandard.ZstdCompressor(level=19).copy_stream(src, dst, size=size)
+        elif kind == 'brotli':
+            try:
+                import brotli
+            except ImportError:
+                raise RuntimeError("brotli sidecar needs the 'brotli' package (pip install brotli)")
+            side_path = Path(f"{out_path}.br")
+            compressor = brotli.Compressor(quality=11)
+            with open(out_path, 'rb') as src, open(side_path, 'wb') as dst:
+                for block in iter(lambda: src.read(FILE_BLOCK), b''):
+                    dst.write(compressor.process(block))
+                dst.write(compressor.finish())
+        else:
+            raise ValueError(f"Unknown sidecar '{kind}'")
+        written = side_path.stat().st_size
+        print(f"  Sidecar {side_path.name}: {written} bytes ({size - written} saved vs JSON)")
+
+LAYER_ENCODINGS = ['array', 'base64', 'zlib', 'gzip']
+
+# GIDs per JSON block, raw bytes per base64 block (a multiple of 3, so blocks
+# concatenate to the same text as one b64encode), bytes per file read
+GID_BLOCK = 1 << 16
+B64_BLOCK = 3 << 18
+FILE_BLOCK = 1 << 20
+
+def iter_gids_json(gids):
+    """
+    The JSON int array json.dump would write for gids, in pieces of GID_BLOCK
+    numbers; each piece goes through json's C encoder in one call.
+    """
+    yield '['
+    for start in range(0, len(gids), GID_BLOCK):
+        if start:
+            yield ','
+        yield json.dumps(gids[start:start + GID_BLOCK].tolist(), separators=(',', ':'))[1:-1]
+    yield ']'
 
-def tmx_to_json(tmx_path, out_path):
+def gids_to_json(gids):
+    return ''.join(iter_gids_json(gids))
+
+def json_array_size(gids, cached_path=None):
+    """Length of the JSON int array text for gids (the cached fragment's size if there is one)."""
+    if cached_path is not None:
+        return os.path.getsize(cached_path)
+    return sum(len(piece) for piece in iter_gids_json(gids))
+
+def iter_base64_json(gids):
+    """JSON string of encode_layer_data(gids) (uncompressed), in pieces."""
+    if sys.byteorder == 'big':
+        gids = array('I', gids)
+        gids.byteswap()
+    raw = memoryview(gids).cast('B')
+    yield '"'
+    for start in range(0, len(raw), B64_BLOCK):
+        yield base64.b64encode(raw[start:start + B64_BLOCK]).decode('ascii')
+    yield '"'
+
+def iter_file(path):
+    with open(path, 'r', encoding='ascii') as f:
+        for block in iter(lambda: f.read(FILE_BLOCK), ''):
+            yield block
+
+def write_json(out_path, doc, fragments):
+    """
+    Writes doc as minimal JSON. The skeleton is small: every placeholder
+    string in it is replaced by the pieces of its fragment, written as they
+    are produced, so layer data is never held as one big string.
+    Returns the file size.
+    """
+    skeleton = json.dumps(doc, indent=None, separators=(',', ':'))
+    with open(out_path, 'w', encoding='utf-8', newline='') as f:
+        pos = 0
+        for m in PLACEHOLDER_RE.finditer(skeleton):
+            f.write(skeleton[pos:m.start()])
+            index = int(m.group(1))
+            for piece in fragments[index]:
+                f.write(piece)
+            # let the layer buffers go as soon as they are written
+            fragments[index] = None
+            pos = m.end()
+        f.write(skeleton[pos:])
+    return os.path.getsize(out_path)
+
+# First part of every cache key: bump whenever the converter's output changes,
+# so entries written by an older tmx_to_json are no longer looked up
+CACHE_VERSION = b'tmx_to_json/1'
+
+def layer_cache_key(data_node):
+    return digest(CACHE_VERSION,
+                  data_node.attrib.get('encoding', '').encode('ascii'),
+                  data_node.attrib.get('compression', '').encode('ascii'),
+                  (data_node.text or '').strip().encode('ascii'))
+
+def map_cache_key(tmx_bytes, root, base_dir, options=None):
+    parts = [CACHE_VERSION, tmx_bytes, json.dumps(options or {}, sort_keys=True).encode('utf-8')]
+    for ts in root.findall('tileset'):
+        source = ts.attrib.get('source')
+        if source:
+            source_path = base_dir / source
+            parts.append(source_path.read_bytes() if source_path.exists() else b'')
+    return digest(*parts)
+
+PLACEHOLDER_RE = re.compile(r'"\\u0000fragment:(\d+)"')
+
+def object_skeleton(map_data: dict) -> dict:
+    """Map header plus its object layers: everything spatial_index.build_index reads."""
+    skeleton = {k: map_data[k] for k in ('width', 'height', 'tilewidth', 'tileheight') if k in map_data}
+    skeleton['layers'] = list(iter_object_layers(map_data.get('layers', [])))
+    return skeleton
+
+
+def tmx_to_json(tmx_path, out_path, cache=None, layer_encoding='array', drop_empty=False, sidecars=(),
+                chunk_size=None, spatial_cell=None):
+    """
+    layer_encoding: 'array' writes plain int arrays (what Phaser loads by default),
+    'base64' writes Tiled's uncompressed base64 (also loaded by Phaser), and
+    'zlib'/'gzip' write compressed base64 (the client must inflate these).
+    drop_empty skips tile layers with no tiles at all; sidecars writes
+    pre-compressed copies of the whole JSON ('zstd', 'brotli').
+    chunk_size writes tile layers as Tiled chunks (infinite-map format, empty
+    chunks omitted) plus a <out>.chunks.json/.bin index for streaming loads.
+    spatial_cell (pixels, 0 = default) also writes a <out>.spatial.json
+    grid index of the object layers.
+    The JSON is streamed to out_path: layers stay typed GID buffers until
+    their data is written, so peak memory stays close to the decoded GIDs.
+    """
+    if layer_encoding not in LAYER_ENCODINGS:
+        raise ValueError(f"Unknown layer encoding '{layer_encoding}'")
+    compression = layer_encoding if layer_encoding in ('zlib', 'gzip') else None
     print(f"Converting {tmx_path}...")
-    tree = ET.parse(tmx_path)
-    root = tree.getroot()
+    tmx_bytes = Path(tmx_path).read_bytes()
+    root = ET.fromstring(tmx_bytes)
+    base_dir = Path(tmx_path).parent
+
+    map_key = None
+    # The chunk index lives outside the map JSON, so a whole-map cache hit can't restore it
+    if cache is not None and not chunk_size:
+        options = {'layer_encoding': layer_encoding, 'drop_empty': drop_empty, 'chunk_size': chunk_size}
+        map_key = map_cache_key(tmx_bytes, root, base_dir, options)
+        cached = cache.get_map(map_key)
+        # the spatial index is rebuilt from the cached object skeleton, never from
+        # the whole map; entries stored without one are converted again
+        objects = cache.get_map_objects(map_key) if cached is not None and spatial_cell is not None else None
+        if cached is not None and (spatial_cell is None or objects is not None):
+            shutil.copyfile(cached, out_path)
+            print(f"Unchanged, reused cached map: {out_path}")
+            write_sidecars(out_path, sidecars)
+            if objects is not None:
+                with open(objects, 'r', encoding='utf-8') as f:
+                    print(f"Saved spatial index {write_index(out_path, json.load(f), spatial_cell)}")
+            return
     
     map_data = root.attrib.copy()
     
@@ -180,12 +331,26 @@ def tmx_to_json(tmx_path, out_path):
     # Parse layers and tilesets
     layers = []
     tilesets = []
-    
-    base_dir = Path(tmx_path).parent
+    # Layer/chunk data as iterables of JSON text pieces, produced while the
+    # output is written and spliced in place of a placeholder
+    fragments = []
+    chunked_layers = []
+
+    def add_fragment(fragment):
+        fragments.append(fragment)
+        return f"\0fragment:{len(fragments) - 1}"
+
+    def encode(gids, cached_path=None):
+        if layer_encoding == 'array':
+            return iter_file(cached_path) if cached_path is not None else iter_gids_json(gids)
+        if compression:
+            # compressed text is small; encode now so its size can be reported
+            return [json.dumps(encode_layer_data(gids, compression))]
+        return iter_base64_json(gids)
 
     for child in root:
         if child.tag == 'tileset':
-            tilesets.append(parse_tileset(child, base_dir))
+            tilesets.append(parse_tileset(child, base_dir, cache.tilesets if cache is not None else None))
         
         elif child.tag in ['layer', 'objectgroup', 'imagelayer']:
             layer = child.attrib.copy()
@@ -208,12 +373,57 @@ def tmx_to_json(tmx_path, out_path):
                 data_node = child.find('data')
                 if data_node is not None:
                     # Phaser JSON Loader prefers flat data arrays if no compression
-                    # So we decode it ourselves into a regular list of ints
-                    gids = decode_layer_data(data_node)
-                    layer['data'] = gids
+                    # So we decode it ourselves into a flat typed array of GIDs
+                    cached = None
+                    fragment_path = None
+                    if cache is not None:
+                        layer_key = layer_cache_key(data_node)
+                        cached = cache.get_layer(layer_key)
+                    if cached is not None:
+                        gids, fragment_path = cached
+                        print(f"  Reusing cached layer: {layer.get('name')}")
+                    else:
+                        gids = decode_layer_data(data_node)
+                        if cache is not None:
+                            fragment_path = cache.put_layer(layer_key, gids, iter_gids_json(gids))
+
+                    if drop_empty and not any(gids):
+                        print(f"  Dropping empty layer: {layer.get('name')}")
+                        continue
+
+                    if chunk_size:
+                        width = layer.get('width', map_data['width'])
+                        height = layer.get('height', map_data['height'])
+                        chunks = list(split_chunks(gids, width, height, chunk_size))
+                        chunked_layers.append((layer, chunks))
+                        layer['startx'] = 0
+                        layer['starty'] = 0
+                        layer['chunks'] = [
+                            {'data': add_fragment(encode(chunk)), 'height': chunk_size,
+                             'width': chunk_size, 'x': x, 'y': y}
+                            for x, y, chunk in chunks
+                        ]
+                        total = -(-width // chunk_size) * -(-height // chunk_size)
+                        print(f"  Chunked layer {layer.get('name')}: {len(chunks)} of {total} "
+                              f"{chunk_size}x{chunk_size} chunks kept ({total - len(chunks)} empty omitted)")
+                    else:
+                        encoded = encode(gids, fragment_path)
+                        if layer_encoding != 'array':
+                            # against the JSON array it replaces; payload length without the quotes
+                            array_size = json_array_size(gids, fragment_path)
+                            size = len(encoded[0]) - 2 if compression else 4 * -(-4 * len(gids) // 3)
+                            saved = array_size - size
+                            print(f"  Encoded layer {layer.get('name')} as {layer_encoding}: "
+                                  f"{array_size} -> {size} bytes "
+                                  + (f"({saved} saved)" if saved >= 0 else f"({-saved} more)"))
+                        layer['data'] = add_fragment(encoded)
                     # Remove encoding/compression tags since we are raw now
                     if 'encoding' in layer: del layer['encoding']
                     if 'compression' in layer: del layer['compression']
+                    if layer_encoding != 'array':
+                        layer['encoding'] = 'base64'
+                        if compression:
+                            layer['compression'] = compression
             
             elif child.tag == 'objectgroup':
                 layer['type'] = 'objectgroup'
@@ -233,17 +443,58 @@ def tmx_to_json(tmx_path, out_path):
 
     map_data['layers'] = layers
     map_data['tilesets'] = tilesets
+    if chunk_size:
+        # Tiled only reads layer chunks on infinite maps
+        map_data['infinite'] = True
     
-    with open(out_path, 'w') as f:
-        json.dump(map_data, f, indent=None, separators=(',', ':')) # Minimal size
+    size = write_json(out_path, map_data, fragments) # Minimal size
+    if cache is not None:
+        # chunked conversions skip the whole-map lookup, so there is no key to store under
+        if map_key is not None:
+            cache.put_map(map_key, Path(out_path), json.dumps(object_skeleton(map_data), separators=(',', ':')))
+        cache.tilesets.save()
     
-    print(f"Saved {out_path}")
+    print(f"Saved {out_path} ({size} bytes)")
+    if chunk_size:
+        index_path = write_chunk_index(out_path, {
+            'chunksize': chunk_size,
+            'width': map_data['width'],
+            'height': map_data['height'],
+            'tilewidth': map_data['tilewidth'],
+            'tileheight': map_data['tileheight'],
+        }, chunked_layers)
+        print(f"Saved chunk index {index_path}")
+    if spatial_cell is not None:
+        print(f"Saved spatial index {write_index(out_path, map_data, spatial_cell)}")
+    write_sidecars(out_path, sidecars)
 
 if __name__ == "__main__":
-    tmx = Path("client/public/assets/maps/victorian/victorian-preview.tmx")
-    jsn = Path("client/public/assets/maps/victorian/city_map.json")
+    ap = argparse.ArgumentParser()
+    ap.add_argument("tmx", nargs="?", default="client/public/assets/maps/victorian/victorian-preview.tmx")
+    ap.add_argument("out", nargs="?", default="client/public/assets/maps/victorian/city_map.json")
+    ap.add_argument("--cache-dir", default=None,
+                    help="Reuse unchanged tilesets/layers from this folder (e.g. .map_cache)")
+    ap.add_argument("--layer-encoding", choices=LAYER_ENCODINGS, default="array",
+                    help="Tile layer data format (base64 loads in Phaser as-is; zlib/gzip need client-side inflate)")
+    ap.add_argument("--drop-empty-layers", action="store_true", help="Omit tile layers that contain no tiles")
+    ap.add_argument("--sidecar", action="append", choices=["zstd", "brotli"], default=[],
+                    help="Also write a pre-compressed <out>.zst / <out>.br (repeatable)")
+    ap.add_argument("--chunk-size", type=int, default=None,
+                    help="Write tile layers as N x N chunks (infinite-map format) plus a streaming chunk index")
+    ap.add_argument("--spatial-index", type=int, nargs="?", const=0, default=None, metavar="CELL_PX",
+                    help="Also write <out>.spatial.json, a grid index of object layers (cell size in px, default 8 tiles)")
+    args = ap.parse_args()
+
     try:
-        tmx_to_json(tmx, jsn)
+        cache = BuildCache(args.cache_dir) if args.cache_dir else None
+        tmx_to_json(Path(args.tmx), Path(args.out), cache,
+                    layer_encoding=args.layer_encoding,
+                    drop_empty=args.drop_empty_layers,
+                    sidecars=args.sidecar,
+                    chunk_size=args.chunk_size,
+                    spatial_cell=args.spatial_index)
+        if cache is not None:
+            print(f"Cache: {cache.hits} hit(s), {cache.misses} miss(es)")
     except Exception as e:
         print(f"Error: {e}")
         exit(1)
@@ -7,10 +7,21 @@ Scans a folder for Tiled TMX maps and validates:
 - referenced TSX exists (if external tilesets)
 - tileset images exist (supports <image source="...">)
 - detects required layers (Collisions, Entities, Ground, etc.)
-- prints PASS/FAIL report
+- with --deep: decodes every tile layer and checks each GID (flip flags
+  masked off) against the tileset firstgid/tilecount ranges and the tileset
+  image size, reporting offending cells (NumPy, vectorized per layer)
+- prints PASS/FAIL report (or JSON / JUnit XML for CI)
+
+Maps are validated across a process pool. Parsed TSX files and image
+existence checks are cached per worker (and TSX parses on disk with
+--cache-dir), and --incremental skips maps whose TMX, TSX and images are
+unchanged since the last run.
 
 Usage:
   python validate_tmx.py --in "." --require Collisions Entities Ground
+  python validate_tmx.py --in client --jobs 8 --format junit --output tmx-results.xml
+  python validate_tmx.py --in client --incremental .map_cache/validate_state.json
+  python validate_tmx.py --in client/public/assets/maps --deep
 
 Notes:
 - Works for:
@@ -22,9 +33,26 @@ Notes:
 
 from __future__ import annotations
 import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 from pathlib import Path
 import xml.etree.ElementTree as ET
 
+from tileset_registry import TilesetRegistry, default_registry
+
+# swapped for a disk-backed registry in pool workers when --cache-dir is given
+registry = default_registry
+
+
+@lru_cache(maxsize=None)
+def path_exists(path: Path) -> bool:
+    # many maps share the same tilesets; stat each image once per process
+    return path.exists()
+
 
 def read_xml(path: Path) -> ET.Element:
     return ET.parse(path).getroot()
@@ -51,20 +79,18 @@ def find_layers(root: ET.Element) -> set[str]:
 def tileset_images_from_tsx(tsx_path: Path) -> list[Path]:
     images = []
     try:
-        tsx_root = read_xml(tsx_path)
+        # shared parse-once registry (also used by the converters)
+        tsx = registry.get(tsx_path)
     except Exception:
         return images
 
     # tileset image at top level
-    for img in tsx_root.findall("image"):
-        src = img.attrib.get("source", "")
-        images.append(resolve_rel(tsx_path.parent, src))
+    if tsx["image"] is not None:
+        images.append(resolve_rel(tsx_path.parent, tsx["image"]["source"] or ""))
 
     # per-tile images (rare, collection of images)
-    for tile in tsx_root.findall("tile"):
-        for img in tile.findall("image"):
-            src = img.attrib.get("source", "")
-            images.append(resolve_rel(tsx_path.parent, src))
+    for img in tsx["tile_images"].values():
+        images.append(resolve_rel(tsx_path.parent, img["source"] or ""))
 
     return images
 
@@ -87,7 +113,133 @@ def tileset_images_inline_from_tmx(tmx_root: ET.Element, tmx_path: Path) -> list
     return images
 
 
-def validate_one_tmx(tmx_path: Path, required_layers: list[str]) -> dict:
+MAX_REPORTED_CELLS = 10
+
+
+def tileset_specs(root: ET.Element, tmx_path: Path) -> list[dict]:
+    """firstgid + geometry of every tileset, inline or external, sorted by firstgid."""
+    specs = []
+    for ts in root.findall("tileset"):
+        spec = {"firstgid": int(ts.attrib.get("firstgid", 1))}
+        src = ts.attrib.get("source")
+        if src:
+            tsx = registry.get(resolve_rel(tmx_path.parent, src))
+            attrs = dict(tsx["attrs"])
+            image = tsx["image"]
+        else:
+            attrs = dict(ts.attrib)
+            img = ts.find("image")
+            image = None
+            if img is not None:
+                image = {"source": img.attrib.get("source"),
+                         "width": int(img.attrib.get("width", 0)),
+                         "height": int(img.attrib.get("height", 0))}
+        spec["name"] = attrs.get("name") or ts.attrib.get("name") or src
+        for k in ("tilewidth", "tileheight", "tilecount", "columns", "margin", "spacing"):
+            spec[k] = int(attrs.get(k, 0) or 0)
+        if image is not None and image.get("width") and image.get("height"):
+            spec["image"] = image["source"]
+            spec["imagewidth"] = image["width"]
+            spec["imageheight"] = image["height"]
+        specs.append(spec)
+    return sorted(specs, key=lambda s: s["firstgid"])
+
+
+def cells(mask, grid, limit: int = MAX_REPORTED_CELLS) -> str:
+    import numpy as np
+
+    ys, xs = np.nonzero(mask)
+    shown = ", ".join(f"({x},{y})=gid {int(grid[y, x])}" for y, x in zip(ys[:limit].tolist(), xs[:limit].tolist()))
+    more = f" ... +{len(ys) - limit} more" if len(ys) > limit else ""
+    return shown + more
+
+
+def deep_check_layers(root: ET.Element, tmx_path: Path, result: dict) -> None:
+    # NumPy is only needed for --deep; plain validation stays stdlib-only
+    import numpy as np
+
+    from map_layers import GID_MASK, ROTATED_HEXAGONAL_120, tile_origin
+    from tmx_to_json import decode_layer_data
+
+    def error(msg: str) -> None:
+        result["ok"] = False
+        result["errors"].append(msg)
+
+    try:
+        specs = tileset_specs(root, tmx_path)
+    except Exception as e:
+        error(f"Deep check: could not read tilesets: {e}")
+        return
+
+    first_gids = np.array([s["firstgid"] for s in specs], dtype=np.int64)
+    hexagonal = root.attrib.get("orientation") == "hexagonal"
+    map_w = int(root.attrib.get("width", 0))
+    map_h = int(root.attrib.get("height", 0))
+
+    for layer in root.iter("layer"):
+        name = layer.attrib.get("name", "?")
+        data = layer.find("data")
+        if data is None:
+            continue
+        if data.find("chunk") is not None:
+            result["warnings"].append(f"Deep check skipped chunked layer '{name}' (infinite map)")
+            continue
+        w = int(layer.attrib.get("width", map_w))
+        h = int(layer.attrib.get("height", map_h))
+
+        # zero-copy view over the decoded array('I')
+        flat = np.frombuffer(decode_layer_data(data), dtype=np.uint32)
+        if flat.size != w * h:
+            error(f"Layer '{name}': {flat.size} GIDs for a {w}x{h} layer")
+            continue
+        grid = flat.reshape(h, w)
+
+        if not hexagonal:
+            bad = (grid & ROTATED_HEXAGONAL_120) != 0
+            if bad.any():
+                error(f"Layer '{name}': hexagonal rotation flag on a non-hexagonal map at {cells(bad, grid)}")
+
+        bare = (grid & GID_MASK).astype(np.int64)
+        used = bare != 0
+        if not used.any():
+            continue
+        if not specs:
+            error(f"Layer '{name}': uses tiles but the map has no tilesets")
+            continue
+
+        idx = np.searchsorted(first_gids, bare, side="right") - 1
+        below = used & (idx < 0)
+        if below.any():
+            error(f"Layer '{name}': GID below the first tileset's firstgid at {cells(below, grid)}")
+        idx = np.maximum(idx, 0)
+        local = bare - first_gids[idx]
+
+        tilecount = np.array([s["tilecount"] for s in specs], dtype=np.int64)
+        has_count = tilecount[idx] > 0
+        past_count = used & ~below & has_count & (local >= tilecount[idx])
+        if past_count.any():
+            for i in np.unique(idx[past_count]).tolist():
+                m = past_count & (idx == i)
+                error(f"Layer '{name}': GID past the end of tileset '{specs[i]['name']}' "
+                      f"(firstgid {specs[i]['firstgid']}, tilecount {specs[i]['tilecount']}) at {cells(m, grid)}")
+
+        # tile rect must lie inside the tileset image (catches TSX tilecount vs image size drift)
+        checked = used & ~below & ~past_count
+        for i in np.unique(idx[checked]).tolist():
+            spec = specs[i]
+            if "imagewidth" not in spec or not spec["tilewidth"] or not spec["tileheight"]:
+                continue
+            m = checked & (idx == i)
+            x, y = tile_origin(spec, local[m])
+            outside = (x + spec["tilewidth"] > spec["imagewidth"]) | (y + spec["tileheight"] > spec["imageheight"])
+            if outside.any():
+                mask = np.zeros_like(m)
+                mask[m] = outside
+                error(f"Layer '{name}': tile outside the {spec['imagewidth']}x{spec['imageheight']} image of "
+                      f"'{spec['name']}' at {cells(mask, grid)}")
+
+
+def validate_one_tmx(tmx_path: Path, required_layers: list[str], deep: bool = False) -> dict:
     result = {
         "tmx": str(tmx_path),
         "ok": True,
@@ -137,7 +289,7 @@ def validate_one_tmx(tmx_path: Path, required_layers: list[str]) -> dict:
     # validate TSX files and their images
     for tsx in external_tsx:
         result["tsx_files"].append(str(tsx))
-        if not tsx.exists():
+        if not path_exists(tsx):
             result["ok"] = False
             result["errors"].append(f"Missing TSX file: {tsx}")
             continue
@@ -147,14 +299,14 @@ def validate_one_tmx(tmx_path: Path, required_layers: list[str]) -> dict:
             result["warnings"].append(f"No <image> tags found inside TSX: {tsx}")
         for img in imgs:
             result["images_found"].append(str(img))
-            if not img.exists():
+            if not path_exists(img):
                 result["ok"] = False
                 result["errors"].append(f"Missing tileset image referenced by TSX: {img}")
 
     # validate inline images
     for img in inline_tileset_images:
         result["images_found"].append(str(img))
-        if not img.exists():
+        if not path_exists(img):
             result["ok"] = False
             result["errors"].append(f"Missing tileset image referenced inline by TMX: {img}")
 
@@ -180,9 +332,116 @@ def validate_one_tmx(tmx_path: Path, required_layers: list[str]) -> dict:
         except Exception:
             result["warnings"].append("Could not parse width/height/tilewidth/tileheight as ints.")
 
+    if deep:
+        deep_check_layers(root, tmx_path, result)
+
     return result
 
 
+def fingerprint(paths: list[str]) -> list:
+    fp = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            fp.append([p, st.st_mtime_ns, st.st_size])
+        except OSError:
+            fp.append([p, None, None])
+    return fp
+
+
+def dependencies(res: dict) -> list[str]:
+    return [res["tmx"]] + res["tsx_files"] + res["images_found"]
+
+
+def load_state(path: Path | None) -> dict:
+    if path is None or not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(path: Path, results: list[dict], options: dict) -> None:
+    state = {
+        r["tmx"]: {"options": options, "fingerprint": fingerprint(dependencies(r)), "result": r}
+        for r in results
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.tmp")
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def is_unchanged(entry: dict | None, options: dict) -> bool:
+    if not entry or entry.get("options") != options:
+        return False
+    deps = [p for p, _, _ in entry["fingerprint"]]
+    return fingerprint(deps) == entry["fingerprint"]
+
+
+def init_worker(store: str | None) -> None:
+    global registry
+    if store:
+        registry = TilesetRegistry(store)
+
+
+def validate_batch(tmx_files: list[Path], required: list[str], store: str | None, deep: bool = False) -> list[dict]:
+    # one batch per worker, so the worker's TSX/image caches are reused across its maps
+    init_worker(store)
+    results = [validate_one_tmx(tmx, required, deep) for tmx in tmx_files]
+    registry.save()
+    return results
+
+
+def validate_all(tmx_files: list[Path], required: list[str], jobs: int, store: str | None,
+                 deep: bool = False) -> list[dict]:
+    if jobs <= 1 or len(tmx_files) <= 1:
+        return validate_batch(tmx_files, required, store, deep)
+    # interleave so each worker gets a similar mix of big and small maps
+    batches = [tmx_files[i::jobs] for i in range(jobs)]
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for batch in pool.map(validate_batch, batches, repeat(required), repeat(store), repeat(deep)):
+            results.extend(batch)
+    return results
+
+
+def print_text(results: list[dict], base: Path, out) -> None:
+    for res in results:
+        status = "PASS ✅" if res["ok"] else "FAIL ❌"
+        cached = "  (unchanged, cached)" if res.get("cached") else ""
+        print("=" * 90, file=out)
+        print(f"{status}  {Path(res['tmx']).relative_to(base)}{cached}", file=out)
+
+        if res["errors"]:
+            print("  Errors:", file=out)
+            for e in res["errors"]:
+                print(f"   - {e}", file=out)
+
+        if res["warnings"]:
+            print("  Warnings:", file=out)
+            for w in res["warnings"]:
+                print(f"   - {w}", file=out)
+
+        print(f"  Layers found: {', '.join(res['layers_found']) if res['layers_found'] else '(none)'}", file=out)
+
+
+def junit_xml(results: list[dict], base: Path) -> str:
+    failed = sum(1 for r in results if not r["ok"])
+    suite = ET.Element("testsuite", name="validate_tmx", tests=str(len(results)),
+                       failures=str(failed), errors="0", skipped="0")
+    for res in results:
+        case = ET.SubElement(suite, "testcase", classname="validate_tmx",
+                             name=str(Path(res["tmx"]).relative_to(base)))
+        if not res["ok"]:
+            failure = ET.SubElement(case, "failure", message=res["errors"][0] if res["errors"] else "failed")
+            failure.text = "\n".join(res["errors"])
+        if res["warnings"]:
+            ET.SubElement(case, "system-out").text = "\n".join(res["warnings"])
+    return ET.tostring(ET.ElementTree(suite).getroot(), encoding="unicode")
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--in", dest="in_dir", default=".", help="Folder to scan (default .)")
@@ -193,6 +452,14 @@ def main():
         help='Required layer names. Example: --require Collisions Entities Ground',
     )
     ap.add_argument("--max", type=int, default=2000, help="Max TMX files to scan")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes (default: CPU count)")
+    ap.add_argument("--format", choices=["text", "json", "junit"], default="text", help="Report format")
+    ap.add_argument("--output", default=None, help="Write the report here instead of stdout")
+    ap.add_argument("--cache-dir", default=None, help="Persist parsed TSX files here (e.g. .map_cache)")
+    ap.add_argument("--incremental", default=None, metavar="STATE_JSON",
+                    help="Skip maps whose TMX/TSX/images are unchanged since the run that wrote this file")
+    ap.add_argument("--deep", action="store_true",
+                    help="Decode tile layers and check every GID against tileset ranges and image sizes (needs NumPy)")
     args = ap.parse_args()
 
     base = Path(args.in_dir).expanduser().resolve()
@@ -200,40 +467,52 @@ def main():
 
     if not tmx_files:
         print(f"No TMX files found under: {base}")
-        return
-
-    print(f"Scanning {len(tmx_files)} TMX file(s) under: {base}\n")
+        return 0
 
-    passed = 0
-    failed = 0
+    store = str(Path(args.cache_dir) / "tilesets.json") if args.cache_dir else None
+    state_path = Path(args.incremental) if args.incremental else None
+    state = load_state(state_path)
+    options = {"required": args.require, "deep": args.deep}
 
+    reused = {}
+    todo = []
     for tmx in tmx_files:
-        res = validate_one_tmx(tmx, args.require)
-
-        status = "PASS ✅" if res["ok"] else "FAIL ❌"
-        print("=" * 90)
-        print(f"{status}  {tmx.relative_to(base)}")
+        entry = state.get(str(tmx))
+        if is_unchanged(entry, options):
+            reused[str(tmx)] = dict(entry["result"], cached=True)
+        else:
+            todo.append(tmx)
 
-        if res["errors"]:
-            print("  Errors:")
-            for e in res["errors"]:
-                print(f"   - {e}")
+    fresh = validate_all(todo, args.require, max(1, min(args.jobs, len(todo) or 1)), store, args.deep)
+    by_path = {r["tmx"]: r for r in fresh}
+    by_path.update(reused)
+    results = [by_path[str(tmx)] for tmx in tmx_files]
 
-        if res["warnings"]:
-            print("  Warnings:")
-            for w in res["warnings"]:
-                print(f"   - {w}")
+    if state_path is not None:
+        save_state(state_path, [{k: v for k, v in r.items() if k != "cached"} for r in results], options)
 
-        print(f"  Layers found: {', '.join(res['layers_found']) if res['layers_found'] else '(none)'}")
+    passed = sum(1 for r in results if r["ok"])
+    failed = len(results) - passed
 
-        if res["ok"]:
-            passed += 1
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            json.dump({"base": str(base), "passed": passed, "failed": failed, "results": results}, out, indent=2)
+            out.write("\n")
+        elif args.format == "junit":
+            out.write(junit_xml(results, base) + "\n")
         else:
-            failed += 1
+            print(f"Scanning {len(tmx_files)} TMX file(s) under: {base} "
+                  f"({len(reused)} unchanged, {len(todo)} validated)\n", file=out)
+            print_text(results, base, out)
+            print("\n" + "=" * 90, file=out)
+            print(f"Done. PASS={passed}  FAIL={failed}", file=out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
 
-    print("\n" + "=" * 90)
-    print(f"Done. PASS={passed}  FAIL={failed}")
+    return 1 if failed else 0
 
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(main())
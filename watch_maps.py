@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+watch_maps.py
+
+Watch mode for the map pipeline: rebuilds and revalidates maps as soon as a
+TMX, TSX or tileset image changes, instead of rerunning tmx_to_json.py,
+split_tileset.py and validate_tmx.py by hand.
+
+- every map is built once at start (through the build cache, so unchanged
+  maps are whole-map cache hits), then the watcher waits for changes
+- a dependency graph (TMX -> its TSX files and tileset images, taken from the
+  validation result) maps every changed file to the maps that use it; a new
+  TMX in a watched folder is picked up too
+- changes are debounced: a burst of saves (Tiled writes the TMX and TSX
+  separately) triggers a single rebuild once --debounce seconds pass quietly
+- a changed TMX/TSX reconverts the map; a changed image only reruns --split
+  and validation, since the JSON doesn't depend on pixels
+- parsed TSX files stay in memory in one registry shared by the converter and
+  the validator (invalidated per file by mtime + size), and tileset image
+  sizes are kept per file until that file changes; they are checked against
+  the size the TSX declares
+- uses watchdog (inotify / FSEvents / ReadDirectoryChanges) when installed,
+  otherwise polls file stats every --interval seconds
+
+Usage:
+  python watch_maps.py client/public/assets/maps
+  python watch_maps.py client/public/assets/maps --split --deep --require Collisions
+  python watch_maps.py maps --out-dir build/maps --once
+
+Notes:
+- Output is <name>.json next to each TMX unless --out-dir is given; --split
+  also writes <name>_split.json (see split_tileset.py).
+- Stop with Ctrl+C.
+"""
+
+from __future__ import annotations
+import argparse
+import contextlib
+import io
+import os
+import queue
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import validate_tmx
+from build_cache import BuildCache
+from convert_maps import collect_tmx, input_roots, output_path
+from tileset_registry import default_registry
+from tmx_to_json import LAYER_ENCODINGS, tmx_to_json
+from validate_tmx import dependencies, resolve_rel, validate_one_tmx
+
+WATCHED_SUFFIXES = ('.tmx', '.tsx', '.png', '.jpg', '.jpeg', '.webp')
+
+
+def norm(path: Path | str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def stat_key(path: str) -> tuple | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class MapGraph:
+    """Which maps use which files, both ways."""
+
+    def __init__(self):
+        self.deps: dict[str, set[str]] = {}
+        self.users: dict[str, set[str]] = defaultdict(set)
+
+    def set(self, tmx: str, deps: list[str]) -> None:
+        self.remove(tmx)
+        self.deps[tmx] = {norm(p) for p in deps if str(p)} | {tmx}
+        for p in self.deps[tmx]:
+            self.users[p].add(tmx)
+
+    def remove(self, tmx: str) -> None:
+        for p in self.deps.pop(tmx, ()):
+            self.users[p].discard(tmx)
+            if not self.users[p]:
+                del self.users[p]
+
+    def affected(self, changed: set[str]) -> set[str]:
+        return {tmx for p in changed for tmx in self.users.get(p, ())}
+
+    def files(self) -> set[str]:
+        return set(self.users)
+
+
+class MapWatcher:
+    def __init__(self, inputs: list[str], out_dir: Path | None, cache_dir: str | None, options: dict,
+                 required: list[str], deep: bool, split_texture: int | None):
+        self.inputs = inputs
+        self.out_dir = out_dir
+        self.options = options
+        self.required = required
+        self.deep = deep
+        self.split_texture = split_texture
+        self.cache = BuildCache(cache_dir) if cache_dir else None
+        # one registry for the converter and the validator, kept for the whole session
+        self.registry = self.cache.tilesets if self.cache is not None else default_registry
+        validate_tmx.registry = self.registry
+        self.graph = MapGraph()
+        self.tmx_paths: dict[str, Path] = {}
+        self.stats: dict[str, tuple | None] = {}
+        self.image_sizes: dict[str, tuple] = {}
+
+    # ---- scanning ----
+    def scan(self) -> set[str]:
+        """TMX files under the inputs that the watcher doesn't know yet."""
+        found = {norm(p): p for p in collect_tmx(self.inputs)}
+        new = set(found) - set(self.tmx_paths)
+        self.tmx_paths.update({k: found[k] for k in new})
+        return new
+
+    def watched_files(self) -> set[str]:
+        return self.graph.files() | set(self.tmx_paths)
+
+    def poll(self) -> set[str]:
+        """Files whose mtime/size changed (or that appeared/vanished) since the last poll."""
+        changed = set()
+        for path in self.watched_files():
+            key = stat_key(path)
+            if path in self.stats and self.stats[path] != key:
+                changed.add(path)
+            self.stats[path] = key
+        return changed
+
+    # ---- building ----
+    def image_size(self, path: str) -> tuple[int, int] | None:
+        """Pixel size of a tileset image, read from its header once per version of the file."""
+        key = stat_key(path)
+        cached = self.image_sizes.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        try:
+            from PIL import Image
+            with Image.open(path) as img:
+                size = img.size
+        except (ImportError, OSError):
+            size = None
+        self.image_sizes[path] = (key, size)
+        return size
+
+    def check_image_sizes(self, res: dict) -> None:
+        for tsx in res['tsx_files']:
+            try:
+                image = self.registry.get(tsx)['image']
+            except Exception:
+                continue
+            if not image or not image.get('source'):
+                continue
+            path = resolve_rel(Path(tsx).parent, image['source'])
+            size = self.image_size(str(path)) if path.exists() else None
+            if size and size != (image['width'], image['height']):
+                res['warnings'].append(f"{path.name} is {size[0]}x{size[1]} but {Path(tsx).name} "
+                                       f"declares {image['width']}x{image['height']}")
+
+    def build(self, key: str, convert: bool = True) -> bool:
+        tmx = self.tmx_paths[key]
+        out = output_path(tmx, self.out_dir, input_roots(self.inputs))
+        start = time.perf_counter()
+        log = io.StringIO()
+        error = None
+        steps = []
+        try:
+            with contextlib.redirect_stdout(log):
+                if convert or not out.exists():
+                    out.parent.mkdir(parents=True, exist_ok=True)
+                    tmx_to_json(tmx, out, self.cache, **self.options)
+                    steps.append('converted')
+                if self.split_texture:
+                    from split_tileset import split_map
+                    if split_map(out, out.with_name(f"{out.stem}_split.json"), self.split_texture,
+                                 os.cpu_count() or 1) != 0:
+                        raise RuntimeError('split_tileset failed')
+                    steps.append('split')
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+        # image existence is memoized per process; files may have appeared or gone since
+        validate_tmx.path_exists.cache_clear()
+        res = validate_one_tmx(Path(norm(tmx)), self.required, self.deep)
+        self.check_image_sizes(res)
+        self.graph.set(key, dependencies(res))
+        for path in self.graph.deps[key]:
+            self.stats.setdefault(path, stat_key(path))
+        if self.cache is not None:
+            self.cache.tilesets.save()
+
+        ok = error is None and res['ok']
+        steps.append('validated')
+        print(f"{'OK  ' if ok else 'FAIL'} {time.perf_counter() - start:7.3f}s  {tmx}  ({', '.join(steps)})")
+        if error:
+            print(f"       {error}")
+            for line in log.getvalue().strip().splitlines()[-10:]:
+                print(f"       | {line}")
+        for msg in res['errors']:
+            print(f"       ERROR {msg}")
+        for msg in res['warnings']:
+            print(f"       warn  {msg}")
+        return ok
+
+    def rebuild(self, changed: set[str]) -> None:
+        new = self.scan()
+        for key in list(self.tmx_paths):
+            if not os.path.exists(key):
+                print(f"Removed {self.tmx_paths.pop(key)}")
+                self.graph.remove(key)
+        # images only feed --split and validation, everything else needs a reconversion
+        convert = {tmx for p in changed if not p.endswith(('.png', '.jpg', '.jpeg', '.webp'))
+                   for tmx in self.graph.affected({p})}
+        targets = (self.graph.affected(changed) | new) & set(self.tmx_paths)
+        if not targets:
+            return
+        print(f"\n{len(changed)} file(s) changed, {len(new)} new map(s) -> rebuilding {len(targets)} map(s)")
+        for key in sorted(targets):
+            self.build(key, convert=key in convert or key in new)
+
+    def build_all(self) -> int:
+        self.scan()
+        failed = sum(1 for key in sorted(self.tmx_paths) if not self.build(key))
+        self.poll()
+        print(f"\nBuilt {len(self.tmx_paths)} map(s), {failed} failed; watching {len(self.watched_files())} file(s)")
+        return failed
+
+    # ---- watching ----
+    def watch(self, interval: float, debounce: float, rescan: float) -> None:
+        events = self.start_observer()
+        pending: set[str] = set()
+        last_change = 0.0
+        last_scan = time.monotonic()
+        while True:
+            if events is None:
+                time.sleep(interval)
+                changed = self.poll()
+            else:
+                changed = set()
+                with contextlib.suppress(queue.Empty):
+                    changed.add(events.get(timeout=interval))
+                    while True:
+                        changed.add(events.get_nowait())
+                # keep only files the graph knows, plus new TMX files
+                changed = {p for p in changed if p in self.watched_files() or p.endswith('.tmx')}
+
+            now = time.monotonic()
+            if events is None and now - last_scan >= rescan:
+                last_scan = now
+                if {norm(p) for p in collect_tmx(self.inputs)} - set(self.tmx_paths):
+                    changed.add('<new map>')
+            if changed:
+                pending |= changed
+                last_change = now
+            elif pending and now - last_change >= debounce:
+                batch, pending = pending, set()
+                self.rebuild(batch - {'<new map>'})
+                self.poll()
+
+    def start_observer(self) -> queue.Queue | None:
+        """Starts a watchdog observer feeding changed paths into a queue, or None to poll."""
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            print("watchdog not installed; polling for changes")
+            return None
+
+        events: queue.Queue = queue.Queue()
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                for path in (event.src_path, getattr(event, 'dest_path', '')):
+                    if path and path.lower().endswith(WATCHED_SUFFIXES):
+                        events.put(norm(path))
+
+        observer = Observer()
+        folders = {os.path.dirname(p) for p in self.watched_files()}
+        roots = [norm(p) for p in self.inputs if os.path.isdir(p)]
+        for root in roots:
+            observer.schedule(Handler(), root, recursive=True)
+        for folder in sorted(folders):
+            if os.path.isdir(folder) and not any(folder.startswith(r + os.sep) or folder == r for r in roots):
+                observer.schedule(Handler(), folder, recursive=False)
+        observer.daemon = True
+        observer.start()
+        print("Watching with watchdog")
+        return events
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("inputs", nargs="+", help="TMX files, folders or glob patterns")
+    ap.add_argument("--out-dir", default=None, help="Write JSON here instead of next to each TMX")
+    ap.add_argument("--cache-dir", default=".map_cache", help="Build cache (default .map_cache)")
+    ap.add_argument("--no-cache", action="store_true", help="Disable the build cache")
+    ap.add_argument("--layer-encoding", choices=LAYER_ENCODINGS, default="array", help="See tmx_to_json.py")
+    ap.add_argument("--split", action="store_true", help="Also run split_tileset.py on every rebuilt map")
+    ap.add_argument("--max-texture", type=int, default=4096, help="Max tileset image size for --split (default 4096)")
+    ap.add_argument("--require", nargs="*", default=[], help="Layers every map must have")
+    ap.add_argument("--deep", action="store_true", help="Check every GID too, see validate_tmx.py (needs NumPy)")
+    ap.add_argument("--interval", type=float, default=0.5, help="Seconds between polls (default 0.5)")
+    ap.add_argument("--debounce", type=float, default=0.3, help="Quiet seconds before rebuilding (default 0.3)")
+    ap.add_argument("--rescan", type=float, default=5.0, help="Seconds between scans for new TMX when polling")
+    ap.add_argument("--once", action="store_true", help="Build and validate everything once, then exit")
+    args = ap.parse_args()
+
+    out_dir = Path(args.out_dir) if args.out_dir else None
+    if out_dir is not None:
+        out_dir.mkdir(parents=True, exist_ok=True)
+    watcher = MapWatcher(
+        args.inputs, out_dir, None if args.no_cache else args.cache_dir,
+        {"layer_encoding": args.layer_encoding}, args.require, args.deep,
+        args.max_texture if args.split else None,
+    )
+    failed = watcher.build_all()
+    if args.once:
+        return 1 if failed else 0
+    try:
+        watcher.watch(args.interval, args.debounce, args.rescan)
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())